@@ -0,0 +1,243 @@
+import asyncio
+import json
+import threading
+import time
+import xmlrpc.client
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Set, Tuple
+
+from utils.logger import log
+from wire import MAX_FRAME_BYTES, encode_frame, error_reply
+
+# (function, is_coroutine_function) for a registered name, or None
+Resolver = Callable[[str], Optional[Tuple[Callable[..., Any], bool]]]
+# observe(method, seconds) after every call
+Observer = Callable[[str, float], None]
+
+MAX_BODY_BYTES = 16 * 1024 * 1024
+
+
+class AsyncRPCServer:
+    """
+    Event-loop front end for RMIServer: serves XML-RPC over HTTP/1.1
+    (keep-alive) and, optionally, the framed transport, with every connection
+    handled by one asyncio loop thread. Coroutine functions are awaited on
+    the loop, so long-polls and blocking submissions park no thread; plain
+    functions run on a bounded thread pool. `GET /metrics` returns
+    `metrics_text()` when it is set and not None.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        resolve: Resolver,
+        framed_port: Optional[int] = None,
+        blocking_workers: int = 32,
+        observe: Optional[Observer] = None,
+        metrics_text: Optional[Callable[[], Optional[str]]] = None,
+    ) -> None:
+        self.host = host
+        self.port = port
+        self.framed_port = framed_port
+        self._resolve = resolve
+        self._observe = observe
+        self._metrics_text = metrics_text
+        self._pool = ThreadPoolExecutor(max_workers=blocking_workers, thread_name_prefix="RMI:aio")
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._servers: list[asyncio.AbstractServer] = []
+        self._ready = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.connections = 0
+
+    async def call(self, name: str, params: Tuple[Any, ...]) -> Any:
+        if self._observe is None:
+            return await self._call(name, params)
+        start = time.perf_counter()
+        try:
+            return await self._call(name, params)
+        finally:
+            self._observe(name, time.perf_counter() - start)
+
+    async def _call(self, name: str, params: Tuple[Any, ...]) -> Any:
+        if name == "system.multicall":
+            return await self._multicall(*params)
+        entry = self._resolve(name)
+        if entry is None:
+            raise LookupError(f'method "{name}" is not supported')
+        fn, is_coroutine = entry
+        if is_coroutine:
+            return await fn(*params)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._pool, lambda: fn(*params))
+
+    async def _multicall(self, calls: list[Dict[str, Any]]) -> list[Any]:
+        # Run in order, so a batch can read back the effect of an earlier call
+        results: list[Any] = []
+        for call in calls:
+            try:
+                results.append([await self.call(str(call["methodName"]), tuple(call.get("params", [])))])
+            except Exception as ex:  # noqa: BLE001
+                results.append({"faultCode": 1, "faultString": f"{type(ex)}:{ex}"})
+        return results
+
+    # XML-RPC over HTTP
+    async def _xmlrpc_response(self, body: bytes) -> bytes:
+        try:
+            params, name = xmlrpc.client.loads(body)
+            result = await self.call(str(name), params)
+            return xmlrpc.client.dumps((result,), methodresponse=True, allow_none=True).encode("utf-8")
+        except xmlrpc.client.Fault as fault:
+            return xmlrpc.client.dumps(fault, allow_none=True).encode("utf-8")
+        except Exception as ex:  # noqa: BLE001
+            fault = xmlrpc.client.Fault(1, f"{type(ex)}:{ex}")
+            return xmlrpc.client.dumps(fault, allow_none=True).encode("utf-8")
+
+    @staticmethod
+    def _http_reply(status: str, body: bytes, keep_alive: bool, content_type: str = "text/xml") -> bytes:
+        head = (
+            f"HTTP/1.1 {status}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+        )
+        return head.encode("latin-1") + body
+
+    def _get_reply(self, path: str, keep_alive: bool) -> bytes:
+        text = self._metrics_text() if self._metrics_text and path.split("?")[0] == "/metrics" else None
+        if text is None:
+            return self._http_reply("404 Not Found", b"", keep_alive, "text/plain")
+        return self._http_reply("200 OK", text.encode("utf-8"), keep_alive, "text/plain; version=0.0.4")
+
+    async def _handle_http(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.connections += 1
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    return
+                parts = request_line.decode("latin-1").split()
+                headers: Dict[str, str] = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    key, _, value = line.decode("latin-1").partition(":")
+                    headers[key.strip().lower()] = value.strip()
+                length = int(headers.get("content-length") or 0)
+                version = parts[2] if len(parts) > 2 else "HTTP/1.0"
+                keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                if len(parts) >= 2 and parts[0] == "GET":
+                    writer.write(self._get_reply(parts[1], keep_alive))
+                    await writer.drain()
+                    if not keep_alive:
+                        return
+                    continue
+                if len(parts) < 2 or parts[0] != "POST" or length > MAX_BODY_BYTES:
+                    writer.write(self._http_reply("400 Bad Request", b"", False, "text/plain"))
+                    await writer.drain()
+                    return
+                body = await reader.readexactly(length)
+                writer.write(self._http_reply("200 OK", await self._xmlrpc_response(body), keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    return
+        except (asyncio.IncompleteReadError, asyncio.CancelledError, ConnectionError, ValueError):
+            # CancelledError: server shutdown; end the handler quietly
+            return
+        finally:
+            self.connections -= 1
+            writer.close()
+
+    # Framed transport (pipelined: every request is its own task)
+    async def _framed_reply(self, request: Any, writer: asyncio.StreamWriter) -> None:
+        # Every request gets an answer (same shape checks as wire.dispatch_request),
+        # or a pipelined caller waits forever
+        req_id = None
+        try:
+            if not isinstance(request, dict):
+                reply = error_reply(None, "BadRequest", "request must be an object with id, method and params")
+            else:
+                req_id = request.get("id")
+                params = request.get("params", [])
+                if not isinstance(params, list):
+                    reply = error_reply(req_id, "BadRequest", "params must be a list")
+                else:
+                    reply = {"id": req_id, "result": await self.call(str(request.get("method")), tuple(params))}
+        except LookupError:
+            reply = error_reply(req_id, "NoSuchMethod", str(request.get("method")))
+        except Exception as ex:  # noqa: BLE001
+            reply = error_reply(req_id, type(ex).__name__, str(ex))
+        try:
+            frame = encode_frame(reply)
+        except Exception as ex:  # noqa: BLE001  (e.g. a result that is not JSON)
+            frame = encode_frame(error_reply(req_id, type(ex).__name__, str(ex)))
+        try:
+            writer.write(frame)
+            await writer.drain()
+        except ConnectionError:
+            pass
+
+    async def _handle_framed(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.connections += 1
+        tasks: Set["asyncio.Task[None]"] = set()
+        try:
+            while True:
+                header = await reader.readexactly(4)
+                size = int.from_bytes(header, "big")
+                if size > MAX_FRAME_BYTES:
+                    return
+                request = json.loads(await reader.readexactly(size))
+                task = asyncio.ensure_future(self._framed_reply(request, writer))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        except (asyncio.IncompleteReadError, asyncio.CancelledError, ConnectionError, ValueError):
+            # CancelledError: server shutdown; end the handler quietly
+            return
+        finally:
+            self.connections -= 1
+            for task in tasks:
+                task.cancel()
+            writer.close()
+
+    # Lifecycle
+    async def _serve(self) -> None:
+        http = await asyncio.start_server(self._handle_http, self.host, self.port)
+        self.port = http.sockets[0].getsockname()[1]
+        self._servers.append(http)
+        if self.framed_port is not None:
+            framed = await asyncio.start_server(self._handle_framed, self.host, self.framed_port)
+            self.framed_port = framed.sockets[0].getsockname()[1]
+            self._servers.append(framed)
+        framed_note = f" (framed: {self.framed_port})" if self.framed_port is not None else ""
+        log("RMI", f"asyncio front end listening on {self.host}:{self.port}{framed_note}")
+
+    def _run(self) -> None:
+        loop = asyncio.new_event_loop()
+        self._loop = loop
+        asyncio.set_event_loop(loop)
+        try:
+            loop.run_until_complete(self._serve())
+        finally:
+            self._ready.set()
+        loop.run_forever()
+        for server in self._servers:
+            server.close()
+        # Cancel connection handlers still parked on idle clients
+        pending = asyncio.all_tasks(loop)
+        for task in pending:
+            task.cancel()
+        loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+        loop.close()
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name=f"RMI:{self.port}", daemon=True)
+        self._thread.start()
+        self._ready.wait(timeout=5.0)
+
+    def stop(self) -> None:
+        if self._loop is not None and self._loop.is_running():
+            self._loop.call_soon_threadsafe(self._loop.stop)
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout=2.0)
+        self._pool.shutdown(wait=False)
@@ -0,0 +1,177 @@
+"""
+End-to-end load generator for the judge backend.
+
+Starts the backend the way main_backend does (NodeManager plus the fully
+bound RMIServer) on an in-process cluster with ephemeral ports, then drives
+it with N concurrent clients, each sending its share of submissions over
+XML-RPC or the framed transport. Workloads cover trivial, CPU-heavy,
+output-heavy and timeout-inducing code. Every submission gets a unique
+suffix, so the verdict cache does not hide the work. Prints JSON with
+throughput, client-side p50/p99 latency, verdict counts and per-node
+utilization (busy worker time / available worker time).
+
+Usage (from backend/):
+  python benchmarks/bench_cluster.py [--clients 8] [--requests 40] [--nodes 3] [--workers 2]
+                                     [--workloads trivial,cpu,output,timeout]
+                                     [--transport xmlrpc|framed] [--rmi-mode threads|asyncio]
+"""
+import argparse
+import json
+import pathlib
+import sys
+import threading
+import time
+import xmlrpc.client
+from collections import Counter
+from typing import Any, Callable, Dict, List, Tuple
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+
+from main_backend import build_rmi_server, seed_problems  # noqa: E402
+from node_manager import NodeManager  # noqa: E402
+from utils.logger import configure as configure_logging  # noqa: E402
+from wire import PipelinedClient  # noqa: E402
+
+# name -> code; each request appends a unique assignment to defeat the verdict cache
+WORKLOADS: Dict[str, str] = {
+    "trivial": "print('ok')",
+    "cpu": "print(sum(i * i for i in range(200000)))",
+    "output": "for i in range(20000):\n    print('x' * 40, i)",
+    "timeout": "while True:\n    pass",
+}
+
+
+def _percentile(samples: List[float], q: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def _classify(output: str) -> str:
+    if output.startswith("BUSY"):
+        return "BUSY"
+    if output in ("TIMEOUT", "OUTPUT_LIMIT_EXCEEDED"):
+        return output
+    return "ERROR" if output.startswith("ERROR") else "OK"
+
+
+def _caller(transport: str, rmi: Any) -> Tuple[Callable[[str, str], str], Callable[[], None]]:
+    # (submit_code, close) for one client connection
+    if transport == "framed":
+        client = PipelinedClient("127.0.0.1", rmi.framed_port)
+        return (lambda code, tests: client.call("submit_code", code, tests, timeout=60.0)), client.close
+    proxy = xmlrpc.client.ServerProxy(f"http://127.0.0.1:{rmi.port}", allow_none=True)
+    return (lambda code, tests: proxy.submit_code(code, tests)), proxy("close")
+
+
+def _node_busy(summary: Dict[str, Any]) -> Dict[str, float]:
+    # Total seconds node workers spent executing jobs so far
+    return {
+        nid: node["exec"].get("mean", 0.0) * node["exec"].get("count", 0) if node["exec"] else 0.0
+        for nid, node in summary["nodes"].items()
+    }
+
+
+def run_workload(name: str, rmi: Any, manager: NodeManager, clients: int, requests: int, transport: str) -> Dict[str, Any]:
+    code = WORKLOADS[name]
+    latencies: List[float] = []
+    verdicts: Counter = Counter()
+    lock = threading.Lock()
+    before = manager.get_metrics_summary()
+    busy_before = _node_busy(before)
+    jobs_before = {nid: node["jobs"] for nid, node in before["nodes"].items()}
+
+    def _client(index: int) -> None:
+        call, close = _caller(transport, rmi)
+        try:
+            for i in range(requests):
+                start = time.perf_counter()
+                output = call(f"{code}\n_bench = {index * requests + i}", "")
+                elapsed = time.perf_counter() - start
+                with lock:
+                    latencies.append(elapsed)
+                    verdicts[_classify(output)] += 1
+        finally:
+            close()
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=_client, args=(i,), name=f"bench-client-{i}") for i in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+
+    summary = manager.get_metrics_summary()
+    busy_after = _node_busy(summary)
+    nodes = {}
+    for nid, node in summary["nodes"].items():
+        workers = manager.nodes[int(nid)].workers
+        busy = busy_after[nid] - busy_before.get(nid, 0.0)
+        nodes[nid] = {
+            "jobs": node["jobs"] - jobs_before.get(nid, 0),
+            "utilization": round(busy / (wall * workers), 3),
+        }
+    return {
+        "requests": len(latencies),
+        "wall_seconds": round(wall, 3),
+        "throughput_rps": round(len(latencies) / wall, 2),
+        "latency_ms": {
+            "p50": round(_percentile(latencies, 0.5) * 1000, 2),
+            "p99": round(_percentile(latencies, 0.99) * 1000, 2),
+            "max": round(max(latencies, default=0.0) * 1000, 2),
+        },
+        "verdicts": dict(verdicts),
+        "nodes": nodes,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=40, help="submissions per client and workload")
+    parser.add_argument("--nodes", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=2, help="sandbox workers per node")
+    parser.add_argument("--workloads", default=",".join(WORKLOADS))
+    parser.add_argument("--transport", choices=("xmlrpc", "framed"), default="xmlrpc")
+    parser.add_argument("--rmi-mode", choices=("threads", "asyncio"), default="threads")
+    args = parser.parse_args()
+    workloads = [w.strip() for w in args.workloads.split(",") if w.strip()]
+    unknown = [w for w in workloads if w not in WORKLOADS]
+    if unknown:
+        parser.error(f"unknown workloads: {', '.join(unknown)}")
+
+    configure_logging(level="WARNING")
+    # Ports are never bound by in-process nodes; they only label the cluster
+    nodes = {nid: 9100 + nid for nid in range(1, args.nodes + 1)}
+    # Room for every client's request, so the run measures latency rather than BUSY rejections
+    queue_limit = max(16, args.clients)
+    manager = NodeManager(nodes, default_pool_size=args.workers, queue_limit_per_worker=queue_limit)
+    manager.start()
+    seed_problems(manager)
+    rmi = build_rmi_server(manager, "127.0.0.1", 0, framed_port=0, mode=args.rmi_mode)
+    rmi.start()
+    try:
+        report = {
+            "config": {
+                "clients": args.clients,
+                "requests_per_client": args.requests,
+                "nodes": args.nodes,
+                "workers_per_node": args.workers,
+                "transport": args.transport,
+                "rmi_mode": args.rmi_mode,
+            },
+            "workloads": {
+                name: run_workload(name, rmi, manager, args.clients, args.requests, args.transport)
+                for name in workloads
+            },
+        }
+    finally:
+        rmi.stop()
+        manager.stop()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Microbenchmarks for the hot paths every submission touches.
+
+- LoadBalancer: acquire/release pairs on a small cluster
+- ReplicatedStore: single-key apply, batched update_many to two peers,
+  and Merkle anti-entropy between identical and slightly diverged replicas
+- LamportClock: tick, send and receive events
+- utils.logger: a filtered-out DEBUG call, and an INFO record enqueued for
+  the writer thread
+
+Prints operations per second as JSON, so regressions show up as drops.
+
+Usage (from backend/): python benchmarks/bench_hot_paths.py [scale]
+"""
+import io
+import json
+import pathlib
+import sys
+import time
+from typing import Callable, Dict
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+
+from clock_sync import LamportClock  # noqa: E402
+from load_balancer import LoadBalancer  # noqa: E402
+from replication import ReplicatedStore  # noqa: E402
+from utils.logger import AsyncLogger  # noqa: E402
+from utils.logger import configure as configure_logging  # noqa: E402
+
+
+def _rate(op: Callable[[int], None], iterations: int) -> float:
+    start = time.perf_counter()
+    for i in range(iterations):
+        op(i)
+    return round(iterations / (time.perf_counter() - start))
+
+
+def bench_load_balancer(n: int) -> Dict[str, float]:
+    lb = LoadBalancer()
+    for nid in (1, 2, 3):
+        lb.add_node(nid, 0, capacity=2)
+
+    def _pair(_: int) -> None:
+        node = lb.acquire()
+        if node is not None:
+            lb.release(node)
+
+    return {"acquire_release_per_sec": _rate(_pair, n), "choose_node_per_sec": _rate(lambda _: lb.choose_node(), n)}
+
+
+def bench_replicated_store(n: int) -> Dict[str, float]:
+    store = ReplicatedStore(1)
+    apply_rate = _rate(lambda i: store.apply_update(f"k{i % 1000}", i, i), n)
+
+    leader, b, c = ReplicatedStore(1), ReplicatedStore(2), ReplicatedStore(3)
+    batch = {f"k{i}": i for i in range(1000)}
+    batches = max(1, n // 10000)
+    start = time.perf_counter()
+    for _ in range(batches):
+        leader.update_many(batch, [b, c], quorum="all")
+    update_many_rate = round(batches * len(batch) / (time.perf_counter() - start))
+    leader.close()
+
+    # 10k keys, 1% diverged: the repair cost should follow the diff, not the data size
+    source, replica = ReplicatedStore(1), ReplicatedStore(2)
+    for i in range(10000):
+        source.apply_update(f"k{i}", i, 1)
+        replica.apply_update(f"k{i}", i, 1)
+    rounds = max(1, n // 5000)
+    in_sync = _rate(lambda _: replica.sync_from(source), rounds)
+    start = time.perf_counter()
+    for r in range(rounds):
+        for i in range(0, 10000, 100):
+            source.apply_update(f"k{i}", r, 2 + r)
+        replica.sync_from(source)
+    diverged = round(rounds / (time.perf_counter() - start))
+    return {
+        "apply_update_per_sec": apply_rate,
+        "update_many_keys_per_sec": update_many_rate,
+        "sync_in_sync_per_sec": in_sync,
+        "sync_1pct_of_10k_per_sec": diverged,
+    }
+
+
+def bench_lamport_clock(n: int) -> Dict[str, float]:
+    clock = LamportClock(1)
+    return {
+        "tick_per_sec": _rate(lambda _: clock.tick(), n),
+        "send_per_sec": _rate(lambda _: clock.send_event(), n),
+        "receive_per_sec": _rate(lambda i: clock.receive_event(i), n),
+    }
+
+
+def bench_logger(n: int) -> Dict[str, float]:
+    logger = AsyncLogger(level="INFO", queue_size=n + 1, stream=io.StringIO())
+    filtered = _rate(lambda i: logger.log("Exec", f"debug {i}", "DEBUG"), n)
+    enqueued = _rate(lambda i: logger.log("Exec", f"info {i}"), n)
+    logger.flush()
+    return {"filtered_debug_per_sec": filtered, "enqueue_info_per_sec": enqueued}
+
+
+def main() -> None:
+    scale = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    # Hot paths log at DEBUG; measure them as they run in production, with DEBUG filtered out
+    configure_logging(level="INFO")
+    report = {
+        "iterations": scale,
+        "load_balancer": bench_load_balancer(scale),
+        "replicated_store": bench_replicated_store(scale),
+        "lamport_clock": bench_lamport_clock(scale),
+        "logger": bench_logger(scale),
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+LoadBalancer microbenchmark.
+
+Measures acquire/release decisions per second on clusters of 1k and 10k
+nodes for the indexed-heap least-load mode and power-of-two-choices, next to
+the previous approach of sorting every node on each decision.
+
+Usage (from backend/): python benchmarks/bench_load_balancer.py [decisions]
+"""
+import json
+import pathlib
+import random
+import sys
+import time
+from typing import Dict
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+
+from load_balancer import LoadBalancer  # noqa: E402
+
+
+def bench_balancer(nodes: int, decisions: int, mode: str) -> float:
+    lb = LoadBalancer(mode=mode, seed=7)
+    for nid in range(nodes):
+        lb.add_node(nid, random.randint(0, 8), capacity=random.choice((1, 2, 4)))
+    inflight = []
+    start = time.perf_counter()
+    for _ in range(decisions):
+        inflight.append(lb.acquire())
+        if len(inflight) > nodes:
+            lb.release(inflight.pop(0))
+    return decisions / (time.perf_counter() - start)
+
+
+def bench_sorted(nodes: int, decisions: int) -> float:
+    loads: Dict[int, int] = {nid: random.randint(0, 8) for nid in range(nodes)}
+    start = time.perf_counter()
+    for _ in range(decisions):
+        chosen = sorted(loads.items(), key=lambda kv: (kv[1], kv[0]))[0][0]
+        loads[chosen] += 1
+    return decisions / (time.perf_counter() - start)
+
+
+def main() -> None:
+    decisions = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    report = {"decisions": decisions, "ops_per_sec": {}}
+    for nodes in (1000, 10000):
+        report["ops_per_sec"][str(nodes)] = {
+            "heap_least_load": round(bench_balancer(nodes, decisions, "least_load")),
+            "power_of_two": round(bench_balancer(nodes, decisions, "p2c")),
+            # sorting is O(n log n) per decision; keep its sample small
+            "sorted_baseline": round(bench_sorted(nodes, max(1, decisions // 50))),
+        }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+RPC round-trips per second: XML-RPC vs the binary framed transport.
+
+Starts an RMIServer serving both transports with a trivial `echo` function
+and measures sequential calls over XML-RPC (HTTP/1.1 keep-alive),
+sequential calls over one persistent framed connection, and pipelined
+framed calls with a window of requests in flight. Prints JSON.
+
+Usage (from backend/): python benchmarks/bench_rpc.py [calls] [payload_bytes]
+"""
+import json
+import pathlib
+import sys
+import time
+import xmlrpc.client
+from collections import deque
+from typing import Any, Deque
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+
+from rmi_server import RMIServer  # noqa: E402
+from wire import PipelinedClient  # noqa: E402
+
+PIPELINE_WINDOW = 64
+
+
+def bench_xmlrpc(port: int, calls: int, payload: str) -> float:
+    proxy = xmlrpc.client.ServerProxy(f"http://127.0.0.1:{port}")
+    start = time.perf_counter()
+    for _ in range(calls):
+        proxy.echo(payload)
+    return calls / (time.perf_counter() - start)
+
+
+def bench_framed(port: int, calls: int, payload: str) -> float:
+    client = PipelinedClient("127.0.0.1", port)
+    start = time.perf_counter()
+    for _ in range(calls):
+        client.call("echo", payload)
+    elapsed = time.perf_counter() - start
+    client.close()
+    return calls / elapsed
+
+
+def bench_pipelined(port: int, calls: int, payload: str) -> float:
+    client = PipelinedClient("127.0.0.1", port)
+    window: Deque[Any] = deque()
+    start = time.perf_counter()
+    for _ in range(calls):
+        window.append(client.call_async("echo", payload))
+        if len(window) >= PIPELINE_WINDOW:
+            window.popleft().result()
+    for future in window:
+        future.result()
+    elapsed = time.perf_counter() - start
+    client.close()
+    return calls / elapsed
+
+
+def main() -> None:
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    payload = "x" * (int(sys.argv[2]) if len(sys.argv) > 2 else 512)
+    rmi = RMIServer("127.0.0.1", 0, framed_port=0)
+    rmi.register("echo", lambda value: value)
+    rmi.start()
+    try:
+        report = {
+            "calls": calls,
+            "payload_bytes": len(payload),
+            "calls_per_sec": {
+                "xmlrpc": round(bench_xmlrpc(rmi.port, calls, payload)),
+                "framed": round(bench_framed(rmi.framed_port, calls, payload)),
+                "framed_pipelined": round(bench_pipelined(rmi.framed_port, calls, payload)),
+            },
+        }
+    finally:
+        rmi.stop()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Cold-spawn vs warm-pool sandbox latency.
+
+Runs the bundled two-sum and fizzbuzz submissions sequentially through a
+fresh process per job (ProcessSandbox) and through a pre-forked WorkerPool,
+then prints p50/p99 latency in milliseconds as JSON.
+
+Usage (from backend/): python benchmarks/bench_sandbox.py [iterations]
+"""
+import json
+import pathlib
+import sys
+import time
+from typing import Dict, List
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+
+from sandbox import ProcessSandbox, WorkerPool  # noqa: E402
+
+SUBMISSIONS = {
+    "two-sum": (
+        "def two_sum(nums, target):\n"
+        "    seen = {}\n"
+        "    for i, n in enumerate(nums):\n"
+        "        if target - n in seen:\n"
+        "            return [seen[target - n], i]\n"
+        "        seen[n] = i\n",
+        "assert two_sum([2,7,11,15], 9) == [0,1]",
+    ),
+    "fizzbuzz": (
+        "def fizzbuzz(n):\n"
+        "    for i in range(1, n+1):\n"
+        "        print('FizzBuzz' if i % 15 == 0 else 'Fizz' if i % 3 == 0 else 'Buzz' if i % 5 == 0 else i)\n",
+        "fizzbuzz(15)",
+    ),
+}
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    ordered = sorted(samples)
+    idx = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[idx]
+
+
+def measure(runner, iterations: int) -> Dict[str, Dict[str, float]]:
+    report: Dict[str, Dict[str, float]] = {}
+    for name, (code, tests) in SUBMISSIONS.items():
+        samples: List[float] = []
+        for _ in range(iterations):
+            start = time.perf_counter()
+            runner.run(code, tests, 2.0)
+            samples.append((time.perf_counter() - start) * 1000.0)
+        report[name] = {
+            "p50_ms": round(percentile(samples, 50), 3),
+            "p99_ms": round(percentile(samples, 99), 3),
+        }
+    return report
+
+
+def main() -> None:
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    pool = WorkerPool(0, size=1)
+    try:
+        report = {
+            "iterations": iterations,
+            "cold_spawn": measure(ProcessSandbox(0), iterations),
+            "warm_pool": measure(pool, iterations),
+        }
+    finally:
+        pool.shutdown()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+import bisect
+import hashlib
+import json
+from typing import Any, Dict, List
+
+# Fields shown in the problem list; everything else is fetched per problem
+SUMMARY_FIELDS = ("title",)
+MAX_PAGE_SIZE = 500
+
+
+class ProblemCatalog:
+    """
+    Immutable snapshot of the problem set. `version` is a content hash
+    (an ETag): clients that already hold it get "not modified" instead of
+    the catalog, list pages carry only summaries, and full problems are
+    fetched one at a time.
+    """
+
+    def __init__(self, problems: Dict[str, Dict[str, Any]]) -> None:
+        self.problems = dict(problems)
+        blob = json.dumps(self.problems, sort_keys=True, default=str).encode("utf-8")
+        self.version = hashlib.sha256(blob).hexdigest()[:16]
+        self._keys: List[str] = sorted(self.problems)
+        self._summaries: List[Dict[str, Any]] = [self._summary(key) for key in self._keys]
+
+    def _summary(self, key: str) -> Dict[str, Any]:
+        meta = self.problems[key]
+        summary = {field: meta.get(field, key) for field in SUMMARY_FIELDS}
+        return {"key": key, **summary, "cases": len(meta.get("cases") or [])}
+
+    def page(self, if_version: str = "", cursor: str = "", limit: int = 100) -> Dict[str, Any]:
+        """Summaries of the problems after `cursor` (a key), in key order."""
+        if if_version and if_version == self.version:
+            return {"version": self.version, "not_modified": True}
+        limit = max(1, min(int(limit) or 100, MAX_PAGE_SIZE))
+        start = bisect.bisect_right(self._keys, cursor) if cursor else 0
+        items = self._summaries[start:start + limit]
+        more = start + limit < len(self._keys)
+        return {
+            "version": self.version,
+            "not_modified": False,
+            "total": len(self._keys),
+            "items": items,
+            "next_cursor": items[-1]["key"] if more and items else "",
+        }
+
+    def get(self, key: str) -> Dict[str, Any]:
+        meta = self.problems.get(key)
+        if meta is None:
+            return {}
+        return {**meta, "key": key, "version": self.version}
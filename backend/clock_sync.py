@@ -1,7 +1,11 @@
-from typing import Dict
+import threading
+from typing import Dict, Iterable, Optional, Tuple
 
 from utils.logger import log
 
+# (Lamport counter, vector timestamp or None) as carried by a message
+Stamp = Tuple[int, Optional[Dict[int, int]]]
+
 
 class LamportClock:
     """
@@ -10,30 +14,55 @@ class LamportClock:
       - Local event: c <- c + 1
       - Send event: include c in message after increment
       - Receive event: c <- max(c, received) + 1
+
+    Safe to share between threads. With `members` the clock also keeps a
+    vector timestamp over those node ids, so traces can tell concurrent
+    events from causally ordered ones.
     """
 
-    def __init__(self, node_id: int) -> None:
+    def __init__(self, node_id: int, members: Optional[Iterable[int]] = None) -> None:
         self.node_id = node_id
         self._counter = 0
+        self._lock = threading.Lock()
+        self._vector: Optional[Dict[int, int]] = None
+        if members is not None:
+            self._vector = {int(m): 0 for m in members}
+            self._vector.setdefault(node_id, 0)
+
+    def event(self, kind: str = "tick", received: Optional[Stamp] = None) -> Stamp:
+        """
+        Advance the clock for one event and return its stamp. Pass the
+        sender's stamp as `received` for receive events.
+        """
+        with self._lock:
+            if received is not None:
+                self._counter = max(self._counter, received[0])
+                if self._vector is not None and received[1]:
+                    for member, count in received[1].items():
+                        if count > self._vector.get(member, 0):
+                            self._vector[member] = count
+            self._counter += 1
+            if self._vector is not None:
+                self._vector[self.node_id] += 1
+            stamp = (self._counter, dict(self._vector) if self._vector is not None else None)
+        if received is not None:
+            log("Clock", f"node={self.node_id} {kind}({received[0]}) -> {stamp[0]}", "DEBUG")
+        else:
+            log("Clock", f"node={self.node_id} {kind} -> {stamp[0]}", "DEBUG")
+        return stamp
 
     def tick(self) -> int:
-        self._counter += 1
-        log("Clock", f"node={self.node_id} local tick -> {self._counter}")
-        return self._counter
+        return self.event("local tick")[0]
 
     def send_event(self) -> int:
-        self._counter += 1
-        log("Clock", f"node={self.node_id} send -> {self._counter}")
-        return self._counter
+        return self.event("send")[0]
 
     def receive_event(self, received_counter: int) -> int:
-        self._counter = max(self._counter, received_counter) + 1
-        log("Clock", f"node={self.node_id} recv({received_counter}) -> {self._counter}")
-        return self._counter
+        return self.event("recv", (received_counter, None))[0]
 
     def now(self) -> int:
         return self._counter
 
-
-
-
+    def vector(self) -> Optional[Dict[int, int]]:
+        with self._lock:
+            return dict(self._vector) if self._vector is not None else None
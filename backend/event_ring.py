@@ -0,0 +1,103 @@
+import asyncio
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+
+class EventRing:
+    """
+    Fixed-capacity ring buffer of runtime events with monotonically
+    increasing sequence numbers (the first event is seq 1). Readers keep the
+    last seq they saw and ask only for what came after it; events that were
+    overwritten before a reader got to them are reported as `missed`.
+    """
+
+    MAX_WAIT_SECONDS = 30.0
+
+    def __init__(self, capacity: int = 1024) -> None:
+        self.capacity = max(1, int(capacity))
+        self._slots: List[Optional[Dict[str, Any]]] = [None] * self.capacity
+        self._last_seq = 0
+        self._cond = threading.Condition()
+        # Callbacks run after every append (used by wait_async)
+        self._listeners: List[Callable[[], None]] = []
+
+    @property
+    def last_seq(self) -> int:
+        return self._last_seq
+
+    def append(self, event: Dict[str, Any]) -> int:
+        with self._cond:
+            self._last_seq += 1
+            event["seq"] = self._last_seq
+            self._slots[self._last_seq % self.capacity] = event
+            self._cond.notify_all()
+            listeners = list(self._listeners)
+        for callback in listeners:
+            callback()
+        return event["seq"]
+
+    def _since(self, since_seq: int, max_events: int) -> Dict[str, Any]:
+        # Caller holds self._cond
+        since_seq = self._normalize(since_seq)
+        oldest = max(1, self._last_seq - self.capacity + 1)
+        start = max(since_seq + 1, oldest)
+        end = min(self._last_seq, start + max(1, max_events) - 1)
+        events = [self._slots[seq % self.capacity] for seq in range(start, end + 1)]
+        return {
+            "events": events,
+            # Pass next_seq back as since_seq to continue where this page ended
+            "next_seq": end if events else max(since_seq, 0),
+            "last_seq": self._last_seq,
+            "missed": max(0, start - since_seq - 1) if since_seq < self._last_seq else 0,
+        }
+
+    def _normalize(self, since_seq: int) -> int:
+        # A cursor from before a backend restart is ahead of us: start over
+        return 0 if since_seq > self._last_seq else since_seq
+
+    def since(self, since_seq: int = 0, max_events: int = 200) -> Dict[str, Any]:
+        with self._cond:
+            return self._since(int(since_seq), int(max_events))
+
+    def recent(self, count: int) -> List[Dict[str, Any]]:
+        """The last `count` events, oldest first."""
+        with self._cond:
+            return self._since(self._last_seq - max(0, int(count)), count)["events"]
+
+    def wait(self, since_seq: int = 0, max_events: int = 200, timeout: float = 10.0) -> Dict[str, Any]:
+        """Like since(), but blocks up to `timeout` until there is something newer than since_seq."""
+        deadline = time.time() + max(0.0, min(timeout, self.MAX_WAIT_SECONDS))
+        with self._cond:
+            since_seq = self._normalize(int(since_seq))
+            while self._last_seq <= since_seq:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            return self._since(int(since_seq), int(max_events))
+
+    async def wait_async(self, since_seq: int = 0, max_events: int = 200, timeout: float = 10.0) -> Dict[str, Any]:
+        """Event-loop version of wait: no thread is parked while nothing happens."""
+        since_seq = self._normalize(int(since_seq))
+        if self._last_seq <= since_seq:
+            loop = asyncio.get_running_loop()
+            arrived = asyncio.Event()
+
+            def _notify() -> None:
+                try:
+                    loop.call_soon_threadsafe(arrived.set)
+                except RuntimeError:
+                    pass  # loop already closed
+
+            with self._cond:
+                self._listeners.append(_notify)
+            try:
+                if self._last_seq <= since_seq:
+                    await asyncio.wait_for(arrived.wait(), max(0.0, min(timeout, self.MAX_WAIT_SECONDS)))
+            except asyncio.TimeoutError:
+                pass
+            finally:
+                with self._cond:
+                    self._listeners.remove(_notify)
+        return self.since(since_seq, max_events)
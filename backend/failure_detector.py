@@ -0,0 +1,78 @@
+import math
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional
+
+
+class _History:
+    def __init__(self, window: int, first_interval: float) -> None:
+        self.intervals: Deque[float] = deque([first_interval], maxlen=window)
+        self.last: Optional[float] = None
+
+
+class PhiAccrualDetector:
+    """
+    Phi accrual failure detector (Hayashibara et al.). Instead of a fixed
+    timeout it reports a suspicion level phi from the time since the last
+    heartbeat, given the observed distribution of heartbeat intervals:
+    phi = -log10(P(next heartbeat arrives later than now)). A node whose phi
+    exceeds `threshold` is considered failed.
+    """
+
+    def __init__(
+        self,
+        threshold: float = 8.0,
+        window: int = 100,
+        expected_interval: float = 0.1,
+        min_std: float = 0.05,
+        acceptable_pause: float = 0.2,
+    ) -> None:
+        self.threshold = threshold
+        self.window = window
+        self.expected_interval = expected_interval
+        self.min_std = min_std
+        self.acceptable_pause = acceptable_pause
+        self._nodes: Dict[int, _History] = {}
+        self._lock = threading.Lock()
+
+    def heartbeat(self, node_id: int, now: Optional[float] = None) -> None:
+        now = time.time() if now is None else now
+        with self._lock:
+            hist = self._nodes.get(node_id)
+            if hist is None:
+                hist = self._nodes[node_id] = _History(self.window, self.expected_interval)
+            elif hist.last is not None:
+                hist.intervals.append(now - hist.last)
+            hist.last = now
+
+    def phi(self, node_id: int, now: Optional[float] = None) -> float:
+        now = time.time() if now is None else now
+        with self._lock:
+            hist = self._nodes.get(node_id)
+            if hist is None or hist.last is None:
+                return 0.0
+            intervals = list(hist.intervals)
+            elapsed = now - hist.last
+        mean = sum(intervals) / len(intervals)
+        std = max(math.sqrt(sum((x - mean) ** 2 for x in intervals) / len(intervals)), self.min_std)
+        mean += self.acceptable_pause
+        # Logistic approximation of the normal CDF tail
+        y = min(max((elapsed - mean) / std, -10.0), 10.0)
+        e = math.exp(-y * (1.5976 + 0.070566 * y * y))
+        if elapsed > mean:
+            return -math.log10(e / (1.0 + e))
+        return -math.log10(1.0 - 1.0 / (1.0 + e))
+
+    def is_available(self, node_id: int, now: Optional[float] = None) -> bool:
+        return self.phi(node_id, now) < self.threshold
+
+    def suspects(self, now: Optional[float] = None) -> List[int]:
+        with self._lock:
+            ids = list(self._nodes)
+        return [nid for nid in ids if not self.is_available(nid, now)]
+
+    def remove(self, node_id: int) -> None:
+        """Forget a node's history (on failover, or before it rejoins)."""
+        with self._lock:
+            self._nodes.pop(node_id, None)
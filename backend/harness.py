@@ -0,0 +1,42 @@
+import marshal
+from types import CodeType
+from typing import Dict, Optional, Tuple
+
+
+class CompiledHarness:
+    """
+    A problem's test harness (and starter code) compiled once to code objects.
+    `cache_id` changes with the problem version so sandbox workers never run a
+    stale harness; `payload` is the marshaled form shipped to worker processes.
+    """
+
+    def __init__(self, problem_key: str, version: int, tests_src: str, starter_src: str = "") -> None:
+        self.problem_key = problem_key
+        self.version = version
+        self.cache_id = f"{problem_key}@{version}"
+        self.tests_src = tests_src
+        self.starter_src = starter_src
+        self.tests: CodeType = compile(tests_src, f"<tests:{problem_key}>", "exec")
+        self.starter: Optional[CodeType] = (
+            compile(starter_src, f"<starter:{problem_key}>", "exec") if starter_src.strip() else None
+        )
+        self.payload = marshal.dumps((self.tests, self.starter))
+
+
+class HarnessCache:
+    """Per-process cache of unmarshaled harnesses, keyed by cache_id."""
+
+    def __init__(self, capacity: int = 64) -> None:
+        self.capacity = capacity
+        self._entries: Dict[str, Tuple[CodeType, Optional[CodeType]]] = {}
+
+    def load(self, cache_id: str, payload: Optional[bytes]) -> Tuple[CodeType, Optional[CodeType]]:
+        entry = self._entries.get(cache_id)
+        if entry is None:
+            if payload is None:
+                raise KeyError(cache_id)
+            if len(self._entries) >= self.capacity:
+                self._entries.clear()
+            entry = marshal.loads(payload)
+            self._entries[cache_id] = entry
+        return entry
@@ -1,37 +1,154 @@
-from typing import Dict, Optional
+import random
+import threading
+from typing import Dict, List, Optional, Tuple
 
 from utils.logger import log
 
 
 class LoadBalancer:
     """
-    Minimal least-load balancer. Tracks node_id -> load (int) and returns the
-    node with the smallest load.
+    Least-load balancer. Tracks node_id -> load (int) and returns the node
+    with the smallest load relative to its capacity weight.
+
+    Active nodes live in an indexed binary min-heap keyed by
+    (load / capacity, node_id), so an update is O(log n) and the least-loaded
+    node is at the root. With mode="p2c" (power of two choices) two random
+    nodes are sampled and the lighter one wins, which avoids herding on a
+    single node in large clusters. `acquire` picks a node and increments its
+    load under one lock so concurrent callers never see the same stale
+    minimum.
     """
 
-    def __init__(self) -> None:
+    def __init__(self, mode: str = "least_load", seed: Optional[int] = None) -> None:
+        if mode not in ("least_load", "p2c"):
+            raise ValueError(f"unknown balancer mode: {mode}")
+        self.mode = mode
         self.node_loads: Dict[int, int] = {}
+        self._capacity: Dict[int, float] = {}
+        self._heap: List[int] = []
+        self._pos: Dict[int, int] = {}
+        self._lock = threading.Lock()
+        self._rng = random.Random(seed)
+
+    # Indexed heap helpers (caller holds self._lock)
+    def _key(self, node_id: int) -> Tuple[float, int]:
+        return (self.node_loads[node_id] / self._capacity.get(node_id, 1.0), node_id)
+
+    def _swap(self, i: int, j: int) -> None:
+        heap = self._heap
+        heap[i], heap[j] = heap[j], heap[i]
+        self._pos[heap[i]] = i
+        self._pos[heap[j]] = j
+
+    def _sift_up(self, i: int) -> None:
+        while i > 0:
+            parent = (i - 1) // 2
+            if self._key(self._heap[i]) >= self._key(self._heap[parent]):
+                break
+            self._swap(i, parent)
+            i = parent
+
+    def _sift_down(self, i: int) -> None:
+        n = len(self._heap)
+        while True:
+            smallest = i
+            for child in (2 * i + 1, 2 * i + 2):
+                if child < n and self._key(self._heap[child]) < self._key(self._heap[smallest]):
+                    smallest = child
+            if smallest == i:
+                return
+            self._swap(i, smallest)
+            i = smallest
+
+    def _reposition(self, node_id: int) -> None:
+        i = self._pos[node_id]
+        self._sift_up(i)
+        self._sift_down(self._pos[node_id])
+
+    def _set_load(self, node_id: int, load: int) -> None:
+        self.node_loads[node_id] = max(0, load)
+        if node_id in self._pos:
+            self._reposition(node_id)
+        else:
+            self._heap.append(node_id)
+            self._pos[node_id] = len(self._heap) - 1
+            self._sift_up(len(self._heap) - 1)
+
+    def _pick(self) -> Optional[int]:
+        if not self._heap:
+            return None
+        if self.mode == "p2c" and len(self._heap) > 2:
+            a, b = self._rng.sample(self._heap, 2)
+            return a if self._key(a) <= self._key(b) else b
+        return self._heap[0]
+
+    # Public API
+    def add_node(self, node_id: int, load: int = 0, capacity: float = 1.0) -> None:
+        with self._lock:
+            self._capacity[node_id] = max(float(capacity), 1e-9)
+            self._set_load(node_id, load)
+        log("LoadBalancer", f"add node={node_id} capacity={capacity}", "DEBUG")
+
+    def remove_node(self, node_id: int) -> None:
+        with self._lock:
+            i = self._pos.pop(node_id, None)
+            self.node_loads.pop(node_id, None)
+            if i is None:
+                return
+            last = self._heap.pop()
+            if i < len(self._heap):
+                self._heap[i] = last
+                self._pos[last] = i
+                self._reposition(last)
+        log("LoadBalancer", f"remove node={node_id}", "DEBUG")
+
+    def set_capacity(self, node_id: int, capacity: float) -> None:
+        with self._lock:
+            self._capacity[node_id] = max(float(capacity), 1e-9)
+            if node_id in self._pos:
+                self._reposition(node_id)
 
     def update_load(self, node_id: int, load: int) -> None:
-        self.node_loads[node_id] = load
-        log("LoadBalancer", f"update node={node_id} load={load}")
+        with self._lock:
+            self._set_load(node_id, load)
+        log("LoadBalancer", f"update node={node_id} load={load}", "DEBUG")
+
+    def adjust(self, node_id: int, delta: int) -> int:
+        """Atomically add `delta` to a node's load and return the new load."""
+        with self._lock:
+            if node_id not in self._pos:
+                return 0
+            self._set_load(node_id, self.node_loads[node_id] + delta)
+            return self.node_loads[node_id]
+
+    def acquire(self) -> Optional[int]:
+        """Choose a node and count one unit of work against it atomically."""
+        with self._lock:
+            chosen = self._pick()
+            if chosen is not None:
+                self._set_load(chosen, self.node_loads[chosen] + 1)
+        log("LoadBalancer", f"acquired node={chosen}", "DEBUG")
+        return chosen
+
+    def release(self, node_id: int) -> int:
+        return self.adjust(node_id, -1)
+
+    def load_of(self, node_id: int) -> int:
+        return self.node_loads.get(node_id, 0)
 
     def choose_node(self) -> Optional[int]:
-        if not self.node_loads:
-            return None
-        # Least-load (ties broken by smallest id for determinism)
-        chosen = sorted(self.node_loads.items(), key=lambda kv: (kv[1], kv[0]))[0][0]
-        log("LoadBalancer", f"chosen node={chosen}")
+        with self._lock:
+            chosen = self._pick()
+        log("LoadBalancer", f"chosen node={chosen}", "DEBUG")
         return chosen
 
     def choose_from(self, allowed_node_ids: list[int]) -> Optional[int]:
         if not allowed_node_ids:
             return None
-        candidates = [(nid, self.node_loads.get(nid, 0)) for nid in allowed_node_ids]
-        chosen = sorted(candidates, key=lambda kv: (kv[1], kv[0]))[0][0]
-        log("LoadBalancer", f"chosen among {allowed_node_ids} -> node={chosen}")
+        with self._lock:
+            chosen = min(
+                allowed_node_ids,
+                key=lambda nid: (self.node_loads.get(nid, 0) / self._capacity.get(nid, 1.0), nid),
+            )
+        log("LoadBalancer", f"chosen among {allowed_node_ids} -> node={chosen}", "DEBUG")
         return chosen
-
-
-
-
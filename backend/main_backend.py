@@ -1,13 +1,46 @@
+import argparse
+import os
 import random
 import threading
 import time
-from typing import Dict
+from typing import Dict, Optional
 
 from node_manager import NodeManager
+from node_worker import spawn_node_processes, wait_until_listening
 from rmi_server import RMIServer
+from sandbox import DEFAULT_OUTPUT_LIMIT_BYTES
+from utils.logger import configure as configure_logging
 from utils.logger import log
 
 
+# Problem catalog surfaced to the frontend via RMI
+PROBLEMS = {
+    "two-sum": {
+        "title": "Two Sum",
+        "prompt": "Given nums and target, return indices of two numbers that add to target.",
+        "starter_code": "def two_sum(nums, target):\n    return [-1, -1]",
+        "tests": "assert two_sum([2,7,11,15], 9) == [0,1]",
+        # Structured cases: `input` is evaluated after the user's code and its
+        # repr (or printed output when it returns None) must equal `expected`
+        "cases": [
+            {"input": "two_sum([2,7,11,15], 9)", "expected": "[0, 1]", "time_limit": 1.0},
+            {"input": "two_sum([3,2,4], 6)", "expected": "[1, 2]", "time_limit": 1.0},
+            {"input": "two_sum([3,3], 6)", "expected": "[0, 1]", "time_limit": 1.0},
+        ],
+    },
+    "fizzbuzz": {
+        "title": "FizzBuzz",
+        "prompt": "Print numbers 1..n, replacing multiples of 3 with Fizz, 5 with Buzz.",
+        "starter_code": "def fizzbuzz(n):\n    for i in range(1, n+1):\n        print(i)",
+        "tests": "fizzbuzz(15)",
+        "cases": [
+            {"input": "fizzbuzz(5)", "expected": "1\n2\nFizz\n4\nBuzz", "time_limit": 1.0},
+            {"input": "fizzbuzz(15)", "expected": "1\n2\nFizz\n4\nBuzz\nFizz\n7\n8\nFizz\nBuzz\n11\nFizz\n13\n14\nFizzBuzz", "time_limit": 1.0},
+        ],
+    },
+}
+
+
 def simulate_execution(node_manager: NodeManager):
     # Wire RMI calls to real execution through the node manager
     def _processor(code: str, tests: str) -> str:
@@ -15,46 +48,117 @@ def simulate_execution(node_manager: NodeManager):
     return _processor
 
 
-def main() -> None:
-    # Local cluster config
-    nodes: Dict[int, int] = {1: 9101, 2: 9102, 3: 9103}
-    manager = NodeManager(nodes)
-    manager.start()
-
+def seed_problems(manager: NodeManager) -> None:
     # Prepare some replicated data (problems/tests)
-    # Problem catalog surfaced to the frontend via RMI
-    problems = {
-        "two-sum": {
-            "title": "Two Sum",
-            "prompt": "Given nums and target, return indices of two numbers that add to target.",
-            "starter_code": "def two_sum(nums, target):\n    return [-1, -1]",
-            "tests": "assert two_sum([2,7,11,15], 9) == [0,1]",
-        },
-        "fizzbuzz": {
-            "title": "FizzBuzz",
-            "prompt": "Print numbers 1..n, replacing multiples of 3 with Fizz, 5 with Buzz.",
-            "starter_code": "def fizzbuzz(n):\n    for i in range(1, n+1):\n        print(i)",
-            "tests": "fizzbuzz(15)",
-        },
-    }
-    manager.set_problems(problems)
-    manager.replicate_problem("two-sum", "Find two numbers that add to target")
-    manager.replicate_problem("fizzbuzz", "Print 1..n replacing multiples of 3/5")
+    manager.set_problems(PROBLEMS)
+    manager.replicate_many({
+        "two-sum": "Find two numbers that add to target",
+        "fizzbuzz": "Print 1..n replacing multiples of 3/5",
+    })
 
-    # Start RMI endpoint for submissions
-    rmi = RMIServer("127.0.0.1", 9000)
+
+def build_rmi_server(
+    manager: NodeManager, host: str, port: int, framed_port: Optional[int] = None, mode: str = "threads"
+) -> RMIServer:
+    """RMIServer with every backend RPC bound to `manager` (not started yet)."""
+    rmi = RMIServer(host, port, framed_port=framed_port, mode=mode)
     rmi.bind_processor(simulate_execution(manager))
+    rmi.bind_async_processor(manager.submit_async)
+    rmi.bind_awaitable_processor(manager.aexecute_submission)
+    rmi.bind_admission(manager.retry_after)
+    # RPC latency per method, and GET /metrics on the XML-RPC port
+    rmi.bind_metrics(manager.metrics)
     # Expose helpful cluster functions
     rmi.register("list_problems", manager.list_problems)
+    rmi.register("get_problem", manager.get_problem)
     rmi.register("get_cluster_status", manager.get_status)
     rmi.register("get_runtime_metrics", manager.get_runtime_metrics)
+    rmi.register("get_metrics_summary", manager.get_metrics_summary)
+    rmi.register("get_runtime_events", manager.get_runtime_events)
+    rmi.register("wait_runtime_events", manager.wait_runtime_events)
+    rmi.register("export_trace", manager.export_trace)
     rmi.register("crash_node", manager.crash_node)
     rmi.register("recover_node", manager.recover_node)
     rmi.register("force_election", manager.force_election)
     rmi.register("submit_batch", manager.submit_batch)
+    rmi.register("submit_many", manager.submit_many)
+    rmi.register("submit_many_async", manager.submit_many_async)
+    rmi.register("submit_problem", manager.execute_problem)
+    rmi.register("submit_problem_async", manager.submit_problem_async)
+    rmi.register("judge_problem", manager.judge_problem)
+    rmi.register("get_result", manager.get_result)
+    rmi.register("wait_results", manager.wait_results)
+    rmi.register("list_submissions", manager.list_submissions)
+    # Awaited on the event loop in asyncio mode instead of holding a thread
+    rmi.register_async("submit_problem", manager.aexecute_problem)
+    rmi.register_async("wait_results", manager.await_results)
+    rmi.register_async("wait_runtime_events", manager.await_runtime_events)
+    return rmi
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Distributed Judge backend")
+    parser.add_argument(
+        "--node-processes",
+        action="store_true",
+        default=os.environ.get("JUDGE_NODE_PROCESSES") == "1",
+        help="run each evaluator node as a separate process listening on its port",
+    )
+    parser.add_argument(
+        "--rmi-mode",
+        choices=("threads", "asyncio"),
+        default=os.environ.get("JUDGE_RMI_MODE", "threads"),
+        help="threads: one thread per request; asyncio: one event loop for all connections",
+    )
+    parser.add_argument(
+        "--db",
+        default=os.environ.get("JUDGE_SUBMISSION_DB", "submissions.db"),
+        help="SQLite file for the submission history (':memory:' keeps it in memory)",
+    )
+    parser.add_argument(
+        "--vector-clocks",
+        action="store_true",
+        default=os.environ.get("JUDGE_VECTOR_CLOCKS") == "1",
+        help="stamp trace events with vector clocks as well as Lamport clocks",
+    )
+    args = parser.parse_args()
+    # JUDGE_LOG_LEVEL=DEBUG shows per-event clock/balancer/exec logs (sampled)
+    configure_logging(
+        level=os.environ.get("JUDGE_LOG_LEVEL", "INFO"),
+        json_path=os.environ.get("JUDGE_LOG_JSON") or None,
+    )
+    # Local cluster config
+    nodes: Dict[int, int] = {1: 9101, 2: 9102, 3: 9103}
+    # Warm sandbox workers per node (defaults to 2 for unlisted nodes)
+    pool_sizes: Dict[int, int] = {1: 2, 2: 2, 3: 2}
+    # Sandbox limits, enforced in-process or by the node processes
+    limits = {"max_jobs_per_worker": 200, "max_rss_mb": 256, "output_limit_bytes": DEFAULT_OUTPUT_LIMIT_BYTES}
+    node_procs = spawn_node_processes(nodes, pool_sizes, **limits) if args.node_processes else {}
+    if node_procs and not wait_until_listening(nodes):
+        log("Main", "some node processes did not start listening in time", "WARNING")
+    manager = NodeManager(
+        nodes,
+        pool_sizes=pool_sizes,
+        max_jobs_per_worker=limits["max_jobs_per_worker"],
+        max_worker_rss_mb=limits["max_rss_mb"],
+        output_limit_bytes=limits["output_limit_bytes"],
+        batch_limit=5000,
+        queue_limit_per_worker=16,
+        remote=args.node_processes,
+        submission_db=args.db,
+        vector_clocks=args.vector_clocks,
+    )
+    manager.start()
+
+    # Problem catalog surfaced to the frontend via RMI, and replicated problem data
+    seed_problems(manager)
+
+    # Start RMI endpoint for submissions
+    # XML-RPC on 9000 for compatibility, binary framed transport on 9001
+    rmi = build_rmi_server(manager, "127.0.0.1", 9000, framed_port=9001, mode=args.rmi_mode)
     rmi.start()
 
-    log("Main", "Distributed Judge backend started on 127.0.0.1:9000")
+    log("Main", "Distributed Judge backend started on 127.0.0.1:9000 (framed: 9001)")
     # Keep main thread alive
     try:
         while True:
@@ -62,6 +166,10 @@ def main() -> None:
     except KeyboardInterrupt:
         log("Main", "shutdown requested")
         manager.stop()
+        for proc in node_procs.values():
+            proc.terminate()
+        for proc in node_procs.values():
+            proc.wait(timeout=5)
 
 
 if __name__ == "__main__":
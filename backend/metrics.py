@@ -0,0 +1,202 @@
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# Labels are kept as a sorted tuple of (name, value) pairs so they can key dicts
+Labels = Tuple[Tuple[str, str], ...]
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+# 2**SUB_BUCKET_BITS linear sub-buckets per power of two: ~1.6% worst-case error
+SUB_BUCKET_BITS = 7
+_SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+_HALF = _SUB_BUCKETS >> 1
+
+
+def _labels(labels: Optional[Dict[str, object]]) -> Labels:
+    return tuple(sorted((k, str(v)) for k, v in (labels or {}).items()))
+
+
+def _format_labels(labels: Labels, extra: Iterable[Tuple[str, str]] = ()) -> str:
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in pairs) + "}"
+
+
+class Counter:
+    def __init__(self) -> None:
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: int = 1) -> None:
+        with self._lock:
+            self.value += amount
+
+
+class Histogram:
+    """
+    HDR-style latency histogram over microseconds: values below
+    2**SUB_BUCKET_BITS get exact buckets, larger ones fall into log-linear
+    buckets (each power of two split into 64 sub-buckets), so memory stays
+    small and percentiles keep a bounded relative error at any scale.
+    """
+
+    def __init__(self) -> None:
+        self._counts: Dict[int, int] = {}
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _index(micros: int) -> int:
+        if micros < _SUB_BUCKETS:
+            return micros
+        shift = micros.bit_length() - SUB_BUCKET_BITS
+        return _SUB_BUCKETS + (shift - 1) * _HALF + ((micros >> shift) - _HALF)
+
+    @staticmethod
+    def _upper_bound(index: int) -> int:
+        # Largest microsecond value that lands in bucket `index`
+        if index < _SUB_BUCKETS:
+            return index
+        shift = (index - _SUB_BUCKETS) // _HALF + 1
+        mantissa = (index - _SUB_BUCKETS) % _HALF + _HALF
+        return ((mantissa + 1) << shift) - 1
+
+    def observe(self, seconds: float) -> None:
+        seconds = max(0.0, seconds)
+        index = self._index(int(seconds * 1_000_000))
+        with self._lock:
+            self._counts[index] = self._counts.get(index, 0) + 1
+            self.count += 1
+            self.total += seconds
+            if seconds > self.max:
+                self.max = seconds
+
+    def percentiles(self, quantiles: Iterable[float] = QUANTILES) -> Dict[float, float]:
+        """Seconds at or below which each quantile of the observations falls."""
+        with self._lock:
+            counts = sorted(self._counts.items())
+            total = self.count
+        result: Dict[float, float] = {}
+        for q in quantiles:
+            if not total:
+                result[q] = 0.0
+                continue
+            rank = max(1, int(q * total + 0.5))
+            seen = 0
+            for index, n in counts:
+                seen += n
+                if seen >= rank:
+                    result[q] = self._upper_bound(index) / 1_000_000
+                    break
+        return result
+
+
+class MetricsRegistry:
+    """
+    Counters and histograms keyed by name and labels, each with its own small
+    lock, so recording never touches the NodeManager lock. Gauges are
+    callbacks evaluated at scrape time. `render` produces the Prometheus text
+    format (histograms as summaries with p50/p95/p99); `summary` the compact
+    dict served by get_metrics_summary.
+    """
+
+    def __init__(self, prefix: str = "judge") -> None:
+        self.prefix = prefix
+        self.started = time.time()
+        self._help: Dict[str, Tuple[str, str]] = {}
+        self._counters: Dict[str, Dict[Labels, Counter]] = {}
+        self._histograms: Dict[str, Dict[Labels, Histogram]] = {}
+        self._gauges: Dict[str, Callable[[], Dict[Labels, float]]] = {}
+        self._lock = threading.Lock()
+
+    def describe(self, name: str, kind: str, help_text: str) -> None:
+        self._help[name] = (kind, help_text)
+
+    def counter(self, name: str, labels: Optional[Dict[str, object]] = None) -> Counter:
+        key = _labels(labels)
+        series = self._counters.get(name, {})
+        counter = series.get(key)
+        if counter is None:
+            with self._lock:
+                counter = self._counters.setdefault(name, {}).setdefault(key, Counter())
+        return counter
+
+    def histogram(self, name: str, labels: Optional[Dict[str, object]] = None) -> Histogram:
+        key = _labels(labels)
+        series = self._histograms.get(name, {})
+        histogram = series.get(key)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(name, {}).setdefault(key, Histogram())
+        return histogram
+
+    def inc(self, name: str, labels: Optional[Dict[str, object]] = None, amount: int = 1) -> None:
+        self.counter(name, labels).inc(amount)
+
+    def observe(self, name: str, seconds: float, labels: Optional[Dict[str, object]] = None) -> None:
+        self.histogram(name, labels).observe(seconds)
+
+    def gauge(self, name: str, help_text: str, read: Callable[[], Dict[Labels, float]]) -> None:
+        self.describe(name, "gauge", help_text)
+        self._gauges[name] = read
+
+    def _series(self) -> Tuple[Dict[str, Dict[Labels, Counter]], Dict[str, Dict[Labels, Histogram]]]:
+        with self._lock:
+            counters = {name: dict(series) for name, series in self._counters.items()}
+            histograms = {name: dict(series) for name, series in self._histograms.items()}
+        return counters, histograms
+
+    def render(self) -> str:
+        counters, histograms = self._series()
+        lines: List[str] = []
+
+        def _head(name: str, default_kind: str) -> str:
+            full = f"{self.prefix}_{name}"
+            kind, help_text = self._help.get(name, (default_kind, name))
+            lines.append(f"# HELP {full} {help_text}")
+            lines.append(f"# TYPE {full} {kind}")
+            return full
+
+        for name in sorted(counters):
+            full = _head(name, "counter")
+            for labels, counter in sorted(counters[name].items()):
+                lines.append(f"{full}{_format_labels(labels)} {counter.value}")
+        for name in sorted(histograms):
+            full = _head(name, "summary")
+            for labels, histogram in sorted(histograms[name].items()):
+                for q, value in histogram.percentiles().items():
+                    lines.append(f"{full}{_format_labels(labels, [('quantile', str(q))])} {value:.6f}")
+                lines.append(f"{full}_sum{_format_labels(labels)} {histogram.total:.6f}")
+                lines.append(f"{full}_count{_format_labels(labels)} {histogram.count}")
+        for name in sorted(self._gauges):
+            full = _head(name, "gauge")
+            for labels, value in sorted(self._gauges[name]().items()):
+                lines.append(f"{full}{_format_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+    def summary(self) -> Dict[str, Dict[str, Dict[str, float]]]:
+        """
+        {metric: {label values joined by ",": {...}}}: counters map to their
+        value, histograms to count, mean, max, p50, p95 and p99 (seconds).
+        """
+        counters, histograms = self._series()
+        out: Dict[str, Dict[str, Dict[str, float]]] = {}
+        for name, series in counters.items():
+            out[name] = {",".join(v for _, v in labels) or "all": {"value": c.value} for labels, c in series.items()}
+        for name, series in histograms.items():
+            out[name] = {}
+            for labels, histogram in series.items():
+                p = histogram.percentiles()
+                out[name][",".join(v for _, v in labels) or "all"] = {
+                    "count": histogram.count,
+                    "mean": round(histogram.total / histogram.count, 6) if histogram.count else 0.0,
+                    "max": round(histogram.max, 6),
+                    "p50": p[0.5],
+                    "p95": p[0.95],
+                    "p99": p[0.99],
+                }
+        return out
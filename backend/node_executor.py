@@ -0,0 +1,192 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+
+class QueueFull(Exception):
+    pass
+
+
+class Job:
+    """
+    A unit of work routed to a node. `work` receives the sandbox pool of the
+    node that actually runs it; timestamps split queue wait from execution.
+    """
+
+    def __init__(self, task_id: int, work: Callable[[Any], Any]) -> None:
+        self.task_id = task_id
+        self.work = work
+        self.future: "Future[Any]" = Future()
+        self.node_id: Optional[int] = None
+        self.enqueued = time.time()
+        self.stolen_from: Optional[int] = None
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self.retries = 0
+        # Submission this attempt belongs to, and the Lamport stamp of the
+        # last message that carried the job (dispatch, handoff or reply)
+        self.trace = task_id
+        self.stamp: Any = None
+        # Set by the dispatcher: re-runs the work elsewhere if this node fails
+        self.on_failover: Optional[Callable[[], None]] = None
+        self._settled = False
+        self._settle_lock = threading.Lock()
+
+    def settle(self) -> bool:
+        """
+        Claim the right to report this attempt's outcome. Completion and
+        failover race for it; only the first caller gets True.
+        """
+        with self._settle_lock:
+            if self._settled:
+                return False
+            self._settled = True
+            return True
+
+    def queue_wait(self) -> float:
+        end = self.started if self.started is not None else (self.finished or time.time())
+        return max(0.0, end - self.enqueued)
+
+    def exec_time(self) -> float:
+        if self.started is None:
+            return 0.0
+        return max(0.0, (self.finished or time.time()) - self.started)
+
+
+class NodeExecutor:
+    """
+    Fixed set of worker threads for one node fed from a bounded FIFO queue.
+    `submit` raises QueueFull instead of letting the backlog grow, and
+    `depth` reports queued and running work separately for routing.
+
+    With a `steal` hook, a worker that has been idle for `steal_interval`
+    asks it for a job queued on another node; victims give up their newest
+    queued job via `steal()`.
+    """
+
+    def __init__(
+        self,
+        node_id: int,
+        workers: int,
+        queue_limit: int,
+        run_job: Callable[[int, Job], Any],
+        steal: Optional[Callable[[int], Optional[Job]]] = None,
+        steal_interval: float = 0.05,
+    ) -> None:
+        self.node_id = node_id
+        self.workers = max(1, int(workers))
+        self.queue_limit = max(1, int(queue_limit))
+        self._run_job = run_job
+        self._steal = steal
+        self.steal_interval = steal_interval
+        self._queue: Deque[Job] = deque()
+        self._cond = threading.Condition()
+        self._running = 0
+        self._active: Dict[int, Job] = {}
+        self._shutdown = False
+        self._threads: List[threading.Thread] = []
+        for i in range(self.workers):
+            t = threading.Thread(target=self._worker_loop, name=f"N{node_id}_{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def submit(self, job: Job) -> None:
+        with self._cond:
+            if self._shutdown:
+                raise RuntimeError(f"node {self.node_id} executor is shut down")
+            if len(self._queue) >= self.queue_limit:
+                raise QueueFull(f"node {self.node_id} queue full ({self.queue_limit})")
+            job.node_id = self.node_id
+            self._queue.append(job)
+            self._cond.notify()
+
+    def _next_job(self) -> Optional[Job]:
+        while True:
+            with self._cond:
+                if not self._queue and not self._shutdown:
+                    self._cond.wait(self.steal_interval if self._steal else None)
+                if self._shutdown:
+                    return None
+                if self._queue:
+                    job = self._queue.popleft()
+                    self._running += 1
+                    self._active[job.task_id] = job
+                    return job
+            if self._steal is not None:
+                job = self._steal(self.node_id)
+                if job is not None:
+                    with self._cond:
+                        job.node_id = self.node_id
+                        self._running += 1
+                        self._active[job.task_id] = job
+                    return job
+
+    def steal(self) -> Optional[Job]:
+        """Give up the most recently queued job to an idle node."""
+        with self._cond:
+            if self._shutdown or not self._queue:
+                return None
+            return self._queue.pop()
+
+    def _worker_loop(self) -> None:
+        while True:
+            job = self._next_job()
+            if job is None:
+                return
+            try:
+                if job.future.set_running_or_notify_cancel():
+                    job.started = time.time()
+                    try:
+                        result = self._run_job(self.node_id, job)
+                    except BaseException as ex:  # noqa: BLE001
+                        job.finished = time.time()
+                        job.future.set_exception(ex)
+                    else:
+                        job.finished = time.time()
+                        job.future.set_result(result)
+            finally:
+                with self._cond:
+                    self._running -= 1
+                    self._active.pop(job.task_id, None)
+
+    def depth(self) -> Dict[str, int]:
+        with self._cond:
+            return {"queued": len(self._queue), "running": self._running}
+
+    def running_jobs(self) -> List[Job]:
+        with self._cond:
+            return list(self._active.values())
+
+    def is_full(self) -> bool:
+        with self._cond:
+            return len(self._queue) >= self.queue_limit
+
+    @property
+    def is_shutdown(self) -> bool:
+        return self._shutdown
+
+    def is_healthy(self, timeout: float = 0.1) -> bool:
+        """Running, every worker thread alive and the queue lock not wedged."""
+        if self._shutdown or not all(t.is_alive() for t in self._threads):
+            return False
+        if not self._cond.acquire(timeout=timeout):
+            return False
+        self._cond.release()
+        return True
+
+    def shutdown(self, cancel_futures: bool = True) -> List[Job]:
+        """
+        Stop the worker threads and return the queued jobs, cancelled unless
+        `cancel_futures` is False (so the caller can requeue them elsewhere).
+        """
+        with self._cond:
+            self._shutdown = True
+            pending = list(self._queue)
+            self._queue.clear()
+            self._cond.notify_all()
+        if cancel_futures:
+            for job in pending:
+                job.future.cancel()
+        return pending
@@ -1,22 +1,34 @@
-import io
+import asyncio
 import random
 import threading
 import time
-from concurrent.futures import ThreadPoolExecutor, TimeoutError
-from contextlib import redirect_stdout
-from typing import Any, Dict, List, Optional
+from concurrent.futures import CancelledError, Future
+from typing import Any, Callable, Dict, Iterator, List, Optional, Union
 
+from catalog import ProblemCatalog
 from clock_sync import LamportClock
 from election import BullyElection
+from event_ring import EventRing
+from failure_detector import PhiAccrualDetector
+from harness import CompiledHarness
 from load_balancer import LoadBalancer
+from metrics import MetricsRegistry
+from node_executor import Job, NodeExecutor, QueueFull
+from node_worker import NodeUnavailable, RemotePool
 from replication import ReplicatedStore
+from result_table import ResultTable
+from sandbox import DEFAULT_OUTPUT_LIMIT_BYTES, WorkerPool, case_result
+from submission_store import SubmissionStore
+from trace_buffer import TraceBuffer
 from utils.logger import log
+from verdict_cache import VerdictCache
 
 
 class NodeInfo:
-    def __init__(self, node_id: int, port: int) -> None:
+    def __init__(self, node_id: int, port: int, workers: int = 2) -> None:
         self.node_id = node_id
         self.port = port
+        self.workers = workers
         self.load = 0
         self.alive = True
 
@@ -27,23 +39,146 @@ class NodeManager:
     Provides helpers for load updates and choosing nodes for submissions.
     """
 
-    def __init__(self, node_ports: Dict[int, int]) -> None:
-        self.nodes: Dict[int, NodeInfo] = {nid: NodeInfo(nid, port) for nid, port in node_ports.items()}
-        self.clocks: Dict[int, LamportClock] = {nid: LamportClock(nid) for nid in node_ports}
+    def __init__(
+        self,
+        node_ports: Dict[int, int],
+        pool_sizes: Optional[Dict[int, int]] = None,
+        default_pool_size: int = 2,
+        max_jobs_per_worker: int = 200,
+        max_worker_rss_mb: int = 256,
+        output_limit_bytes: int = DEFAULT_OUTPUT_LIMIT_BYTES,
+        result_capacity: int = 10000,
+        result_ttl_seconds: float = 600.0,
+        batch_limit: int = 5000,
+        cache_entries: int = 4096,
+        cache_bytes: int = 16 * 1024 * 1024,
+        balancer_mode: str = "least_load",
+        queue_limit_per_worker: int = 16,
+        work_stealing: bool = True,
+        cases_per_shard: int = 4,
+        stop_on_first_failure: bool = True,
+        remote: bool = False,
+        node_host: str = "127.0.0.1",
+        heartbeat_interval: float = 0.1,
+        phi_threshold: float = 8.0,
+        max_retries: int = 2,
+        anti_entropy_interval: float = 2.0,
+        submission_db: str = ":memory:",
+        event_capacity: int = 1024,
+        trace_capacity: int = 8192,
+        vector_clocks: bool = False,
+    ) -> None:
+        pool_sizes = pool_sizes or {}
+        self.nodes: Dict[int, NodeInfo] = {
+            nid: NodeInfo(nid, port, max(1, int(pool_sizes.get(nid, default_pool_size))))
+            for nid, port in node_ports.items()
+        }
+        self._max_jobs_per_worker = max_jobs_per_worker
+        self._max_worker_rss_mb = max_worker_rss_mb
+        self._output_limit_bytes = output_limit_bytes
+        self.batch_limit = max(1, int(batch_limit))
+        self.cases_per_shard = max(1, int(cases_per_shard))
+        self.stop_on_first_failure = stop_on_first_failure
+        self._queue_limit_per_worker = max(1, int(queue_limit_per_worker))
+        self._work_stealing = work_stealing
+        # remote=True: each node is a separate node_worker process on its port
+        self.remote = remote
+        self.node_host = node_host
+        # Heartbeats are probed from the background loop (see start)
+        self.heartbeat_interval = heartbeat_interval
+        self.detector = PhiAccrualDetector(threshold=phi_threshold, expected_interval=heartbeat_interval)
+        self.max_retries = max(0, int(max_retries))
+        self._requeued = 0
+        self._failovers = 0
+        # Replica repair between stores runs from the background loop (see start)
+        self.anti_entropy_interval = anti_entropy_interval
+        self._anti_entropy_repairs = 0
+        self._steals = 0
+        # Clocks advance only on real events: the manager (id 0) sends each job,
+        # the node receives it and replies, the manager receives the verdict
+        members = [TraceBuffer.MANAGER, *node_ports] if vector_clocks else None
+        self.clock = LamportClock(TraceBuffer.MANAGER, members)
+        self.clocks: Dict[int, LamportClock] = {nid: LamportClock(nid, members) for nid in node_ports}
+        # Send/run/receive events of every attempt, exportable as a Chrome trace
+        self.trace = TraceBuffer(trace_capacity)
         self.stores: Dict[int, ReplicatedStore] = {nid: ReplicatedStore(nid) for nid in node_ports}
-        self.balancer = LoadBalancer()
+        self.balancer = LoadBalancer(mode=balancer_mode)
         self.election: Optional[BullyElection] = None
         self._leader_id: Optional[int] = None
         self._lock = threading.Lock()
-        self._executors: Dict[int, ThreadPoolExecutor] = {nid: ThreadPoolExecutor(max_workers=2, thread_name_prefix=f"N{nid}") for nid in node_ports}
+        self._executors: Dict[int, NodeExecutor] = {}
+        self._pools: Dict[int, Union[WorkerPool, RemotePool]] = {}
+        for nid in node_ports:
+            self._start_node_workers(nid)
         self._running = False
         self._problems: Dict[str, Dict[str, Any]] = {}
+        self.catalog = ProblemCatalog({})
         self._task_seq = 0
         self._running_tasks: Dict[int, Dict[int, Dict[str, Any]]] = {nid: {} for nid in node_ports}
-        self._recent_results: List[Dict[str, Any]] = []
+        # Completed tasks with sequence numbers, read incrementally by the admin feed
+        self.events = EventRing(event_capacity)
+        self.results = ResultTable(capacity=result_capacity, ttl_seconds=result_ttl_seconds)
+        # Every verdict is persisted off the hot path; the event ring only feeds the admin view
+        self.history = SubmissionStore(submission_db)
+        self.metrics = MetricsRegistry()
+        self._describe_metrics()
+        self.verdict_cache = VerdictCache(max_entries=cache_entries, max_bytes=cache_bytes)
+        self._problem_versions: Dict[str, int] = {}
+        self._tests_index: Dict[str, str] = {}
+        self._harnesses: Dict[str, CompiledHarness] = {}
 
         for nid in self.nodes:
-            self.balancer.update_load(nid, 0)
+            # Weight each node by its sandbox worker count
+            self.balancer.add_node(nid, 0, capacity=self.nodes[nid].workers)
+
+    def _describe_metrics(self) -> None:
+        m = self.metrics
+        m.describe("node_jobs_total", "counter", "Jobs finished per node")
+        m.describe("node_timeouts_total", "counter", "Jobs that hit their time limit per node")
+        m.describe("node_errors_total", "counter", "Jobs that ended in an error per node")
+        m.describe("rejected_total", "counter", "Submissions rejected with BUSY")
+        m.describe("node_queue_wait_seconds", "summary", "Time jobs waited in the node queue")
+        m.describe("node_exec_seconds", "summary", "Time jobs ran on a node worker")
+        m.describe("submission_seconds", "summary", "Submission to verdict, including cache hits")
+        m.gauge(
+            "node_queue_depth",
+            "Jobs queued per node",
+            lambda: {(("node", str(nid)),): self._node_depth(nid)["queued"] for nid in self.nodes},
+        )
+        m.gauge(
+            "node_alive",
+            "1 if the node is in service",
+            lambda: {(("node", str(nid)),): int(info.alive) for nid, info in self.nodes.items()},
+        )
+
+    def _start_node_workers(self, node_id: int) -> None:
+        # One dispatcher thread per warm sandbox worker of the node
+        size = self.nodes[node_id].workers
+        if self.remote:
+            self._pools[node_id] = RemotePool(node_id, self.node_host, self.nodes[node_id].port, size=size)
+        else:
+            self._pools[node_id] = WorkerPool(
+                node_id,
+                size=size,
+                max_jobs_per_worker=self._max_jobs_per_worker,
+                max_rss_mb=self._max_worker_rss_mb,
+                output_limit_bytes=self._output_limit_bytes,
+            )
+        self._executors[node_id] = NodeExecutor(
+            node_id,
+            size,
+            size * self._queue_limit_per_worker,
+            self._execute_job,
+            steal=self._steal_for if self._work_stealing else None,
+        )
+
+    def _stop_node_workers(self, node_id: int) -> None:
+        exe = self._executors.get(node_id)
+        if exe:
+            exe.shutdown(cancel_futures=True)
+        pool = self._pools.get(node_id)
+        if pool:
+            pool.shutdown()
 
     def ensure_leader(self) -> int:
         with self._lock:
@@ -51,6 +186,9 @@ class NodeManager:
                 return self._leader_id
             ids = sorted(self.nodes.keys())
             alive_ids = [nid for nid, info in self.nodes.items() if info.alive]
+            if not alive_ids:
+                self._leader_id = None
+                return -1
             initiator = random.choice(alive_ids)
             self.election = BullyElection(initiator, alive_ids)
             leader = self.election.start_election()
@@ -62,121 +200,576 @@ class NodeManager:
         return self._leader_id
 
     def update_load(self, node_id: int, delta: int) -> None:
-        node = self.nodes[node_id]
-        node.load = max(0, node.load + delta)
-        self.balancer.update_load(node_id, node.load)
+        self.nodes[node_id].load = self.balancer.adjust(node_id, delta)
 
     def choose_node_for_submission(self) -> Optional[int]:
-        alive_ids = [nid for nid, info in self.nodes.items() if info.alive]
-        return self.balancer.choose_from(alive_ids)
+        # Only alive nodes are registered with the balancer
+        return self.balancer.choose_node()
+
+    def _acquire_node(self) -> Optional[int]:
+        # Choose and count the assignment in one step so concurrent callers spread out
+        for _ in range(len(self.nodes)):
+            node_id = self.balancer.acquire()
+            if node_id is None:
+                return None
+            if self.nodes[node_id].alive:
+                self.nodes[node_id].load = self.balancer.load_of(node_id)
+                return node_id
+            # Failed over between the balancer's choice and here
+            self.balancer.release(node_id)
+        return None
 
-    def replicate_problem(self, key: str, value: str) -> None:
-        # Fan out from leader to others
+    def replicate_problem(self, key: str, value: str, quorum: str = "all") -> int:
+        return self.replicate_many({key: value}, quorum)
+
+    def replicate_many(self, items: Dict[str, str], quorum: str = "all") -> int:
+        """
+        Write `items` through the leader's replication log, one batch per
+        alive peer, waiting for `quorum` ("one", "majority" or "all").
+        Returns the number of replicas that acknowledged; peers that are
+        down catch up from the log or by anti-entropy.
+        """
         leader = self.ensure_leader()
-        peers = [self.stores[n] for n in self.nodes if n != leader]
-        self.stores[leader].update_and_replicate(key, value, peers)
-
-    def broadcast_clock_tick(self) -> None:
-        for nid, clk in self.clocks.items():
-            clk.tick()
-
-    def _safe_globals(self) -> Dict[str, Any]:
-        allowed_builtins = {
-            "range": range,
-            "len": len,
-            "sum": sum,
-            "min": min,
-            "max": max,
-            "print": print,
-            "abs": abs,
-            "enumerate": enumerate,
-            "map": map,
-            "filter": filter,
-            "list": list,
-            "dict": dict,
-            "set": set,
-            "int": int,
-            "float": float,
-            "str": str,
-            "bool": bool,
-            "zip": zip,
-        }
-        return {"__builtins__": allowed_builtins}
+        if leader < 0:
+            return 0
+        peers = [self.stores[n] for n, info in self.nodes.items() if n != leader and info.alive]
+        acked = self.stores[leader].update_many(dict(items), peers, quorum)
+        for key in items:
+            self._bump_problem_version(key)
+        return acked
 
-    def execute_submission(self, code: str, tests: str, timeout_seconds: float = 2.0) -> str:
-        node_id = self.choose_node_for_submission()
+    def anti_entropy(self) -> int:
+        """
+        One round of replica repair through the leader: the leader pulls
+        newer entries from every alive follower, then each follower pulls
+        from the leader. Only keys in differing Merkle buckets move.
+        Returns the number of entries repaired.
+        """
+        leader = self.ensure_leader()
+        if leader < 0:
+            return 0
+        followers = [self.stores[n] for n, info in self.nodes.items() if n != leader and info.alive]
+        source = self.stores[leader]
+        repaired = sum(source.sync_from(store) for store in followers)
+        repaired += sum(store.sync_from(source) for store in followers)
+        if repaired:
+            with self._lock:
+                self._anti_entropy_repairs += repaired
+            log("Manager", f"anti-entropy repaired {repaired} entries via leader node={leader}")
+        return repaired
+
+    def _compile_harness(self, key: str, meta: Dict[str, Any], version: int) -> None:
+        # Caller holds self._lock
+        try:
+            self._harnesses[key] = CompiledHarness(
+                key, version, str(meta.get("tests", "")), str(meta.get("starter_code", ""))
+            )
+        except SyntaxError as ex:
+            self._harnesses.pop(key, None)
+            log("Manager", f"problem {key} has invalid tests/starter code: {ex}")
+
+    def _bump_problem_version(self, key: str) -> None:
+        with self._lock:
+            version = self._problem_versions.get(key, 0) + 1
+            self._problem_versions[key] = version
+            if key in self._problems:
+                self._compile_harness(key, self._problems[key], version)
+        self.verdict_cache.invalidate(key)
+
+    @staticmethod
+    def _is_infra_failure(output: str) -> bool:
+        # The code never got a fair run: rejected, no node, or the sandbox itself failed
+        return output == "No nodes available" or output.startswith(
+            ("BUSY", "ERROR: node unavailable", "ERROR: sandbox", "ERROR: worker pool")
+        )
+
+    @classmethod
+    def _is_cacheable(cls, output: str) -> bool:
+        # Timeouts and infrastructure failures depend on load, not on the code
+        return output != "TIMEOUT" and not cls._is_infra_failure(output)
+
+    def _recorded(self, future: "Future[str]", user: str, problem_key: Optional[str], ticket: str) -> "Future[str]":
+        # Queue the verdict for the submission history once it is known
+        started = time.time()
+
+        def _record(f: "Future[str]") -> None:
+            output = f.result()
+            self.metrics.observe("submission_seconds", time.time() - started)
+            self.history.record(
+                self._verdict_for_output(output), output, user, problem_key or "", ticket, time.time() - started
+            )
+
+        future.add_done_callback(_record)
+        return future
+
+    def _submit(
+        self,
+        code: str,
+        tests: str,
+        timeout_seconds: float,
+        problem_key: Optional[str] = None,
+        user: str = "",
+        ticket: str = "",
+    ) -> "Future[str]":
+        """
+        Serve a submission from the verdict cache, or execute it exactly once.
+        With `problem_key` the precompiled harness of that problem replaces
+        `tests`. The verdict is recorded in the submission history.
+        """
+        harness: Optional[CompiledHarness] = None
+        explicit = bool(problem_key)
+        with self._lock:
+            if explicit:
+                harness = self._harnesses.get(problem_key)
+            elif tests.strip():
+                problem_key = self._tests_index.get(tests.strip())
+            version = self._problem_versions.get(problem_key, 0) if problem_key else 0
+        if explicit and harness is None and not tests:
+            done: "Future[str]" = Future()
+            done.set_result(f"ERROR: unknown problem '{problem_key}'")
+            return self._recorded(done, user, problem_key, ticket)
+        if harness is not None:
+            tests = harness.tests_src
+        limits = f"{float(timeout_seconds)}:{self._output_limit_bytes}"
+        cache_key = self.verdict_cache.make_key(code, tests, f"{problem_key}:{version}", limits)
+        future, owner = self.verdict_cache.claim(cache_key)
+        if owner:
+            def _resolve(f: "Future[str]") -> None:
+                output = f.result()
+                self.verdict_cache.resolve(cache_key, output, tag=problem_key, cacheable=self._is_cacheable(output))
+
+            self._dispatch(code, tests, timeout_seconds, harness).add_done_callback(_resolve)
+        return self._recorded(future, user, problem_key, ticket)
+
+    def _dispatch(
+        self, code: str, tests: str, timeout_seconds: float, harness: Optional[CompiledHarness] = None
+    ) -> "Future[str]":
+        """
+        Assign a submission to a node and return a future that resolves to the
+        verdict string once the node has finished (or failed) the job.
+        """
+        return self._dispatch_job(lambda pool: pool.run(code, tests, timeout_seconds, harness), lambda err: err)
+
+    def _dispatch_job(
+        self,
+        work: Callable[[WorkerPool], Any],
+        on_error: Callable[[str], Any],
+        describe: Callable[[Any], str] = str,
+    ) -> "Future[Any]":
+        """
+        Run `work` against the sandbox pool of the least-loaded node. The
+        returned future never raises: failures resolve to `on_error(message)`.
+        """
+        result: "Future[Any]" = Future()
+        self._attempt(result, work, on_error, describe, 0, 0)
+        return result
+
+    def _attempt(
+        self,
+        result: "Future[Any]",
+        work: Callable[[WorkerPool], Any],
+        on_error: Callable[[str], Any],
+        describe: Callable[[Any], str],
+        retries: int,
+        trace: int,
+    ) -> None:
+        """
+        One try at running `work`; a node failure re-enters with retries + 1.
+        `trace` is the task id of the first attempt (0 for the first attempt).
+        """
+        node_id = self._acquire_node()
         if node_id is None:
-            return "No nodes available"
-        # Lamport send event for assigning
-        self.clocks[node_id].send_event()
-        self.update_load(node_id, +1)
-        log("Exec", f"assign submission to node={node_id}")
+            result.set_result(on_error("No nodes available"))
+            return
 
         with self._lock:
             self._task_seq += 1
             task_id = self._task_seq
             self._running_tasks[node_id][task_id] = {"start": time.time(), "thread": None}
+        job = Job(task_id, work)
+        job.retries = retries
+        job.trace = trace or task_id
 
-        def _run() -> str:
-            # Local event before run
-            self.clocks[node_id].tick()
-            stdout = io.StringIO()
-            g = self._safe_globals()
+        def _retry() -> None:
+            if retries >= self.max_retries:
+                result.set_result(on_error("ERROR: node unavailable"))
+                return
+            with self._lock:
+                self._requeued += 1
+            log("Exec", f"requeue task={task_id} (retry {retries + 1}/{self.max_retries})")
+            self._attempt(result, work, on_error, describe, retries + 1, job.trace)
+
+        job.on_failover = _retry
+
+        def _finish(future: "Future[Any]") -> None:
+            if not job.settle():
+                # The node was failed over and a newer attempt owns the result
+                return
+            ran_on = job.node_id if job.node_id is not None else node_id
             try:
-                # record thread name once running
+                output = future.result()
+            except NodeUnavailable as ex:
+                self.update_load(ran_on, -1)
                 with self._lock:
-                    if task_id in self._running_tasks[node_id]:
-                        self._running_tasks[node_id][task_id]["thread"] = threading.current_thread().name
-                with redirect_stdout(stdout):
-                    exec(code, g, g)
-                    if tests.strip():
-                        exec(tests, g, g)
-                result = stdout.getvalue()
-                return result if result else "OK"
+                    self._running_tasks[ran_on].pop(task_id, None)
+                log("Exec", f"task={task_id} lost node={ran_on}: {ex}", "WARNING")
+                # Confirm with a direct probe before taking the node out of service
+                if not self._probe(ran_on):
+                    self._fail_over(ran_on, "unreachable")
+                _retry()
+                return
+            except CancelledError:
+                output = on_error("ERROR: node unavailable")
             except Exception as ex:  # noqa: BLE001
-                return f"ERROR: {ex}"
-            finally:
-                stdout.close()
+                output = on_error(f"ERROR: {ex}")
+            status = describe(output)
+            labels = {"node": ran_on}
+            self.metrics.inc("node_jobs_total", labels)
+            self.metrics.observe("node_queue_wait_seconds", job.queue_wait(), labels)
+            self.metrics.observe("node_exec_seconds", job.exec_time(), labels)
+            if status == "TIMEOUT":
+                self.metrics.inc("node_timeouts_total", labels)
+            elif status.startswith("ERROR"):
+                self.metrics.inc("node_errors_total", labels)
+            # Receive event: the node's reply carries the stamp it sent with
+            stamp = self.clock.event("recv", job.stamp)
+            self.trace.record("verdict", job.trace, task_id, TraceBuffer.MANAGER, stamp, detail=status[:60])
+            self.update_load(ran_on, -1)
+            log("Exec", f"finished submission on node={ran_on} -> {status[:60]}", "DEBUG")
+            with self._lock:
+                info = self._running_tasks[ran_on].pop(task_id, {"start": time.time(), "thread": None})
+            now = time.time()
+            self.events.append({
+                "time": round(now, 3),
+                "node": ran_on,
+                "task": task_id,
+                "trace": job.trace,
+                "duration": round(now - info.get("start", now), 3),
+                "queue_wait": round(job.queue_wait(), 3),
+                "exec": round(job.exec_time(), 3),
+                "stolen_from": job.stolen_from,
+                "retries": retries,
+                "thread": info.get("thread"),
+                "status": status,
+            })
+            result.set_result(output)
 
-        future = self._executors[node_id].submit(_run)
+        # Lamport send event for assigning; the stamp travels with the job
+        job.stamp = self.clock.event("send")
+        self.trace.record(
+            "dispatch", job.trace, task_id, TraceBuffer.MANAGER, job.stamp, detail=f"node={node_id} retry={retries}"
+        )
         try:
-            output = future.result(timeout=timeout_seconds)
-        except TimeoutError:
-            output = "TIMEOUT"
-        finally:
-            # Receive event (simulate completion notification)
-            self.clocks[node_id].receive_event(self.clocks[node_id].now())
+            self._executors[node_id].submit(job)
+        except (QueueFull, RuntimeError) as ex:
+            # Queue full (or node shut down after it was chosen): reject fast
             self.update_load(node_id, -1)
-            log("Exec", f"finished submission on node={node_id} -> {output[:60]}")
             with self._lock:
-                info = self._running_tasks[node_id].pop(task_id, {"start": time.time(), "thread": None})
-                duration = time.time() - info.get("start", time.time())
-                self._recent_results.append({
-                    "node": node_id,
-                    "task": task_id,
-                    "duration": round(duration, 3),
-                    "thread": info.get("thread"),
-                    "status": output,
-                })
-                if len(self._recent_results) > 50:
-                    self._recent_results = self._recent_results[-50:]
-        return output
+                self._running_tasks[node_id].pop(task_id, None)
+            busy = isinstance(ex, QueueFull)
+            if not busy and not self.nodes[node_id].alive:
+                # The node failed over after it was chosen: the job never reached it, so
+                # route it again without counting a retry
+                self._attempt(result, work, on_error, describe, retries, job.trace)
+                return
+            if busy:
+                self.metrics.inc("rejected_total")
+            self.trace.record(
+                "rejected", job.trace, task_id, TraceBuffer.MANAGER, job.stamp, detail="busy" if busy else "shut down"
+            )
+            result.set_result(on_error(self._busy_message() if busy else "ERROR: node unavailable"))
+            return
+        log("Exec", f"assign submission to node={node_id}", "DEBUG")
+        job.future.add_done_callback(_finish)
 
-    # Cluster controls
-    def crash_node(self, node_id: int) -> bool:
-        info = self.nodes.get(node_id)
-        if not info:
+    def _execute_job(self, node_id: int, job: Job) -> Any:
+        # Runs on the node executor's worker thread
+        clock = self.clocks[node_id]
+        received = clock.event("recv", job.stamp)
+        thread = threading.current_thread().name
+        started = job.started or time.time()
+        self.trace.record("queued", job.trace, job.task_id, node_id, received, start=job.enqueued, end=started)
+        with self._lock:
+            entry = self._running_tasks[node_id].get(job.task_id)
+            if entry is not None:
+                entry["thread"] = thread
+        try:
+            # The sandbox enforces the deadline by killing the worker process
+            return job.work(self._pools[node_id])
+        finally:
+            # Send event: the reply to the manager
+            job.stamp = clock.event("send")
+            self.trace.record(
+                "run", job.trace, job.task_id, node_id, received, start=started, end=time.time(), detail=thread
+            )
+
+    def _steal_for(self, thief_id: int) -> Optional[Job]:
+        """
+        Called by an idle worker of `thief_id`: take the newest queued job from
+        the node with the deepest queue and move its bookkeeping (load,
+        running-task entry, Lamport handoff) to the thief.
+        """
+        if not self.nodes[thief_id].alive:
+            return None
+        victim_id, deepest = None, 0
+        for nid, exe in self._executors.items():
+            if nid == thief_id or exe.is_shutdown:
+                continue
+            queued = exe.depth()["queued"]
+            if queued > deepest:
+                victim_id, deepest = nid, queued
+        if victim_id is None:
+            return None
+        job = self._executors[victim_id].steal()
+        if job is None:
+            return None
+        job.stolen_from = victim_id
+        job.node_id = thief_id
+        # Handoff message victim -> thief; the thief receives it when the job starts
+        victim = self.clocks[victim_id]
+        victim.event("recv", job.stamp)
+        job.stamp = victim.event("send")
+        self.trace.record("steal", job.trace, job.task_id, victim_id, job.stamp, detail=f"to node={thief_id}")
+        self.update_load(victim_id, -1)
+        self.update_load(thief_id, +1)
+        with self._lock:
+            entry = self._running_tasks[victim_id].pop(job.task_id, None)
+            if entry is not None:
+                self._running_tasks[thief_id][job.task_id] = entry
+            self._steals += 1
+        log("Exec", f"node={thief_id} stole task={job.task_id} from node={victim_id}", "DEBUG")
+        return job
+
+    def _probe(self, node_id: int) -> bool:
+        """
+        One heartbeat. Local nodes answer while their worker threads are alive,
+        the executor lock is not wedged and the sandbox pool is open; remote
+        nodes must answer a ping.
+        """
+        exe = self._executors.get(node_id)
+        if exe is None or exe.is_shutdown:
             return False
-        info.alive = False
-        self.update_load(node_id, 0 - info.load)
+        pool = self._pools.get(node_id)
+        wait = max(0.25, 2 * self.heartbeat_interval)
+        if isinstance(pool, RemotePool):
+            return pool.ping(timeout=wait)
+        return exe.is_healthy(timeout=wait) and not (pool is None or pool.closed)
+
+    def _check_heartbeats(self) -> None:
+        for nid, info in self.nodes.items():
+            if not info.alive:
+                continue
+            if self._probe(nid):
+                self.detector.heartbeat(nid)
+            elif not self.detector.is_available(nid):
+                self._fail_over(nid, f"phi={self.detector.phi(nid):.1f}")
+
+    def _fail_over(self, node_id: int, reason: str) -> int:
+        """
+        Take a node out of service and requeue its queued and running jobs on
+        healthy nodes. Stale results from the failed node are discarded via
+        Job.settle. Returns the number of jobs requeued.
+        """
+        info = self.nodes.get(node_id)
+        if info is None:
+            return 0
+        with self._lock:
+            if not info.alive:
+                return 0
+            # In the same critical section, so no caller can still be routed here
+            info.alive = False
+            self.balancer.remove_node(node_id)
+            self._failovers += 1
+        info.load = 0
+        self.detector.remove(node_id)
+        orphans: List[Job] = []
         exe = self._executors.get(node_id)
-        if exe:
-            exe.shutdown(wait=False, cancel_futures=True)
-        log("Manager", f"node crashed node={node_id}")
-        # trigger re-election if leader crashed
+        if exe is not None:
+            orphans = exe.shutdown(cancel_futures=False) + exe.running_jobs()
+        pool = self._pools.get(node_id)
+        if pool is not None:
+            pool.shutdown()
+        with self._lock:
+            self._running_tasks[node_id].clear()
+        requeued = 0
+        for job in orphans:
+            if job.on_failover is not None and job.settle():
+                job.on_failover()
+                requeued += 1
+        log("Manager", f"node failed node={node_id} ({reason}); requeued {requeued} jobs", "WARNING")
         if self._leader_id == node_id:
             self._leader_id = None
             self.ensure_leader()
+        return requeued
+
+    def retry_after(self) -> float:
+        """
+        Seconds a client should wait before retrying, or 0.0 when at least one
+        alive node can still admit work. Also 0.0 when no node is alive: the
+        submission is admitted and fails fast with "No nodes available"
+        rather than telling clients to keep retrying a cluster that is down.
+        """
+        depths = []
+        for nid, info in self.nodes.items():
+            exe = self._executors.get(nid)
+            if not info.alive or exe is None or exe.is_shutdown:
+                continue
+            if not exe.is_full():
+                return 0.0
+            depths.append((exe.depth()["queued"], exe.workers))
+        if not depths:
+            return 0.0
+        recent = [e["exec"] for e in self.events.recent(20)]
+        avg_exec = sum(recent) / len(recent) if recent else 0.1
+        backlog = min((q / w for q, w in depths), default=1.0)
+        return round(max(0.1, avg_exec * backlog), 2)
+
+    def _busy_message(self) -> str:
+        return f"BUSY: retry after {max(0.1, self.retry_after())}s"
+
+    def execute_submission(self, code: str, tests: str, timeout_seconds: float = 2.0) -> str:
+        return self._submit(code, tests, timeout_seconds).result()
+
+    def execute_problem(self, problem_key: str, code: str, timeout_seconds: float = 2.0) -> str:
+        return self._submit(code, "", timeout_seconds, problem_key).result()
+
+    # Awaitable variants for the asyncio RMI front end: same pipeline, no blocked thread
+    @staticmethod
+    async def _awaited(future: "Future[str]") -> str:
+        # Shielded: the future may be shared with coalesced submissions, and a
+        # client that goes away must not cancel it for everyone
+        return await asyncio.shield(asyncio.wrap_future(future))
+
+    async def aexecute_submission(self, code: str, tests: str, timeout_seconds: float = 2.0) -> str:
+        return await self._awaited(self._submit(code, tests, timeout_seconds))
+
+    async def aexecute_problem(self, problem_key: str, code: str, timeout_seconds: float = 2.0) -> str:
+        return await self._awaited(self._submit(code, "", timeout_seconds, problem_key))
+
+    async def await_results(self, tickets: List[str], timeout: float = 10.0) -> Dict[str, Dict[str, Any]]:
+        return await self.results.wait_async(list(tickets), float(timeout))
+
+    @staticmethod
+    def _describe_cases(results: List[Dict[str, Any]]) -> str:
+        passed = sum(1 for r in results if r["verdict"] == "PASS")
+        return f"{passed}/{len(results)} cases passed"
+
+    def judge_problem(
+        self, problem_key: str, code: str, stop_on_first_failure: Optional[bool] = None, user: str = ""
+    ) -> Dict[str, Any]:
+        """
+        Judge `code` against a problem's structured test cases. Cases are split
+        into shards of `cases_per_shard` that run in parallel across nodes.
+        With early exit, a shard stops at its own first failing case, and
+        shards still queued when any case fails are skipped without running.
+        Shards already running in a sandbox are not interrupted, so early exit
+        only saves work when there are more shards than free workers.
+        Problems without cases fall back to their tests harness.
+        """
+        start = time.time()
+        stop = self.stop_on_first_failure if stop_on_first_failure is None else bool(stop_on_first_failure)
+        with self._lock:
+            meta = self._problems.get(problem_key)
+        if meta is None:
+            return {"problem_key": problem_key, "verdict": f"ERROR: unknown problem '{problem_key}'", "cases": []}
+        cases = [dict(case, index=i) for i, case in enumerate(meta.get("cases") or [])]
+        if not cases:
+            output = self._submit(code, "", 2.0, problem_key, user).result()
+            return {
+                "problem_key": problem_key,
+                "verdict": self._verdict_for_output(output),
+                "output": output,
+                "cases": [],
+                "time": round(time.time() - start, 4),
+            }
+
+        abort = threading.Event()
+
+        def _shard_work(shard: List[Dict[str, Any]]) -> Callable[[WorkerPool], Any]:
+            def _work(pool: WorkerPool) -> List[Dict[str, Any]]:
+                # Checked when a worker picks the shard up, not when it is queued
+                if abort.is_set():
+                    return [case_result(c["index"], "SKIPPED") for c in shard]
+                return pool.run_cases(code, shard, stop)
+            return _work
+
+        def _check(future: "Future[Any]") -> None:
+            if stop and any(r["verdict"] not in ("PASS", "SKIPPED") for r in future.result()):
+                abort.set()
+
+        futures = []
+        for i in range(0, len(cases), self.cases_per_shard):
+            shard = cases[i:i + self.cases_per_shard]
+            future = self._dispatch_job(
+                _shard_work(shard),
+                lambda err, shard=shard: [case_result(c["index"], "RUNTIME_ERROR", detail=err) for c in shard],
+                self._describe_cases,
+            )
+            future.add_done_callback(_check)
+            futures.append(future)
+
+        results = sorted((r for f in futures for r in f.result()), key=lambda r: r["index"])
+        failures = [r for r in results if r["verdict"] not in ("PASS", "SKIPPED")]
+        report = {
+            "problem_key": problem_key,
+            "verdict": failures[0]["verdict"] if failures else "ACCEPTED",
+            "passed": sum(1 for r in results if r["verdict"] == "PASS"),
+            "total": len(results),
+            "shards": len(futures),
+            "cases": results,
+            "time": round(time.time() - start, 4),
+        }
+        self.history.record(
+            report["verdict"], self._describe_cases(results), user, problem_key, duration=report["time"]
+        )
+        return report
+
+    @staticmethod
+    def _verdict_for_output(output: str) -> str:
+        if output.startswith("BUSY"):
+            return "REJECTED"
+        if NodeManager._is_infra_failure(output):
+            return "SYSTEM_ERROR"
+        if output == "TIMEOUT":
+            return "TIME_LIMIT_EXCEEDED"
+        if output == "OUTPUT_LIMIT_EXCEEDED":
+            return output
+        if output.startswith("ERROR"):
+            return "RUNTIME_ERROR"
+        return "ACCEPTED"
+
+    # Ticket-based submissions: return immediately, poll/long-poll for the verdict
+    def submit_async(
+        self, code: str, tests: str, timeout_seconds: float = 2.0, problem_key: str = "", user: str = ""
+    ) -> str:
+        # Returns a ticket id, or a "BUSY: retry after Ns" message when every queue is full
+        if self.retry_after() > 0:
+            self.metrics.inc("rejected_total")
+            return self._busy_message()
+        ticket = self.results.create()
+        future = self._submit(code, tests, timeout_seconds, problem_key or None, user, ticket)
+        future.add_done_callback(lambda f: self.results.complete(ticket, f.result()))
+        return ticket
+
+    def submit_problem_async(self, problem_key: str, code: str, timeout_seconds: float = 2.0, user: str = "") -> str:
+        return self.submit_async(code, "", timeout_seconds, problem_key, user)
+
+    def get_result(self, ticket: str) -> Dict[str, Any]:
+        return self.results.get(ticket)
+
+    def wait_results(self, tickets: List[str], timeout: float = 10.0) -> Dict[str, Dict[str, Any]]:
+        return self.results.wait(list(tickets), float(timeout))
+
+    def list_submissions(self, user: str = "", problem: str = "", cursor: str = "", limit: int = 50) -> Dict[str, Any]:
+        """Newest-first submission history page: {items, next_cursor}."""
+        return self.history.list_submissions(user, problem, cursor, limit)
+
+    # Cluster controls
+    def crash_node(self, node_id: int) -> bool:
+        if node_id not in self.nodes:
+            return False
+        # Same path as a detected failure: in-flight jobs move to healthy nodes
+        self._fail_over(node_id, "crashed on request")
         return True
 
     def recover_node(self, node_id: int) -> bool:
@@ -184,11 +777,16 @@ class NodeManager:
         if not info:
             return False
         info.alive = True
-        if node_id not in self._executors or self._executors[node_id]._shutdown:  # type: ignore[attr-defined]
-            self._executors[node_id] = ThreadPoolExecutor(max_workers=2, thread_name_prefix=f"N{node_id}")
-        self.update_load(node_id, 0)  # ensure recorded
+        if node_id not in self._executors or self._executors[node_id].is_shutdown:
+            self._start_node_workers(node_id)
+        if node_id not in self.balancer.node_loads:
+            self.balancer.add_node(node_id, 0, capacity=info.workers)
+        info.load = self.balancer.load_of(node_id)
+        self.detector.heartbeat(node_id)
         log("Manager", f"node recovered node={node_id}")
         self.ensure_leader()
+        # Catch the rejoining replica up on writes it missed while down
+        self.anti_entropy()
         return True
 
     def force_election(self) -> int:
@@ -197,56 +795,235 @@ class NodeManager:
 
     # Problem surfacing (for frontend convenience)
     def set_problems(self, problems: Dict[str, Dict[str, Any]]) -> None:
-        self._problems = problems
+        with self._lock:
+            self._problems = problems
+            self.catalog = ProblemCatalog(problems)
+            # Lets raw-test submissions be attributed to (and versioned with) their problem
+            # (cases-only problems have no tests and must not claim every empty-tests submission)
+            self._tests_index = {
+                str(meta.get("tests", "")).strip(): key
+                for key, meta in problems.items()
+                if str(meta.get("tests", "")).strip()
+            }
+            self._harnesses = {}
+            for key, meta in problems.items():
+                version = self._problem_versions.get(key, 0) + 1
+                self._problem_versions[key] = version
+                self._compile_harness(key, meta, version)
+        self.verdict_cache.invalidate()
+
+    def list_problems(self, if_version: Optional[str] = None, cursor: str = "", limit: int = 100) -> Dict[str, Any]:
+        """
+        Without arguments: the full problem dict (legacy clients).
+        list_problems(if_version, cursor, limit): a page of summaries
+        {version, not_modified, total, items, next_cursor}, or just
+        {version, not_modified: True} when `if_version` is current.
+        """
+        if if_version is None:
+            return self._problems or {}
+        return self.catalog.page(if_version, cursor, limit)
+
+    def get_problem(self, problem_key: str) -> Dict[str, Any]:
+        """Full details of one problem, or {} if unknown."""
+        return self.catalog.get(problem_key)
 
-    def list_problems(self) -> Dict[str, Dict[str, Any]]:
-        return self._problems or {}
+    def _node_depth(self, node_id: int) -> Dict[str, int]:
+        exe = self._executors.get(node_id)
+        if exe is None or exe.is_shutdown:
+            return {"queued": 0, "running": 0}
+        return exe.depth()
 
     def get_status(self) -> Dict[str, Any]:
         # Ensure dictionary keys are strings for XML-RPC compatibility
         return {
             "leader": self._leader_id,
+            "clock": self.clock.now(),
             "nodes": {
-                str(nid): {"alive": info.alive, "load": info.load, "port": info.port, "clock": self.clocks[nid].now()}
+                str(nid): {
+                    "alive": info.alive,
+                    "load": info.load,
+                    "port": info.port,
+                    "workers": info.workers,
+                    **self._node_depth(nid),
+                    "phi": round(self.detector.phi(nid), 2),
+                    "clock": self.clocks[nid].now(),
+                }
                 for nid, info in self.nodes.items()
             },
         }
 
-    def get_runtime_metrics(self) -> Dict[str, Any]:
-        with self._lock:
-            running = {
-                str(nid): {
-                    str(tid): {"start": meta.get("start"), "thread": meta.get("thread")}
-                    for tid, meta in tasks.items()
-                }
-                for nid, tasks in self._running_tasks.items()
+    def get_metrics_summary(self) -> Dict[str, Any]:
+        """
+        Compact percentiles for capacity planning: per node throughput,
+        timeouts, errors and queue-wait/exec latency (p50/p95/p99, seconds),
+        plus end-to-end submission and per-method RPC latency.
+        """
+        summary = self.metrics.summary()
+        uptime = max(1e-9, time.time() - self.metrics.started)
+        nodes: Dict[str, Dict[str, Any]] = {}
+        for nid in self.nodes:
+            node = str(nid)
+            jobs = summary.get("node_jobs_total", {}).get(node, {}).get("value", 0)
+            nodes[node] = {
+                "jobs": jobs,
+                "per_sec": round(jobs / uptime, 3),
+                "timeouts": summary.get("node_timeouts_total", {}).get(node, {}).get("value", 0),
+                "errors": summary.get("node_errors_total", {}).get(node, {}).get("value", 0),
+                "queue_wait": summary.get("node_queue_wait_seconds", {}).get(node, {}),
+                "exec": summary.get("node_exec_seconds", {}).get(node, {}),
             }
-            results = list(self._recent_results)
-        return {"running": running, "recent": results}
+        return {
+            "uptime": round(uptime, 3),
+            "nodes": nodes,
+            "submission": summary.get("submission_seconds", {}).get("all", {}),
+            "rpc": summary.get("rpc_seconds", {}),
+            "rejected": summary.get("rejected_total", {}).get("all", {}).get("value", 0),
+        }
+
+    def get_runtime_events(self, since_seq: int = 0, max_events: int = 200) -> Dict[str, Any]:
+        """
+        Completed tasks after `since_seq`: {events, next_seq, last_seq,
+        missed}. Pass next_seq back to read on; `missed` counts events
+        that were overwritten before this reader got to them.
+        """
+        return self.events.since(int(since_seq), int(max_events))
+
+    def wait_runtime_events(self, since_seq: int = 0, max_events: int = 200, timeout: float = 10.0) -> Dict[str, Any]:
+        # Long-poll: returns as soon as there is anything after since_seq
+        return self.events.wait(int(since_seq), int(max_events), float(timeout))
+
+    async def await_runtime_events(self, since_seq: int = 0, max_events: int = 200, timeout: float = 10.0) -> Dict[str, Any]:
+        return await self.events.wait_async(int(since_seq), int(max_events), float(timeout))
+
+    def export_trace(self, trace_id: int = 0) -> Dict[str, Any]:
+        """
+        Buffered send/run/receive events as a Chrome trace-event object,
+        for one submission (the `trace` of its runtime events) or, with 0,
+        everything still in the buffer.
+        """
+        return self.trace.export_chrome(int(trace_id))
+
+    def get_runtime_metrics(self, include_recent: bool = True) -> Dict[str, Any]:
+        # Only shallow copies under the lock; formatting happens after releasing it
+        with self._lock:
+            snapshot = {nid: list(tasks.items()) for nid, tasks in self._running_tasks.items()}
+            steals = self._steals
+            requeued = self._requeued
+            failovers = self._failovers
+            repairs = self._anti_entropy_repairs
+        running = {
+            str(nid): {str(tid): {"start": meta.get("start"), "thread": meta.get("thread")} for tid, meta in tasks}
+            for nid, tasks in snapshot.items()
+        }
+        return {
+            "running": running,
+            # Last 50 tasks for older dashboards; the event feed serves them incrementally
+            "recent": self.events.recent(50) if include_recent else [],
+            "cache": self.verdict_cache.stats(),
+            "steals": steals,
+            "requeued": requeued,
+            "failovers": failovers,
+            "anti_entropy_repairs": repairs,
+            "history": self.history.stats(),
+            "trace": self.trace.stats(),
+        }
+
+    def _fan_out(self, items: List[Dict[str, str]], timeout_seconds: float) -> List["Future[str]"]:
+        """
+        Dispatch a batch concurrently across alive nodes. A feeder thread keeps
+        at most the cluster's total worker capacity in flight; the returned
+        futures are in item order.
+        """
+        slots: List["Future[str]"] = [Future() for _ in items]
+        capacity = max(1, sum(info.workers for info in self.nodes.values() if info.alive))
+        in_flight = threading.BoundedSemaphore(capacity)
+
+        def _settle(slot: "Future[str]", future: "Future[str]") -> None:
+            in_flight.release()
+            slot.set_result(future.result())
+
+        def _feed() -> None:
+            # Every slot must resolve, or submit_many blocks its caller forever
+            for item, slot in zip(items, slots):
+                if not isinstance(item, dict):
+                    slot.set_result("ERROR: batch item must be a struct with code and tests")
+                    continue
+                in_flight.acquire()
+                try:
+                    future = self._submit(
+                        str(item.get("code", "")),
+                        str(item.get("tests", "")),
+                        timeout_seconds,
+                        str(item.get("problem_key", "")) or None,
+                    )
+                except Exception as ex:  # noqa: BLE001
+                    in_flight.release()
+                    log("Manager", f"batch item failed to dispatch: {ex}", "WARNING")
+                    slot.set_result(f"ERROR: {ex}")
+                    continue
+                future.add_done_callback(lambda f, slot=slot: _settle(slot, f))
+
+        threading.Thread(target=_feed, name="BG:fanout", daemon=True).start()
+        return slots
+
+    def _limit_batch(self, items: List[Dict[str, str]]) -> List[Dict[str, str]]:
+        items = list(items)
+        if len(items) > self.batch_limit:
+            log("Manager", f"batch of {len(items)} truncated to limit={self.batch_limit}")
+        return items[: self.batch_limit]
+
+    def iter_many(self, items: List[Dict[str, str]], timeout_seconds: float = 2.0) -> Iterator[str]:
+        """Run a batch in parallel and yield verdicts in submission order."""
+        for slot in self._fan_out(self._limit_batch(items), timeout_seconds):
+            yield slot.result()
+
+    def submit_many(self, items: List[Dict[str, str]], timeout_seconds: float = 2.0) -> Dict[str, Any]:
+        outputs = list(self.iter_many(items, timeout_seconds))
+        return {"submitted": len(outputs), "outputs": outputs}
+
+    def submit_many_async(self, items: List[Dict[str, str]], timeout_seconds: float = 2.0) -> List[str]:
+        # Tickets come back in item order; poll them with wait_results to stream verdicts
+        items = self._limit_batch(items)
+        tickets = [self.results.create() for _ in items]
+        for ticket, slot in zip(tickets, self._fan_out(items, timeout_seconds)):
+            slot.add_done_callback(lambda f, ticket=ticket: self.results.complete(ticket, f.result()))
+        return tickets
 
     def submit_batch(self, count: int) -> Dict[str, Any]:
-        count = max(1, min(20, int(count)))
-        outputs: List[str] = []
-        for _ in range(count):
-            outputs.append(self.execute_submission("print('batch')", ""))
-        return {"submitted": count, "outputs": outputs}
+        count = max(1, min(self.batch_limit, int(count)))
+        return self.submit_many([{"code": "print('batch')", "tests": ""}] * count)
 
     def start(self) -> None:
         if self._running:
             return
         self._running = True
 
+        for nid, info in self.nodes.items():
+            if info.alive:
+                self.detector.heartbeat(nid)
+
         def _background() -> None:
+            next_tick = 0.0
+            next_repair = time.time() + self.anti_entropy_interval
             while self._running:
-                self.broadcast_clock_tick()
-                self.ensure_leader()
-                time.sleep(0.5)
+                # Heartbeats every interval; leader checks every 0.5s
+                self._check_heartbeats()
+                now = time.time()
+                if now >= next_tick:
+                    self.ensure_leader()
+                    next_tick = now + 0.5
+                if now >= next_repair:
+                    self.anti_entropy()
+                    next_repair = now + self.anti_entropy_interval
+                time.sleep(self.heartbeat_interval)
 
         threading.Thread(target=_background, name="BG:manager", daemon=True).start()
 
     def stop(self) -> None:
         self._running = False
-        for exe in self._executors.values():
-            exe.shutdown(wait=False, cancel_futures=True)
+        for nid in self.nodes:
+            self._stop_node_workers(nid)
+            self.stores[nid].close()
+        self.history.close()
 
 
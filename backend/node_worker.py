@@ -0,0 +1,248 @@
+import argparse
+import os
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Set
+
+from harness import CompiledHarness
+from sandbox import DEFAULT_OUTPUT_LIMIT_BYTES, WorkerPool, case_result
+from utils.logger import configure as configure_logging
+from utils.logger import log
+from wire import FrameClient, FrameServer, RemoteError
+
+
+class MissingHarness(Exception):
+    pass
+
+
+class NodeUnavailable(ConnectionError):
+    """The node process could not be reached (or stopped answering) mid-call."""
+
+
+class NodeWorker:
+    """
+    An evaluator node running as its own process: owns a warm WorkerPool and
+    serves "run", "run_cases" and "ping" over framed sockets on its port.
+    Harnesses are compiled once per version and kept by cache_id.
+    """
+
+    def __init__(
+        self,
+        node_id: int,
+        port: int,
+        workers: int = 2,
+        host: str = "127.0.0.1",
+        max_jobs_per_worker: int = 200,
+        max_rss_mb: int = 256,
+        output_limit_bytes: int = DEFAULT_OUTPUT_LIMIT_BYTES,
+        harness_capacity: int = 64,
+    ) -> None:
+        self.node_id = node_id
+        self.pool = WorkerPool(
+            node_id,
+            size=workers,
+            max_jobs_per_worker=max_jobs_per_worker,
+            max_rss_mb=max_rss_mb,
+            output_limit_bytes=output_limit_bytes,
+        )
+        self.harness_capacity = harness_capacity
+        self._harnesses: "OrderedDict[str, CompiledHarness]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.server = FrameServer(host, port, {
+            "run": self.run,
+            "run_cases": self.run_cases,
+            "ping": self.ping,
+        })
+        self.port = self.server.port
+
+    def _harness(self, spec: Optional[Dict[str, Any]]) -> Optional[CompiledHarness]:
+        if not spec:
+            return None
+        cache_id = spec["cache_id"]
+        with self._lock:
+            harness = self._harnesses.get(cache_id)
+            if harness is not None:
+                self._harnesses.move_to_end(cache_id)
+                return harness
+        if spec.get("tests_src") is None:
+            raise MissingHarness(cache_id)
+        key, _, version = cache_id.rpartition("@")
+        harness = CompiledHarness(key, int(version), spec["tests_src"], spec.get("starter_src", ""))
+        with self._lock:
+            self._harnesses[cache_id] = harness
+            while len(self._harnesses) > self.harness_capacity:
+                self._harnesses.popitem(last=False)
+        return harness
+
+    def run(self, code: str, tests: str, timeout_seconds: float, harness: Optional[Dict[str, Any]] = None) -> str:
+        return self.pool.run(code, tests, float(timeout_seconds), self._harness(harness))
+
+    def run_cases(self, code: str, cases: List[Dict[str, Any]], stop_on_failure: bool = True) -> List[Dict[str, Any]]:
+        return self.pool.run_cases(code, cases, bool(stop_on_failure))
+
+    def ping(self) -> Dict[str, Any]:
+        return {"node_id": self.node_id, "pid": os.getpid(), "pool": self.pool.stats()}
+
+    def start(self) -> None:
+        self.server.start()
+
+    def serve_forever(self) -> None:
+        self.server.serve_forever()
+
+    def stop(self) -> None:
+        self.server.stop()
+        self.pool.shutdown()
+
+
+class RemotePool:
+    """
+    Stand-in for WorkerPool on the manager side: forwards jobs to a node
+    worker process over pooled connections. Harness sources are only sent
+    the first time (or again when the node reports it no longer has them).
+    Transport failures raise NodeUnavailable so the manager can requeue.
+    """
+
+    def __init__(self, node_id: int, host: str, port: int, size: int = 2, rpc_slack: float = 2.0) -> None:
+        self.node_id = node_id
+        self.size = size
+        self.rpc_slack = rpc_slack
+        self.client = FrameClient(host, port, max_idle=size)
+        self._sent: Set[str] = set()
+        self._lock = threading.Lock()
+
+    def _harness_spec(self, harness: Optional[CompiledHarness], full: bool) -> Optional[Dict[str, Any]]:
+        if harness is None:
+            return None
+        spec: Dict[str, Any] = {"cache_id": harness.cache_id}
+        with self._lock:
+            full = full or harness.cache_id not in self._sent
+        if full:
+            spec["tests_src"] = harness.tests_src
+            spec["starter_src"] = harness.starter_src
+        return spec
+
+    def run(self, code: str, tests: str, timeout_seconds: float, harness: Optional[CompiledHarness] = None) -> str:
+        timeout = timeout_seconds + self.rpc_slack
+        try:
+            try:
+                result = self.client.call("run", code, tests, timeout_seconds, self._harness_spec(harness, False), timeout=timeout)
+            except RemoteError as ex:
+                if ex.kind != "MissingHarness":
+                    return f"ERROR: {ex.message}"
+                result = self.client.call("run", code, tests, timeout_seconds, self._harness_spec(harness, True), timeout=timeout)
+        except OSError as ex:
+            raise NodeUnavailable(f"node {self.node_id}: {ex}") from ex
+        if harness is not None:
+            with self._lock:
+                self._sent.add(harness.cache_id)
+        return result
+
+    def run_cases(self, code: str, cases: List[Dict[str, Any]], stop_on_failure: bool = True) -> List[Dict[str, Any]]:
+        timeout = sum(float(c.get("time_limit") or 1.0) for c in cases) + 1.0 + self.rpc_slack
+        try:
+            return self.client.call("run_cases", code, cases, stop_on_failure, timeout=timeout)
+        except RemoteError as ex:
+            return [case_result(int(c.get("index", i)), "RUNTIME_ERROR", detail=str(ex)) for i, c in enumerate(cases)]
+        except OSError as ex:
+            raise NodeUnavailable(f"node {self.node_id}: {ex}") from ex
+
+    def ping(self, timeout: float = 1.0) -> bool:
+        try:
+            self.client.call("ping", timeout=timeout)
+            return True
+        except (OSError, RemoteError):
+            return False
+
+    def stats(self) -> Dict[str, int]:
+        return {"size": self.size, "spawned": 0, "recycled": 0}
+
+    def shutdown(self) -> None:
+        self.client.close()
+
+
+def spawn_node_processes(
+    node_ports: Dict[int, int],
+    pool_sizes: Optional[Dict[int, int]] = None,
+    default_pool_size: int = 2,
+    host: str = "127.0.0.1",
+    max_jobs_per_worker: int = 200,
+    max_rss_mb: int = 256,
+    output_limit_bytes: int = DEFAULT_OUTPUT_LIMIT_BYTES,
+) -> Dict[int, subprocess.Popen]:
+    """
+    Start one node worker process per node; see wait_until_listening. The
+    sandbox limits are forwarded so remote nodes enforce the same ones as
+    an in-process NodeManager would.
+    """
+    pool_sizes = pool_sizes or {}
+    script = os.path.abspath(__file__)
+    procs: Dict[int, subprocess.Popen] = {}
+    for nid, port in node_ports.items():
+        cmd = [
+            sys.executable, script,
+            "--node-id", str(nid),
+            "--port", str(port),
+            "--host", host,
+            "--workers", str(pool_sizes.get(nid, default_pool_size)),
+            "--max-jobs-per-worker", str(max_jobs_per_worker),
+            "--max-rss-mb", str(max_rss_mb),
+            "--output-limit-bytes", str(output_limit_bytes),
+        ]
+        procs[nid] = subprocess.Popen(cmd, cwd=os.path.dirname(script))
+        log("Main", f"spawned node {nid} pid={procs[nid].pid} port={port}")
+    return procs
+
+
+def wait_until_listening(node_ports: Dict[int, int], host: str = "127.0.0.1", timeout: float = 10.0) -> bool:
+    deadline = time.time() + timeout
+    pending = dict(node_ports)
+    while pending and time.time() < deadline:
+        for nid, port in list(pending.items()):
+            try:
+                socket.create_connection((host, port), timeout=0.2).close()
+                pending.pop(nid)
+            except OSError:
+                pass
+        if pending:
+            time.sleep(0.05)
+    return not pending
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Distributed Judge evaluator node")
+    parser.add_argument("--node-id", type=int, required=True)
+    parser.add_argument("--port", type=int, required=True)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--max-jobs-per-worker", type=int, default=200, help="recycle a sandbox worker after this many jobs")
+    parser.add_argument("--max-rss-mb", type=int, default=256, help="recycle a sandbox worker above this resident size")
+    parser.add_argument("--output-limit-bytes", type=int, default=DEFAULT_OUTPUT_LIMIT_BYTES)
+    args = parser.parse_args()
+    configure_logging(level=os.environ.get("JUDGE_LOG_LEVEL", "INFO"))
+    # Exit cleanly (and reap sandbox workers) when the backend terminates us
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    node = NodeWorker(
+        args.node_id,
+        args.port,
+        workers=args.workers,
+        host=args.host,
+        max_jobs_per_worker=args.max_jobs_per_worker,
+        max_rss_mb=args.max_rss_mb,
+        output_limit_bytes=args.output_limit_bytes,
+    )
+    log(f"Node-{args.node_id}", f"serving on {args.host}:{node.port} with {args.workers} workers")
+    try:
+        node.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        node.stop()
+
+
+if __name__ == "__main__":
+    main()
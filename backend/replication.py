@@ -1,44 +1,278 @@
-from typing import Any, Dict, List, Tuple
+import hashlib
+import json
+import threading
+import time
+from collections import deque
+from itertools import islice
+from typing import Any, Deque, Dict, Iterable, List, Optional, Set, Tuple
 
 from utils.logger import log
 
+# Leaves of the Merkle tree (a power of two); every key hashes into one bucket
+MERKLE_BUCKETS = 64
+
+QUORUMS = ("one", "majority", "all")
+
+
+def _bucket_of(key: str) -> int:
+    digest = hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") % MERKLE_BUCKETS
+
+
+def _entry_digest(key: str, version: int, value: Any) -> int:
+    blob = json.dumps([key, version, value], sort_keys=True, default=str).encode("utf-8")
+    return int.from_bytes(hashlib.blake2b(blob, digest_size=16).digest(), "big")
+
 
 class ReplicatedStore:
     """
     Simple replicated key-value store with integer version per key to simulate
     eventual consistency. Latest version wins.
+
+    Keys are grouped into MERKLE_BUCKETS buckets whose hashes (the XOR of
+    their entries' digests) are kept up to date on every write and form the
+    leaves of a Merkle tree. Anti-entropy (sync_from) walks both trees from
+    the root and only exchanges the keys of buckets that differ.
     """
 
     def __init__(self, node_id: int) -> None:
         self.node_id = node_id
         self._data: Dict[str, Tuple[int, Any]] = {}
+        self._digests: Dict[str, int] = {}
+        self._buckets: List[int] = [0] * MERKLE_BUCKETS
+        # Keys per bucket, so a repair only reads the buckets that differ
+        self._bucket_keys: List[Set[str]] = [set() for _ in range(MERKLE_BUCKETS)]
+        self._tree: Optional[List[List[bytes]]] = None
+        self._lock = threading.Lock()
+        self._replicator: Optional["Replicator"] = None
 
     def get_local(self, key: str) -> Any:
         entry = self._data.get(key)
         return entry[1] if entry else None
 
-    def apply_update(self, key: str, value: Any, version: int) -> None:
+    def _apply_locked(self, key: str, value: Any, version: int) -> bool:
+        # Caller holds self._lock
         local = self._data.get(key)
-        if local is None or version >= local[0]:
-            self._data[key] = (version, value)
-            log("Replication", f"node={self.node_id} apply key={key} v={version} val={value}")
-
-    def update_and_replicate(self, key: str, value: Any, peers: List["ReplicatedStore"]) -> None:
-        # Increment local version then push to peers
-        current_version = (self._data.get(key) or (0, None))[0]
-        new_version = current_version + 1
-        self.apply_update(key, value, new_version)
-        for peer in peers:
-            peer.apply_update(key, value, new_version)
-            log("Replication", f"node={self.node_id} -> node={peer.node_id} key={key} v={new_version}")
+        if local is not None and version < local[0]:
+            return False
+        digest = _entry_digest(key, version, value)
+        bucket = _bucket_of(key)
+        if local is None:
+            self._bucket_keys[bucket].add(key)
+        self._buckets[bucket] ^= self._digests.get(key, 0) ^ digest
+        self._digests[key] = digest
+        self._data[key] = (version, value)
+        self._tree = None
+        return True
+
+    def apply_update(self, key: str, value: Any, version: int) -> None:
+        with self._lock:
+            self._apply_locked(key, value, version)
+        log("Replication", f"node={self.node_id} apply key={key} v={version} val={value}", "DEBUG")
+
+    def apply_batch(self, entries: List[Tuple[str, int, Any]]) -> None:
+        # (key, version, value) entries from a peer's replication log, under one lock hold
+        with self._lock:
+            for key, version, value in entries:
+                self._apply_locked(key, value, version)
+
+    def update_and_replicate(
+        self, key: str, value: Any, peers: List["ReplicatedStore"], quorum: str = "all"
+    ) -> int:
+        return self.update_many({key: value}, peers, quorum)
+
+    def update_many(
+        self,
+        items: Dict[str, Any],
+        peers: List["ReplicatedStore"],
+        quorum: str = "all",
+        timeout: float = 5.0,
+    ) -> int:
+        """
+        Write `items` locally (each key's version + 1) and replicate them in
+        batches to `peers`. Blocks until `quorum` ("one", "majority" or "all"
+        of this store plus `peers`) holds the writes or `timeout` passes;
+        returns the number of replicas that acknowledged.
+        """
+        if quorum not in QUORUMS:
+            raise ValueError(f"unknown quorum '{quorum}', expected one of {QUORUMS}")
+        with self._lock:
+            entries = []
+            for key, value in items.items():
+                version = (self._data.get(key) or (0, None))[0] + 1
+                self._apply_locked(key, value, version)
+                entries.append((key, version, value))
+        if self._replicator is None:
+            with self._lock:
+                if self._replicator is None:
+                    self._replicator = Replicator(self)
+        return self._replicator.write(entries, peers, quorum, timeout)
+
+    def close(self) -> None:
+        if self._replicator is not None:
+            self._replicator.close()
 
     def dump(self) -> Dict[str, Tuple[int, Any]]:
-        return dict(self._data)
+        with self._lock:
+            return dict(self._data)
+
+    # Merkle tree
+    def _merkle_tree(self) -> List[List[bytes]]:
+        # Levels from the root ([1 hash]) down to the leaves ([MERKLE_BUCKETS hashes])
+        with self._lock:
+            if self._tree is not None:
+                return self._tree
+            level = [bucket.to_bytes(16, "big") for bucket in self._buckets]
+            levels = [level]
+            while len(level) > 1:
+                level = [
+                    hashlib.blake2b(level[i] + level[i + 1], digest_size=16).digest()
+                    for i in range(0, len(level), 2)
+                ]
+                levels.append(level)
+            levels.reverse()
+            self._tree = levels
+            return levels
+
+    def root_hash(self) -> str:
+        return self._merkle_tree()[0][0].hex()
+
+    def merkle_nodes(self, depth: int, indices: Iterable[int]) -> List[bytes]:
+        level = self._merkle_tree()[depth]
+        return [level[i] for i in indices]
+
+    def bucket_versions(self, buckets: Iterable[int]) -> Dict[str, Tuple[int, int]]:
+        # {key: (version, digest)} for the keys in `buckets`
+        with self._lock:
+            return {
+                key: (self._data[key][0], self._digests[key])
+                for bucket in set(buckets)
+                for key in self._bucket_keys[bucket]
+            }
+
+    def entries(self, keys: Iterable[str]) -> Dict[str, Tuple[int, Any]]:
+        with self._lock:
+            return {key: self._data[key] for key in keys if key in self._data}
+
+    def diff_buckets(self, other: "ReplicatedStore") -> List[int]:
+        # Descend both trees level by level, following only differing subtrees
+        mine = self._merkle_tree()
+        differing = [0]
+        for depth in range(len(mine)):
+            theirs = other.merkle_nodes(depth, differing)
+            differing = [i for i, digest in zip(differing, theirs) if mine[depth][i] != digest]
+            if not differing or depth == len(mine) - 1:
+                return differing
+            differing = [child for i in differing for child in (2 * i, 2 * i + 1)]
+        return differing
+
+    def sync_from(self, other: "ReplicatedStore") -> int:
+        """Pull the entries `other` holds newer than ours; returns how many were applied."""
+        buckets = self.diff_buckets(other)
+        if not buckets:
+            return 0
+        theirs = other.bucket_versions(buckets)
+        with self._lock:
+            # Equal versions with different values resolve to the larger digest, so both sides converge
+            wanted = [
+                key
+                for key, (version, digest) in theirs.items()
+                if key not in self._data or (version, digest) > (self._data[key][0], self._digests[key])
+            ]
+        fetched = other.entries(wanted)
+        self.apply_batch([(key, version, value) for key, (version, value) in fetched.items()])
+        if fetched:
+            log("Replication", f"node={self.node_id} <- node={other.node_id} repaired {len(fetched)} keys in {len(buckets)} buckets", "DEBUG")
+        return len(fetched)
+
+
+class Replicator:
+    """
+    Asynchronous replication log of one store. Writes are appended with
+    sequence numbers; one shipper thread per peer sends them in batches of
+    up to `batch_size` entries and advances that peer's cursor. A peer left
+    out of recent writes (e.g. while down) keeps its cursor and catches up
+    from the log when it is named again; if the entries it needs were
+    already trimmed, it is repaired by Merkle anti-entropy instead.
+    """
+
+    def __init__(self, store: ReplicatedStore, batch_size: int = 256, log_capacity: int = 10000) -> None:
+        self.store = store
+        self.batch_size = max(1, int(batch_size))
+        self.log_capacity = max(1, int(log_capacity))
+        self._log: Deque[Tuple[str, int, Any]] = deque()
+        self._first_seq = 0  # sequence number of self._log[0]
+        self._next_seq = 0
+        self._peers: Dict[int, ReplicatedStore] = {}
+        self._cursors: Dict[int, int] = {}  # next sequence number each peer needs
+        # Sequence number each peer must reach for the writes that named it
+        self._targets: Dict[int, int] = {}
+        self._cond = threading.Condition()
+        self._running = True
+
+    def write(self, entries: List[Tuple[str, int, Any]], peers: List[ReplicatedStore], quorum: str, timeout: float) -> int:
+        with self._cond:
+            self._log.extend(entries)
+            self._next_seq += len(entries)
+            last_seq = self._next_seq
+            while len(self._log) > self.log_capacity:
+                self._log.popleft()
+                self._first_seq += 1
+            # Peers named by a write are shipped to up to its end; the others wait with their cursor
+            for peer in peers:
+                self._targets[peer.node_id] = max(self._targets.get(peer.node_id, 0), last_seq)
+                if peer.node_id not in self._peers:
+                    self._peers[peer.node_id] = peer
+                    self._cursors[peer.node_id] = self._first_seq
+                    threading.Thread(
+                        target=self._ship, args=(peer.node_id,), name=f"Repl:{self.store.node_id}->{peer.node_id}", daemon=True
+                    ).start()
+            self._cond.notify_all()
+
+            replicas = 1 + len(peers)
+            needed = {"one": 1, "majority": replicas // 2 + 1, "all": replicas}[quorum]
+            deadline = time.time() + timeout
+            while True:
+                acked = 1 + sum(1 for peer in peers if self._cursors[peer.node_id] >= last_seq)
+                remaining = deadline - time.time()
+                if acked >= needed or remaining <= 0 or not self._running:
+                    return acked
+                self._cond.wait(remaining)
 
-    def sync_from(self, other: "ReplicatedStore") -> None:
-        # Merge by latest version per key
-        other_data = other.dump()
-        for k, (ver, val) in other_data.items():
-            self.apply_update(k, val, ver)
+    def _ship(self, peer_id: int) -> None:
+        while True:
+            with self._cond:
+                while self._running and self._cursors[peer_id] >= self._targets[peer_id]:
+                    self._cond.wait()
+                if not self._running:
+                    return
+                peer = self._peers[peer_id]
+                start = self._cursors[peer_id]
+                behind = start < self._first_seq
+                if behind:
+                    start = self._first_seq
+                    batch: List[Tuple[str, int, Any]] = []
+                else:
+                    offset = start - self._first_seq
+                    end = min(offset + self.batch_size, self._targets[peer_id] - self._first_seq)
+                    batch = list(islice(self._log, offset, end))
+            if behind:
+                # Entries it needs were trimmed: repair by diff, then resume from the log
+                repaired = peer.sync_from(self.store)
+                log("Replication", f"node={self.store.node_id} -> node={peer_id} log trimmed, repaired {repaired} keys", "DEBUG")
+            else:
+                peer.apply_batch(batch)
+                log("Replication", f"node={self.store.node_id} -> node={peer_id} shipped {len(batch)} entries", "DEBUG")
+            with self._cond:
+                self._cursors[peer_id] = max(self._cursors[peer_id], start + len(batch))
+                self._cond.notify_all()
 
+    def lag(self) -> Dict[int, int]:
+        # Entries each known peer is behind
+        with self._cond:
+            return {peer_id: self._next_seq - cursor for peer_id, cursor in self._cursors.items()}
 
+    def close(self) -> None:
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
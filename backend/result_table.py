@@ -0,0 +1,133 @@
+import asyncio
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List
+
+
+class ResultTable:
+    """
+    Bounded, expiring table of submission results keyed by ticket id.
+    Finished entries expire `ttl_seconds` after completion; when the table is
+    full the earliest finished entry is evicted first, then the oldest overall.
+    """
+
+    MAX_WAIT_SECONDS = 30.0
+
+    def __init__(self, capacity: int = 10000, ttl_seconds: float = 600.0) -> None:
+        self.capacity = max(1, int(capacity))
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        # Finished tickets in completion order; with one TTL that is also
+        # expiry order, so expiring and evicting only look at the front
+        self._done: "OrderedDict[str, float]" = OrderedDict()
+        self._cond = threading.Condition()
+        # ticket -> callbacks run once it completes (used by wait_async)
+        self._listeners: Dict[str, List[Callable[[], None]]] = {}
+
+    def _expire(self, now: float) -> None:
+        while self._done:
+            ticket, finished = next(iter(self._done.items()))
+            if now - finished <= self.ttl_seconds:
+                break
+            del self._done[ticket]
+            del self._entries[ticket]
+        while len(self._entries) >= self.capacity:
+            if self._done:
+                victim, _ = self._done.popitem(last=False)
+            else:
+                victim = next(iter(self._entries))
+                self._listeners.pop(victim, None)
+            del self._entries[victim]
+
+    def create(self) -> str:
+        ticket = uuid.uuid4().hex
+        now = time.time()
+        with self._cond:
+            self._expire(now)
+            self._entries[ticket] = {"status": "pending", "output": "", "created": now, "finished": None}
+        return ticket
+
+    def complete(self, ticket: str, output: str) -> None:
+        with self._cond:
+            entry = self._entries.get(ticket)
+            if entry is None:
+                return
+            entry["status"] = "done"
+            entry["output"] = output
+            entry["finished"] = time.time()
+            self._done.pop(ticket, None)
+            self._done[ticket] = entry["finished"]
+            self._cond.notify_all()
+            listeners = self._listeners.pop(ticket, [])
+        for callback in listeners:
+            callback()
+
+    def _view(self, ticket: str) -> Dict[str, Any]:
+        entry = self._entries.get(ticket)
+        if entry is None:
+            return {"ticket": ticket, "status": "unknown", "output": "", "duration": None}
+        duration = None
+        if entry["finished"] is not None:
+            duration = round(entry["finished"] - entry["created"], 3)
+        return {"ticket": ticket, "status": entry["status"], "output": entry["output"], "duration": duration}
+
+    def get(self, ticket: str) -> Dict[str, Any]:
+        with self._cond:
+            return self._view(ticket)
+
+    def wait(self, tickets: List[str], timeout: float) -> Dict[str, Dict[str, Any]]:
+        """Block until every known ticket is done or the timeout elapses."""
+        deadline = time.time() + max(0.0, min(timeout, self.MAX_WAIT_SECONDS))
+        with self._cond:
+            while True:
+                pending = [t for t in tickets if self._entries.get(t, {}).get("status") == "pending"]
+                remaining = deadline - time.time()
+                if not pending or remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            return {t: self._view(t) for t in tickets}
+
+    async def wait_async(self, tickets: List[str], timeout: float) -> Dict[str, Dict[str, Any]]:
+        """Event-loop version of wait: no thread is parked while tickets are pending."""
+        loop = asyncio.get_running_loop()
+        all_done = asyncio.Event()
+        pending = set()
+
+        def _mark(ticket: str) -> None:
+            pending.discard(ticket)
+            if not pending:
+                all_done.set()
+
+        def _listener(ticket: str) -> Callable[[], None]:
+            def _notify() -> None:
+                try:
+                    loop.call_soon_threadsafe(_mark, ticket)
+                except RuntimeError:
+                    pass  # loop already closed
+            return _notify
+
+        registered = []
+        with self._cond:
+            for t in set(tickets):
+                if self._entries.get(t, {}).get("status") == "pending":
+                    pending.add(t)
+                    callback = _listener(t)
+                    self._listeners.setdefault(t, []).append(callback)
+                    registered.append((t, callback))
+        if pending:
+            try:
+                await asyncio.wait_for(all_done.wait(), max(0.0, min(timeout, self.MAX_WAIT_SECONDS)))
+            except asyncio.TimeoutError:
+                pass
+            finally:
+                with self._cond:
+                    for t, callback in registered:
+                        callbacks = self._listeners.get(t)
+                        if callbacks and callback in callbacks:
+                            callbacks.remove(callback)
+                            if not callbacks:
+                                del self._listeners[t]
+        with self._cond:
+            return {t: self._view(t) for t in tickets}
@@ -1,9 +1,33 @@
+import functools
 import threading
-from typing import Callable, Optional
-from xmlrpc.server import SimpleXMLRPCServer
+import time
+from typing import Any, Awaitable, Callable, Optional
+from xmlrpc.server import SimpleXMLRPCRequestHandler, SimpleXMLRPCServer
 from socketserver import ThreadingMixIn
 
+from aio_rpc import AsyncRPCServer
+from metrics import MetricsRegistry
 from utils.logger import log
+from wire import FrameServer
+
+
+class KeepAliveRequestHandler(SimpleXMLRPCRequestHandler):
+    # HTTP/1.1 lets clients reuse one connection for many calls
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self) -> None:
+        # Scrape endpoint: GET /metrics in the Prometheus text format
+        render = getattr(self.server, "metrics_text", None)
+        text = render() if render and self.path.split("?")[0] == "/metrics" else None
+        if text is None:
+            self.report_404()
+            return
+        body = text.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
 
 
 class ThreadingXMLRPCServer(ThreadingMixIn, SimpleXMLRPCServer):
@@ -14,44 +38,207 @@ class RMIServer:
     """
     Minimal XML-RPC server exposing submit_code to simulate remote submissions.
     The actual code execution is simulated by a callback.
+
+    With `framed_port` the same functions are also served over the binary
+    framed transport (wire.FrameServer): persistent connections and
+    pipelined requests, without XML encoding.
+
+    mode="asyncio" serves both transports from one event loop instead of a
+    thread per request (aio_rpc.AsyncRPCServer). Functions registered with
+    `register_async` are awaited there, so idle and long-poll connections
+    cost no thread.
+
+    With `bind_metrics` every call's handling time is recorded per method
+    and the registry is served at `GET /metrics` on the XML-RPC port.
     """
 
-    def __init__(self, host: str, port: int) -> None:
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        framed_port: Optional[int] = None,
+        pipeline_workers: int = 32,
+        mode: str = "threads",
+    ) -> None:
+        if mode not in ("threads", "asyncio"):
+            raise ValueError(f"unknown RMI server mode: {mode}")
         self.host = host
         self.port = port
+        self.framed_port = framed_port
+        self.pipeline_workers = pipeline_workers
+        self.mode = mode
+        self._framed: Optional[FrameServer] = None
+        self._aio: Optional[AsyncRPCServer] = None
+        self._awaitable_submission: Optional[Callable[[str, str], Awaitable[str]]] = None
+        self._coroutines: dict[str, Callable[..., Awaitable[Any]]] = {}
         self._server: Optional[SimpleXMLRPCServer] = None
         self._thread: Optional[threading.Thread] = None
         self._process_submission: Optional[Callable[[str, str], str]] = None
         self._default_executor: Optional[Callable[[str, str], str]] = None
+        self._async_submission: Optional[Callable[..., str]] = None
+        self._admission: Optional[Callable[[], float]] = None
         self._extra_functions: dict[str, Callable[..., object]] = {}
+        self._metrics: Optional[MetricsRegistry] = None
 
     def bind_processor(self, processor: Callable[[str, str], str]) -> None:
         self._process_submission = processor
 
+    def bind_async_processor(self, processor: Callable[..., str]) -> None:
+        # processor must return a ticket id immediately without waiting for the verdict
+        self._async_submission = processor
+
+    def bind_awaitable_processor(self, processor: Callable[[str, str], Awaitable[str]]) -> None:
+        # Coroutine variant of bind_processor, used by the asyncio mode
+        self._awaitable_submission = processor
+
+    def bind_metrics(self, registry: MetricsRegistry) -> None:
+        # Call before start(): functions are wrapped with timing when they are registered
+        registry.describe("rpc_seconds", "summary", "RPC handling time per method")
+        self._metrics = registry
+
+    def _metrics_text(self) -> Optional[str]:
+        return self._metrics.render() if self._metrics is not None else None
+
+    def _observe(self, method: str, seconds: float) -> None:
+        if self._metrics is not None:
+            self._metrics.observe("rpc_seconds", seconds, {"method": method})
+
+    def _timed(self, name: str, fn: Callable[..., Any]) -> Callable[..., Any]:
+        if self._metrics is None:
+            return fn
+
+        @functools.wraps(fn)
+        def _call(*params: Any) -> Any:
+            start = time.perf_counter()
+            try:
+                return fn(*params)
+            finally:
+                self._observe(name, time.perf_counter() - start)
+
+        return _call
+
+    def bind_admission(self, retry_after: Callable[[], float]) -> None:
+        # retry_after() returns 0 when work can be admitted, else seconds to back off
+        self._admission = retry_after
+
+    def _busy(self) -> Optional[str]:
+        if not self._admission:
+            return None
+        delay = self._admission()
+        return f"BUSY: retry after {delay}s" if delay > 0 else None
+
+    def _submit_code_async(self, code: str, tests: str, user: str = "") -> str:
+        if not self._async_submission:
+            return ""
+        busy = self._busy()
+        if busy:
+            return busy
+        log("RMI", f"received async submission len(code)={len(code)} len(tests)={len(tests)}", "DEBUG")
+        # The user is only passed on when given, so two-argument processors keep working
+        if user:
+            return self._async_submission(code, tests, user=user)
+        return self._async_submission(code, tests)
+
     def _submit_code(self, code: str, tests: str) -> str:
         if not self._process_submission and not self._default_executor:
             return "Processor not ready"
-        log("RMI", f"received submission len(code)={len(code)} len(tests)={len(tests)}")
+        busy = self._busy()
+        if busy:
+            return busy
+        log("RMI", f"received submission len(code)={len(code)} len(tests)={len(tests)}", "DEBUG")
         # Delegate to provided processor; expected to be thread-safe
         if self._process_submission:
             return self._process_submission(code, tests)
         return self._default_executor(code, tests)  # type: ignore[func-returns-value]
 
+    async def _submit_code_awaitable(self, code: str, tests: str) -> str:
+        if not self._awaitable_submission:
+            return self._submit_code(code, tests)
+        busy = self._busy()
+        if busy:
+            return busy
+        log("RMI", f"received submission len(code)={len(code)} len(tests)={len(tests)}", "DEBUG")
+        return await self._awaitable_submission(code, tests)
+
+    def _resolve(self, name: str) -> Optional[tuple[Callable[..., Any], bool]]:
+        if name in self._coroutines:
+            return self._coroutines[name], True
+        if name == "submit_code" and self._awaitable_submission:
+            return self._submit_code_awaitable, True
+        fn = self._functions().get(name)
+        return (fn, False) if fn is not None else None
+
     def start(self) -> None:
+        if self.mode == "asyncio":
+            self._aio = AsyncRPCServer(
+                self.host,
+                self.port,
+                self._resolve,
+                self.framed_port,
+                blocking_workers=self.pipeline_workers,
+                observe=self._observe if self._metrics is not None else None,
+                metrics_text=self._metrics_text,
+            )
+            self._aio.start()
+            self.port = self._aio.port
+            self.framed_port = self._aio.framed_port
+            return
+
+        bound = threading.Event()
+
         def _serve() -> None:
-            with ThreadingXMLRPCServer((self.host, self.port), allow_none=True, logRequests=False) as server:
+            with ThreadingXMLRPCServer(
+                (self.host, self.port), requestHandler=KeepAliveRequestHandler, allow_none=True, logRequests=False
+            ) as server:
                 self._server = server
-                server.register_function(self._submit_code, "submit_code")
+                self.port = server.server_address[1]
+                server.metrics_text = self._metrics_text  # type: ignore[attr-defined]
+                # system.multicall batches several calls into one round-trip
+                server.register_multicall_functions()
+                server.register_function(self._timed("submit_code", self._submit_code), "submit_code")
+                server.register_function(self._timed("submit_code_async", self._submit_code_async), "submit_code_async")
                 # register extra functions if provided
                 for name, fn in self._extra_functions.items():
-                    server.register_function(fn, name)
+                    server.register_function(self._timed(name, fn), name)
                 log("RMI", f"listening on {self.host}:{self.port}")
+                bound.set()
                 server.serve_forever()
 
         self._thread = threading.Thread(target=_serve, name=f"RMI:{self.port}", daemon=True)
         self._thread.start()
+        bound.wait(timeout=5.0)
+        if self.framed_port is not None:
+            functions = {name: self._timed(name, fn) for name, fn in self._functions().items()}
+            self._framed = FrameServer(self.host, self.framed_port, functions, self.pipeline_workers)
+            self.framed_port = self._framed.port
+            self._framed.start()
+            log("RMI", f"framed transport listening on {self.host}:{self.framed_port}")
+
+    def _functions(self) -> dict[str, Callable[..., object]]:
+        return {
+            "submit_code": self._submit_code,
+            "submit_code_async": self._submit_code_async,
+            "system.multicall": self._multicall,
+            **self._extra_functions,
+        }
+
+    def _multicall(self, calls: list[dict[str, Any]]) -> list[Any]:
+        # Same contract as SimpleXMLRPCServer.system_multicall, for the framed transport
+        functions = self._functions()
+        results: list[Any] = []
+        for call in calls:
+            try:
+                fn = functions[str(call["methodName"])]
+                results.append([fn(*call.get("params", []))])
+            except Exception as ex:  # noqa: BLE001
+                results.append({"faultCode": 1, "faultString": f"{type(ex)}:{ex}"})
+        return results
 
     def stop(self) -> None:
+        if self._aio is not None:
+            self._aio.stop()
+        if self._framed is not None:
+            self._framed.stop()
         if self._server:
             self._server.shutdown()
             log("RMI", "server shutdown initiated")
@@ -65,7 +252,11 @@ class RMIServer:
     def register(self, name: str, fn: Callable[..., object]) -> None:
         # If server already running, register immediately; else store for later
         if self._server is not None:
-            self._server.register_function(fn, name)
+            self._server.register_function(self._timed(name, fn), name)
+        if self._framed is not None:
+            self._framed.register(name, self._timed(name, fn))
         self._extra_functions[name] = fn
 
-
+    def register_async(self, name: str, fn: Callable[..., Awaitable[Any]]) -> None:
+        # Coroutine implementation of `name` for the asyncio mode; threads mode ignores it
+        self._coroutines[name] = fn
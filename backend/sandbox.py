@@ -0,0 +1,464 @@
+import multiprocessing
+import queue
+import signal
+import threading
+import time
+from types import CodeType
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple, Union
+
+from harness import CompiledHarness, HarnessCache
+from utils.logger import log
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - not available on Windows
+    resource = None  # type: ignore[assignment]
+
+
+DEFAULT_OUTPUT_LIMIT_BYTES = 64 * 1024
+DEFAULT_CASE_TIME_LIMIT = 1.0
+HARNESS_CACHE_CAPACITY = 64
+
+
+class OutputLimitExceeded(Exception):
+    pass
+
+
+class BoundedOutput:
+    """
+    Per-submission stdout buffer that stops accepting data once `limit` bytes
+    have been written. Nothing process-global is swapped, so concurrent
+    submissions in one process cannot see each other's output.
+    """
+
+    def __init__(self, limit: int = DEFAULT_OUTPUT_LIMIT_BYTES) -> None:
+        self.limit = limit
+        self.exceeded = False
+        self._parts: List[str] = []
+        self._size = 0
+
+    def write(self, text: str) -> None:
+        if self.exceeded:
+            raise OutputLimitExceeded()
+        size = len(text.encode("utf-8", "replace"))
+        if self._size + size > self.limit:
+            self.exceeded = True
+            raise OutputLimitExceeded()
+        self._parts.append(text)
+        self._size += size
+
+    def getvalue(self) -> str:
+        return "".join(self._parts)
+
+    def make_print(self) -> Callable[..., None]:
+        def _print(*args: Any, sep: Optional[str] = " ", end: Optional[str] = "\n", file: Any = None, flush: bool = False) -> None:
+            sep = " " if sep is None else str(sep)
+            end = "\n" if end is None else str(end)
+            self.write(sep.join(str(a) for a in args) + end)
+        return _print
+
+
+def safe_globals(output: Optional[BoundedOutput] = None) -> Dict[str, Any]:
+    allowed_builtins = {
+        "range": range,
+        "len": len,
+        "sum": sum,
+        "min": min,
+        "max": max,
+        "print": output.make_print() if output is not None else print,
+        "abs": abs,
+        "enumerate": enumerate,
+        "map": map,
+        "filter": filter,
+        "list": list,
+        "dict": dict,
+        "set": set,
+        "int": int,
+        "float": float,
+        "str": str,
+        "bool": bool,
+        "zip": zip,
+    }
+    return {"__builtins__": allowed_builtins}
+
+
+def run_code(
+    code: Union[str, CodeType],
+    tests: Union[str, CodeType],
+    output_limit: int = DEFAULT_OUTPUT_LIMIT_BYTES,
+) -> str:
+    """
+    Execute user code followed by its tests and return the verdict string:
+    captured stdout (or "OK" when empty) on success, "ERROR: ..." on failure,
+    "OUTPUT_LIMIT_EXCEEDED" once more than `output_limit` bytes were printed.
+    """
+    stdout = BoundedOutput(output_limit)
+    g = safe_globals(stdout)
+    try:
+        exec(code, g, g)
+        if isinstance(tests, CodeType) or tests.strip():
+            exec(tests, g, g)
+    except Exception as ex:  # noqa: BLE001
+        if stdout.exceeded:
+            return "OUTPUT_LIMIT_EXCEEDED"
+        return f"ERROR: {ex}"[:output_limit]
+    # Code may have swallowed the exception with a bare except
+    if stdout.exceeded:
+        return "OUTPUT_LIMIT_EXCEEDED"
+    result = stdout.getvalue()
+    return result if result else "OK"
+
+
+class CaseTimeout(BaseException):
+    # BaseException so user code catching Exception cannot swallow it
+    pass
+
+
+def _on_alarm(signum: int, frame: Any) -> None:
+    raise CaseTimeout()
+
+
+def case_result(index: int, verdict: str, elapsed: float = 0.0, detail: str = "") -> Dict[str, Any]:
+    return {"index": index, "verdict": verdict, "time": round(elapsed, 4), "detail": detail}
+
+
+def _run_case(g: Dict[str, Any], case: Dict[str, Any], output_limit: int, use_alarm: bool) -> Tuple[str, float, str]:
+    out = BoundedOutput(output_limit)
+    g["__builtins__"]["print"] = out.make_print()
+    limit = float(case.get("time_limit") or DEFAULT_CASE_TIME_LIMIT)
+    expected = str(case.get("expected", "")).strip()
+    start = time.perf_counter()
+    try:
+        if use_alarm:
+            signal.setitimer(signal.ITIMER_REAL, limit)
+        try:
+            value = eval(compile(str(case.get("input", "")), "<case>", "eval"), g, g)
+        finally:
+            if use_alarm:
+                signal.setitimer(signal.ITIMER_REAL, 0)
+    except CaseTimeout:
+        return "TIME_LIMIT_EXCEEDED", time.perf_counter() - start, f"exceeded {limit}s"
+    except Exception as ex:  # noqa: BLE001
+        if out.exceeded:
+            return "OUTPUT_LIMIT_EXCEEDED", time.perf_counter() - start, ""
+        return "RUNTIME_ERROR", time.perf_counter() - start, str(ex)[:200]
+    elapsed = time.perf_counter() - start
+    if out.exceeded:
+        return "OUTPUT_LIMIT_EXCEEDED", elapsed, ""
+    if elapsed > limit:
+        return "TIME_LIMIT_EXCEEDED", elapsed, f"exceeded {limit}s"
+    actual = repr(value) if value is not None else out.getvalue()
+    if actual.strip() == expected:
+        return "PASS", elapsed, ""
+    return "WRONG_ANSWER", elapsed, f"expected {expected[:100]!r}, got {actual.strip()[:100]!r}"
+
+
+def run_cases(
+    code: str,
+    cases: List[Dict[str, Any]],
+    output_limit: int = DEFAULT_OUTPUT_LIMIT_BYTES,
+    stop_on_failure: bool = True,
+) -> List[Dict[str, Any]]:
+    """
+    Execute user code once, then evaluate each structured test case against
+    it. A case's `input` is an expression; its value (repr) or, when it
+    returns None, its printed output must equal `expected`. Each case runs
+    under its own `time_limit`, enforced with SIGALRM when running on the
+    main thread of a sandbox process.
+    """
+    use_alarm = hasattr(signal, "setitimer") and threading.current_thread() is threading.main_thread()
+    previous = signal.signal(signal.SIGALRM, _on_alarm) if use_alarm else None
+    results: List[Dict[str, Any]] = []
+    try:
+        g = safe_globals(BoundedOutput(output_limit))
+        setup_error: Optional[str] = None
+        try:
+            exec(code, g, g)
+        except Exception as ex:  # noqa: BLE001
+            setup_error = str(ex)[:200]
+        failed = False
+        for pos, case in enumerate(cases):
+            index = int(case.get("index", pos))
+            if failed and stop_on_failure:
+                results.append(case_result(index, "SKIPPED"))
+                continue
+            if setup_error is not None:
+                verdict, elapsed, detail = "RUNTIME_ERROR", 0.0, setup_error
+            else:
+                try:
+                    verdict, elapsed, detail = _run_case(g, case, output_limit, use_alarm)
+                except CaseTimeout:
+                    # Alarm fired between evaluation and cancelling the timer
+                    verdict, elapsed, detail = "TIME_LIMIT_EXCEEDED", 0.0, ""
+            results.append(case_result(index, verdict, elapsed, detail))
+            failed = failed or verdict != "PASS"
+    finally:
+        if use_alarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, previous)
+    return results
+
+
+# (cache_id, marshaled payload or None when the worker already has it, use starter code)
+HarnessRef = Tuple[str, Optional[bytes], bool]
+
+
+def _harness_ref(harness: Optional[CompiledHarness], code: str, send_payload: bool = True) -> Optional[HarnessRef]:
+    if harness is None:
+        return None
+    use_starter = harness.starter is not None and code == harness.starter_src
+    return (harness.cache_id, harness.payload if send_payload else None, use_starter)
+
+
+def _run_job(
+    code: str,
+    tests: str,
+    output_limit: int,
+    ref: Optional[HarnessRef],
+    cache: HarnessCache,
+) -> str:
+    if ref is None:
+        return run_code(code, tests, output_limit)
+    cache_id, payload, use_starter = ref
+    compiled_tests, starter = cache.load(cache_id, payload)
+    return run_code(starter if use_starter and starter is not None else code, compiled_tests, output_limit)
+
+
+def _child_main(conn: Any, code: str, tests: str, output_limit: int, ref: Optional[HarnessRef]) -> None:
+    try:
+        conn.send(_run_job(code, tests, output_limit, ref, HarnessCache(capacity=1)))
+    finally:
+        conn.close()
+
+
+def _max_rss_kb() -> int:
+    if resource is None:
+        return 0
+    # ru_maxrss is reported in kilobytes on Linux
+    return int(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+
+
+def _worker_main(conn: Any) -> None:
+    # Warm worker loop: one job at a time until the parent closes the pipe
+    harnesses = HarnessCache(capacity=HARNESS_CACHE_CAPACITY)
+    while True:
+        try:
+            job = conn.recv()
+        except (EOFError, OSError):
+            break
+        if job is None:
+            break
+        kind = job[0]
+        if kind == "cases":
+            _, code, cases, output_limit, stop_on_failure = job
+            result: Any = run_cases(code, cases, output_limit, stop_on_failure)
+        else:
+            _, code, tests, output_limit, ref = job
+            result = _run_job(code, tests, output_limit, ref, harnesses)
+        conn.send((result, _max_rss_kb()))
+    conn.close()
+
+
+def default_start_method() -> str:
+    # fork is by far the cheapest way to get a sandbox on Linux
+    methods = multiprocessing.get_all_start_methods()
+    return "fork" if "fork" in methods else "spawn"
+
+
+class ProcessSandbox:
+    """
+    Runs every submission in its own child process. The parent waits on a pipe
+    until the deadline and kills the child if it has not answered, so a runaway
+    submission never keeps the calling worker thread busy past its timeout.
+    """
+
+    def __init__(
+        self,
+        node_id: int,
+        start_method: Optional[str] = None,
+        output_limit_bytes: int = DEFAULT_OUTPUT_LIMIT_BYTES,
+    ) -> None:
+        self.node_id = node_id
+        self.output_limit_bytes = output_limit_bytes
+        self._ctx = multiprocessing.get_context(start_method or default_start_method())
+
+    def run(self, code: str, tests: str, timeout_seconds: float, harness: Optional[CompiledHarness] = None) -> str:
+        parent_conn, child_conn = self._ctx.Pipe(duplex=False)
+        proc = self._ctx.Process(
+            target=_child_main,
+            args=(child_conn, code, tests, self.output_limit_bytes, _harness_ref(harness, code)),
+            name=f"N{self.node_id}-sandbox",
+            daemon=True,
+        )
+        proc.start()
+        child_conn.close()
+        try:
+            if not parent_conn.poll(timeout_seconds):
+                log("Sandbox", f"node={self.node_id} pid={proc.pid} exceeded {timeout_seconds}s, killing")
+                return "TIMEOUT"
+            try:
+                return parent_conn.recv()
+            except EOFError:
+                # Child died without reporting (e.g. killed by the OS)
+                proc.join(timeout=1.0)
+                return f"ERROR: sandbox exited with code {proc.exitcode}"
+        finally:
+            parent_conn.close()
+            if proc.is_alive():
+                proc.kill()
+            proc.join(timeout=1.0)
+
+
+class _Worker:
+    def __init__(self, ctx: Any, node_id: int, index: int) -> None:
+        self.conn, child_conn = ctx.Pipe()
+        self.proc = ctx.Process(target=_worker_main, args=(child_conn,), name=f"N{node_id}-worker{index}", daemon=True)
+        self.proc.start()
+        child_conn.close()
+        self.jobs = 0
+        self.rss_kb = 0
+        # Mirrors the worker's HarnessCache so each payload is shipped once
+        self.harnesses: Set[str] = set()
+
+    def harness_ref(self, harness: Optional[CompiledHarness], code: str) -> Optional[HarnessRef]:
+        if harness is None:
+            return None
+        known = harness.cache_id in self.harnesses
+        if not known:
+            if len(self.harnesses) >= HARNESS_CACHE_CAPACITY:
+                self.harnesses.clear()
+            self.harnesses.add(harness.cache_id)
+        return _harness_ref(harness, code, send_payload=not known)
+
+    def kill(self) -> None:
+        self.conn.close()
+        if self.proc.is_alive():
+            self.proc.kill()
+        self.proc.join(timeout=1.0)
+
+    def retire(self) -> None:
+        try:
+            self.conn.send(None)
+        except (BrokenPipeError, OSError):
+            pass
+        self.proc.join(timeout=1.0)
+        self.kill()
+
+
+class WorkerPool:
+    """
+    Pre-forked pool of warm sandbox workers for one node. Workers are forked
+    from the already-initialised backend, so a job only pays for a pipe round
+    trip instead of a fresh process. A worker is killed and replaced when it
+    misses a deadline, and recycled after `max_jobs_per_worker` jobs or once
+    its peak RSS goes over `max_rss_mb`.
+    """
+
+    def __init__(
+        self,
+        node_id: int,
+        size: int = 2,
+        max_jobs_per_worker: int = 200,
+        max_rss_mb: int = 256,
+        start_method: Optional[str] = None,
+        output_limit_bytes: int = DEFAULT_OUTPUT_LIMIT_BYTES,
+    ) -> None:
+        self.node_id = node_id
+        self.output_limit_bytes = output_limit_bytes
+        self.size = max(1, int(size))
+        self.max_jobs_per_worker = max_jobs_per_worker
+        self.max_rss_kb = max_rss_mb * 1024
+        self._ctx = multiprocessing.get_context(start_method or default_start_method())
+        self._idle: "queue.Queue[_Worker]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._spawned = 0
+        self._recycled = 0
+        self._closed = False
+        for _ in range(self.size):
+            self._idle.put(self._spawn())
+
+    def _spawn(self) -> _Worker:
+        with self._lock:
+            self._spawned += 1
+            index = self._spawned
+        return _Worker(self._ctx, self.node_id, index)
+
+    def _replace(self, worker: _Worker, reason: str, retire: bool = False) -> _Worker:
+        if retire:
+            worker.retire()
+        else:
+            worker.kill()
+        with self._lock:
+            self._recycled += 1
+        log("Sandbox", f"node={self.node_id} pid={worker.proc.pid} recycled ({reason})")
+        return self._spawn()
+
+    def _call(self, build_job: Callable[[_Worker], Any], timeout_seconds: float) -> Tuple[str, Any]:
+        """
+        Send one job to an idle worker and wait for its reply. Returns
+        ("ok", result), ("timeout", None) or ("error", message).
+        """
+        if self._closed:
+            return "error", "ERROR: worker pool closed"
+        worker = self._idle.get()
+        try:
+            try:
+                worker.conn.send(build_job(worker))
+                ready = worker.conn.poll(timeout_seconds)
+                reply: Optional[Tuple[Any, int]] = worker.conn.recv() if ready else None
+            except (EOFError, BrokenPipeError, OSError):
+                worker = self._replace(worker, "crashed")
+                return "error", "ERROR: sandbox worker exited unexpectedly"
+            if reply is None:
+                worker = self._replace(worker, "timeout")
+                return "timeout", None
+            result, worker.rss_kb = reply
+            worker.jobs += 1
+            if worker.jobs >= self.max_jobs_per_worker:
+                worker = self._replace(worker, f"{worker.jobs} jobs", retire=True)
+            elif self.max_rss_kb and worker.rss_kb > self.max_rss_kb:
+                worker = self._replace(worker, f"rss={worker.rss_kb}kB", retire=True)
+            return "ok", result
+        finally:
+            if self._closed:
+                worker.kill()
+            else:
+                self._idle.put(worker)
+
+    def run(self, code: str, tests: str, timeout_seconds: float, harness: Optional[CompiledHarness] = None) -> str:
+        status, result = self._call(
+            lambda w: ("run", code, tests, self.output_limit_bytes, w.harness_ref(harness, code)),
+            timeout_seconds,
+        )
+        return "TIMEOUT" if status == "timeout" else result
+
+    def run_cases(self, code: str, cases: List[Dict[str, Any]], stop_on_failure: bool = True) -> List[Dict[str, Any]]:
+        # Per-case limits are enforced in the worker; the pool deadline is a backstop
+        deadline = sum(float(c.get("time_limit") or DEFAULT_CASE_TIME_LIMIT) for c in cases) + 1.0
+        status, result = self._call(
+            lambda w: ("cases", code, cases, self.output_limit_bytes, stop_on_failure),
+            deadline,
+        )
+        if status == "ok":
+            return result
+        verdict = "TIME_LIMIT_EXCEEDED" if status == "timeout" else "RUNTIME_ERROR"
+        return [case_result(int(c.get("index", i)), verdict, detail=result or "") for i, c in enumerate(cases)]
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"size": self.size, "spawned": self._spawned, "recycled": self._recycled}
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def shutdown(self) -> None:
+        self._closed = True
+        workers: List[_Worker] = []
+        while True:
+            try:
+                workers.append(self._idle.get_nowait())
+            except queue.Empty:
+                break
+        for worker in workers:
+            worker.kill()
@@ -0,0 +1,195 @@
+import queue
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from utils.logger import log
+
+# Stored outputs are truncated; the verdict and the head of the output are enough for history
+MAX_STORED_OUTPUT = 4096
+MAX_PAGE_SIZE = 200
+MAX_IDLE_READERS = 8
+
+_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS submissions (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        ticket TEXT NOT NULL DEFAULT '',
+        user TEXT NOT NULL DEFAULT '',
+        problem TEXT NOT NULL DEFAULT '',
+        verdict TEXT NOT NULL,
+        output TEXT NOT NULL DEFAULT '',
+        duration REAL NOT NULL DEFAULT 0,
+        created REAL NOT NULL
+    )
+    """,
+    # History pages are newest first by id, so every filter index ends in id
+    "CREATE INDEX IF NOT EXISTS idx_submissions_user ON submissions(user, id)",
+    "CREATE INDEX IF NOT EXISTS idx_submissions_problem ON submissions(problem, id)",
+    "CREATE INDEX IF NOT EXISTS idx_submissions_user_problem ON submissions(user, problem, id)",
+    "CREATE INDEX IF NOT EXISTS idx_submissions_created ON submissions(created)",
+)
+
+_COLUMNS = ("id", "ticket", "user", "problem", "verdict", "output", "duration", "created")
+
+# (ticket, user, problem, verdict, output, duration, created)
+Row = Tuple[str, str, str, str, str, float, float]
+
+
+class SubmissionStore:
+    """
+    Submission history in SQLite (WAL mode for file databases). Callers only
+    enqueue records; a writer thread commits them in batches of up to
+    `batch_size` rows per transaction (group commit), so the submission path
+    never waits on disk. When the queue is full records are dropped and
+    counted, as the async logger does. Queries page by id (keyset
+    pagination), which stays cheap however many rows the table holds.
+    """
+
+    def __init__(self, path: str = ":memory:", batch_size: int = 512, queue_size: int = 100000) -> None:
+        self.path = path
+        self.batch_size = max(1, int(batch_size))
+        self._queue: "queue.Queue[Optional[Row]]" = queue.Queue(maxsize=queue_size)
+        self._memory = path == ":memory:"
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        if not self._memory:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            # WAL + NORMAL: commits do not fsync; a crash loses at most the last batches
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+        for statement in _SCHEMA:
+            self._conn.execute(statement)
+        self._conn.commit()
+        # The in-memory database only exists on its one connection, shared under this lock
+        self._conn_lock = threading.Lock()
+        self._pool_lock = threading.Lock()
+        self._idle_readers: List[sqlite3.Connection] = []
+        self.written = 0
+        self.dropped = 0
+        self.batches = 0
+        self._thread = threading.Thread(target=self._writer, name="SubmissionStore", daemon=True)
+        self._thread.start()
+
+    def record(
+        self,
+        verdict: str,
+        output: str = "",
+        user: str = "",
+        problem: str = "",
+        ticket: str = "",
+        duration: float = 0.0,
+    ) -> None:
+        row = (ticket, user, problem, verdict, output[:MAX_STORED_OUTPUT], round(duration, 4), time.time())
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            self.dropped += 1
+
+    def _writer(self) -> None:
+        while True:
+            row = self._queue.get()
+            batch: List[Row] = []
+            stopping = row is None
+            if row is not None:
+                batch.append(row)
+            while not stopping and len(batch) < self.batch_size:
+                try:
+                    row = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if row is None:
+                    stopping = True
+                else:
+                    batch.append(row)
+            if batch:
+                try:
+                    with self._conn_lock:
+                        self._conn.executemany(
+                            "INSERT INTO submissions (ticket, user, problem, verdict, output, duration, created)"
+                            " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                            batch,
+                        )
+                        self._conn.commit()
+                    self.written += len(batch)
+                    self.batches += 1
+                except sqlite3.Error as ex:
+                    self.dropped += len(batch)
+                    log("History", f"dropped {len(batch)} submissions: {ex}", "ERROR")
+            for _ in range(len(batch) + (1 if stopping else 0)):
+                self._queue.task_done()
+            if stopping:
+                return
+
+    def flush(self) -> None:
+        """Block until every record enqueued so far is committed."""
+        self._queue.join()
+
+    def _read(self, sql: str, params: Tuple[Any, ...]) -> List[Tuple[Any, ...]]:
+        if self._memory:
+            with self._conn_lock:
+                return self._conn.execute(sql, params).fetchall()
+        # File databases: pooled reader connections; WAL readers never block the writer
+        with self._pool_lock:
+            conn = self._idle_readers.pop() if self._idle_readers else None
+        if conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+        try:
+            return conn.execute(sql, params).fetchall()
+        finally:
+            with self._pool_lock:
+                if len(self._idle_readers) < MAX_IDLE_READERS:
+                    self._idle_readers.append(conn)
+                    conn = None
+            if conn is not None:
+                conn.close()
+
+    def list_submissions(
+        self, user: str = "", problem: str = "", cursor: str = "", limit: int = 50, since: float = 0.0
+    ) -> Dict[str, Any]:
+        """
+        Newest-first page of submissions, optionally filtered by user,
+        problem and creation time. Pass the returned `next_cursor` back to
+        get the following page; it is "" on the last page.
+        """
+        limit = max(1, min(int(limit) or 50, MAX_PAGE_SIZE))
+        clauses: List[str] = []
+        params: List[Any] = []
+        if user:
+            clauses.append("user = ?")
+            params.append(user)
+        if problem:
+            clauses.append("problem = ?")
+            params.append(problem)
+        if cursor:
+            clauses.append("id < ?")
+            params.append(int(cursor))
+        if since:
+            clauses.append("created >= ?")
+            params.append(float(since))
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        rows = self._read(
+            f"SELECT {', '.join(_COLUMNS)} FROM submissions{where} ORDER BY id DESC LIMIT ?",
+            tuple(params) + (limit + 1,),
+        )
+        items = [dict(zip(_COLUMNS, row)) for row in rows[:limit]]
+        more = len(rows) > limit
+        return {"items": items, "next_cursor": str(items[-1]["id"]) if more else ""}
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "written": self.written,
+            "pending": self._queue.qsize(),
+            "dropped": self.dropped,
+            "batches": self.batches,
+        }
+
+    def close(self) -> None:
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join(timeout=5.0)
+        with self._pool_lock:
+            for conn in self._idle_readers:
+                conn.close()
+            self._idle_readers = []
+        with self._conn_lock:
+            self._conn.close()
@@ -1,11 +1,31 @@
+import asyncio
+import io
+import json
+import socket
 import threading
 import time
+import xmlrpc.client
+from concurrent.futures import TimeoutError as FutureTimeout
+from typing import Any, Dict
 
+import pytest
+
+from catalog import ProblemCatalog
 from clock_sync import LamportClock
 from election import BullyElection
+from event_ring import EventRing
+from failure_detector import PhiAccrualDetector
 from load_balancer import LoadBalancer
+from metrics import Histogram
 from node_manager import NodeManager
-from replication import ReplicatedStore
+from node_worker import NodeWorker, spawn_node_processes, wait_until_listening
+from replication import ReplicatedStore, _bucket_of
+from result_table import ResultTable
+from rmi_server import RMIServer
+from sandbox import WorkerPool, run_code
+from submission_store import SubmissionStore
+from utils.logger import AsyncLogger
+from wire import PipelinedClient, RemoteError, error_reply, recv_frame, send_frame
 
 
 def test_skeleton_components_import_and_basic_behavior():
@@ -44,3 +64,823 @@ def test_skeleton_components_import_and_basic_behavior():
 
 
 
+
+
+def test_execute_submission_kills_runaway_code():
+    mgr = NodeManager({1: 9101})
+    try:
+        assert mgr.execute_submission("print('hi')", "") == "hi\n"
+        assert mgr.execute_submission("x = 1", "") == "OK"
+        assert mgr.execute_submission("raise ValueError('bad')", "").startswith("ERROR: ")
+
+        # Two runaway submissions must not wedge the node's two worker slots
+        start = time.time()
+        assert mgr.execute_submission("while True:\n    pass", "", timeout_seconds=0.3) == "TIMEOUT"
+        assert mgr.execute_submission("while True:\n    pass", "", timeout_seconds=0.3) == "TIMEOUT"
+        assert mgr.execute_submission("print(sum(range(10)))", "") == "45\n"
+        assert time.time() - start < 5
+    finally:
+        mgr.stop()
+
+
+def test_worker_pool_recycles_workers():
+    pool = WorkerPool(1, size=1, max_jobs_per_worker=2)
+    try:
+        for _ in range(4):
+            assert pool.run("print(1)", "", 2.0) == "1\n"
+        assert pool.run("while True:\n    pass", "", 0.2) == "TIMEOUT"
+        assert pool.run("print(2)", "", 2.0) == "2\n"
+        stats = pool.stats()
+        assert stats["recycled"] == 3
+        assert stats["spawned"] == 4
+    finally:
+        pool.shutdown()
+
+    mgr = NodeManager({1: 9101, 2: 9102}, pool_sizes={2: 3})
+    try:
+        assert mgr.nodes[1].workers == 2
+        assert mgr.nodes[2].workers == 3
+        assert mgr.get_status()["nodes"]["2"]["workers"] == 3
+    finally:
+        mgr.stop()
+
+
+def test_submit_async_tickets_and_long_poll():
+    mgr = NodeManager({1: 9101, 2: 9102})
+    try:
+        slow = mgr.submit_async("while True:\n    pass", "", timeout_seconds=0.3)
+        fast = mgr.submit_async("print('t')", "")
+        assert mgr.get_result("missing")["status"] == "unknown"
+        done = mgr.wait_results([slow, fast], timeout=5.0)
+        assert done[fast]["status"] == "done" and done[fast]["output"] == "t\n"
+        assert done[slow]["output"] == "TIMEOUT"
+        assert mgr.get_result(fast)["duration"] is not None
+    finally:
+        mgr.stop()
+
+    table = ResultTable(capacity=2)
+    first = table.create()
+    table.complete(first, "OK")
+    table.create()
+    table.create()
+    assert table.get(first)["status"] == "unknown"
+
+    # Finished entries leave in completion order, pending ones stay until evicted
+    table = ResultTable(capacity=10, ttl_seconds=0.05)
+    older, newer, waiting = table.create(), table.create(), table.create()
+    table.complete(newer, "2")
+    time.sleep(0.1)
+    table.complete(older, "1")
+    table.create()
+    assert [table.get(t)["status"] for t in (older, newer, waiting)] == ["done", "unknown", "pending"]
+    time.sleep(0.1)
+    table.create()
+    assert [table.get(t)["status"] for t in (older, waiting)] == ["unknown", "pending"]
+    assert len(table._done) == 0 and len(table._entries) == 3
+
+
+def test_output_capture_is_per_submission_and_capped():
+    outputs = {}
+
+    def _run(i: int) -> None:
+        outputs[i] = run_code(f"for _ in range(200):\n    print({i})", "")
+
+    threads = [threading.Thread(target=_run, args=(i,)) for i in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    for i, out in outputs.items():
+        assert out == f"{i}\n" * 200
+
+    assert run_code("while True:\n    print('x' * 100)", "", output_limit=1024) == "OUTPUT_LIMIT_EXCEEDED"
+    swallowed = "for _ in range(100):\n    try:\n        print('y' * 100)\n    except:\n        pass"
+    assert run_code(swallowed, "", output_limit=1024) == "OUTPUT_LIMIT_EXCEEDED"
+    assert run_code("print('a', 'b', sep='-', end='!')", "") == "a-b!"
+
+
+def test_submit_many_runs_in_parallel_and_keeps_order():
+    mgr = NodeManager({1: 9101, 2: 9102}, batch_limit=6)
+    try:
+        items = [{"code": f"print({i})", "tests": ""} for i in range(8)]
+        data = mgr.submit_many(items)
+        assert data["submitted"] == 6
+        assert data["outputs"] == [f"{i}\n" for i in range(6)]
+        # The batch is spread over both nodes rather than run one by one
+        nodes_used = {r["node"] for r in mgr.get_runtime_metrics()["recent"]}
+        assert nodes_used == {1, 2}
+
+        tickets = mgr.submit_many_async(items[:3])
+        done = mgr.wait_results(tickets, timeout=10.0)
+        assert [done[t]["output"] for t in tickets] == ["0\n", "1\n", "2\n"]
+
+        # Malformed items get an error in their slot instead of stalling the batch
+        bad = mgr.submit_many(["print(1)", {"code": "print(2)"}, {"code": "print(3)"}], timeout_seconds="soon")
+        assert len(bad["outputs"]) == 3 and all(o.startswith("ERROR") for o in bad["outputs"])
+        mixed = mgr.submit_many(["print(1)", {"code": "print(2)", "tests": ""}])
+        assert mixed["outputs"][0].startswith("ERROR: batch item") and mixed["outputs"][1] == "2\n"
+    finally:
+        mgr.stop()
+
+
+def test_verdict_cache_hits_coalesces_and_invalidates():
+    mgr = NodeManager({1: 9101, 2: 9102})
+    try:
+        mgr.set_problems({"p": {"title": "P", "tests": "assert f() == 1"}})
+        data = mgr.submit_batch(5)
+        assert data["outputs"] == ["batch\n"] * 5
+        assert len(mgr.get_runtime_metrics()["recent"]) == 1
+
+        code = "def f():\n    return 1\n"
+        assert mgr.execute_submission(code, "assert f() == 1") == "OK"
+        assert mgr.execute_submission(code + "\n\n", "assert f() == 1") == "OK"
+        stats = mgr.get_runtime_metrics()["cache"]
+        assert stats["hits"] + stats["coalesced"] == 5
+        assert stats["misses"] == 2
+        # CRLF is normalized, but trailing spaces can change what the program prints
+        assert mgr.execute_submission(code.replace("\n", "\r\n"), "assert f() == 1") == "OK"
+        assert mgr.get_runtime_metrics()["cache"]["misses"] == 2
+        assert mgr.execute_submission('print(len("""a\n"""))', "") == "2\n"
+        assert mgr.execute_submission('print(len("""a  \n"""))', "") == "4\n"
+
+        mgr.replicate_problem("p", "new tests")
+        assert mgr.execute_submission(code, "assert f() == 1") == "OK"
+        assert mgr.get_runtime_metrics()["cache"]["misses"] == 5
+
+        # A verdict under a generous deadline is not served to a tighter one
+        slow = "x = 0\nfor i in range(5000000):\n    x += i\nprint('done')"
+        assert mgr.execute_submission(slow, "", timeout_seconds=10.0) == "done\n"
+        assert mgr.execute_submission(slow, "", timeout_seconds=0.05) == "TIMEOUT"
+    finally:
+        mgr.stop()
+
+
+def test_problem_harness_is_precompiled_and_versioned():
+    mgr = NodeManager({1: 9101}, default_pool_size=1)
+    try:
+        mgr.set_problems({
+            "sq": {"title": "Square", "starter_code": "def sq(x):\n    return x * x", "tests": "assert sq(3) == 9\nprint('pass')"},
+            "broken": {"title": "Broken", "tests": "assert ("},
+        })
+        assert "broken" not in mgr._harnesses
+        harness = mgr._harnesses["sq"]
+        assert harness.cache_id == "sq@1"
+        assert mgr.execute_problem("sq", "def sq(x):\n    return x * x") == "pass\n"
+        assert mgr.execute_problem("sq", "def sq(x):\n    return x + x").startswith("ERROR")
+        assert mgr.execute_problem("nope", "x = 1") == "ERROR: unknown problem 'nope'"
+
+        mgr.replicate_problem("sq", "Square numbers")
+        assert mgr._harnesses["sq"].cache_id == "sq@2"
+        ticket = mgr.submit_problem_async("sq", "def sq(x):\n    return x ** 2")
+        assert mgr.wait_results([ticket], 5.0)[ticket]["output"] == "pass\n"
+
+        # A cases-only problem must not capture plain submissions with empty tests
+        mgr.set_problems({"double": {"title": "Double", "tests": "", "cases": [{"input": "f(1)", "expected": "2"}]}})
+        assert mgr.execute_submission("print(1)", "") == "1\n"
+        assert mgr.submit_many([{"code": "print(2)", "tests": ""}])["outputs"] == ["2\n"]
+    finally:
+        mgr.stop()
+
+
+def test_judge_problem_shards_cases_with_early_exit():
+    mgr = NodeManager({1: 9101, 2: 9102}, cases_per_shard=2)
+    try:
+        cases = [{"input": f"double({i})", "expected": str(2 * i), "time_limit": 0.5} for i in range(6)]
+        cases.append({"input": "spin()", "expected": "", "time_limit": 0.2})
+        mgr.set_problems({"double": {"title": "Double", "tests": "", "cases": cases}})
+        good = "def double(x):\n    return x * 2\ndef spin():\n    while True:\n        pass"
+        report = mgr.judge_problem("double", good, stop_on_first_failure=False)
+        assert report["shards"] == 4
+        assert [r["verdict"] for r in report["cases"]] == ["PASS"] * 6 + ["TIME_LIMIT_EXCEEDED"]
+        assert report["verdict"] == "TIME_LIMIT_EXCEEDED" and report["passed"] == 6
+
+        # Only the first shard fails, so no other shard can abort it before it starts
+        # (skipping queued shards is covered by the single-worker test below)
+        wrong = "def double(x):\n    return 3 if x == 1 else x * 2"
+        report = mgr.judge_problem("double", wrong)
+        assert report["verdict"] == "WRONG_ANSWER"
+        assert report["cases"][0]["verdict"] == "PASS"
+        assert report["cases"][1]["verdict"] == "WRONG_ANSWER"
+    finally:
+        mgr.stop()
+
+
+def test_judge_problem_skips_queued_shards_after_a_failure():
+    # One worker, one case per shard: later shards are still queued when the first fails
+    mgr = NodeManager({1: 9101}, default_pool_size=1, cases_per_shard=1, work_stealing=False)
+    try:
+        cases = [{"input": "f(0)", "expected": "1", "time_limit": 0.5}]
+        cases += [{"input": "spin()", "expected": "", "time_limit": 0.5} for _ in range(3)]
+        mgr.set_problems({"f": {"title": "F", "tests": "", "cases": cases}})
+        code = "def f(x):\n    return 0\ndef spin():\n    while True:\n        pass"
+        started = time.time()
+        report = mgr.judge_problem("f", code, stop_on_first_failure=True)
+        assert report["shards"] == 4
+        assert [r["verdict"] for r in report["cases"]] == ["WRONG_ANSWER"] + ["SKIPPED"] * 3
+        # None of the spinning cases ran
+        assert time.time() - started < 0.5
+    finally:
+        mgr.stop()
+
+
+def test_async_logger_levels_sampling_and_json_sink(tmp_path):
+    out = io.StringIO()
+    logger = AsyncLogger(stream=out)
+    json_path = tmp_path / "log.jsonl"
+    logger.configure(components={"Noisy": "WARNING"}, rate_limits={"Clock": 5}, json_path=str(json_path))
+    logger.log("Main", "hello")
+    logger.log("Main", "hidden", "DEBUG")
+    logger.log("Noisy", "filtered")
+    logger.log("Noisy", "kept", "ERROR")
+    for i in range(50):
+        logger.log("Clock", f"tick {i}")
+    logger.flush()
+
+    text = out.getvalue()
+    assert "[Main] hello" in text and "hidden" not in text
+    assert "filtered" not in text and "[ERROR] [Noisy] kept" in text
+    assert 1 <= text.count("[Clock]") <= 6
+    assert logger.stats()["suppressed"]["Clock"] >= 44
+    records = [json.loads(line) for line in json_path.read_text().splitlines()]
+    assert records[0]["component"] == "Main" and records[0]["msg"] == "hello"
+
+
+def test_load_balancer_weights_atomic_acquire_and_p2c():
+    lb = LoadBalancer()
+    lb.add_node(1, 0, capacity=1)
+    lb.add_node(2, 0, capacity=3)
+    picks = [lb.acquire() for _ in range(8)]
+    assert picks.count(2) == 6 and picks.count(1) == 2
+    lb.remove_node(2)
+    assert lb.choose_node() == 1
+    assert lb.release(1) == 1
+
+    lb = LoadBalancer()
+    for nid in range(50):
+        lb.add_node(nid)
+    chosen = []
+    threads = [threading.Thread(target=lambda: chosen.append(lb.acquire())) for _ in range(50)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    # Each concurrent acquire saw the previous increment
+    assert sorted(chosen) == list(range(50))
+
+    p2c = LoadBalancer(mode="p2c", seed=1)
+    for nid in range(100):
+        p2c.add_node(nid, load=nid)
+    assert all(p2c.choose_node() is not None for _ in range(20))
+
+
+def test_bounded_node_queues_reject_with_busy():
+    mgr = NodeManager({1: 9101}, default_pool_size=1, queue_limit_per_worker=1)
+    try:
+        spin = "while True:\n    pass"
+        running = mgr.submit_async(spin + "\n# a", "", timeout_seconds=0.5)
+        time.sleep(0.1)
+        queued = mgr.submit_async(spin + "\n# b", "", timeout_seconds=0.5)
+        assert mgr.get_status()["nodes"]["1"]["queued"] == 1
+        assert mgr.retry_after() > 0
+        assert mgr.submit_async("print(1)", "").startswith("BUSY: retry after")
+        assert mgr.execute_submission("print(2)", "").startswith("BUSY")
+        # Rejected submissions never ran: they must not be recorded as accepted
+        mgr.history.flush()
+        rejected = mgr.list_submissions()["items"][0]
+        assert rejected["output"].startswith("BUSY") and rejected["verdict"] == "REJECTED"
+
+        done = mgr.wait_results([running, queued], timeout=5.0)
+        assert all(r["output"] == "TIMEOUT" for r in done.values())
+        assert mgr.retry_after() == 0.0
+        assert mgr.execute_submission("print(3)", "") == "3\n"
+        last = mgr.get_runtime_metrics()["recent"][-1]
+        assert "queue_wait" in last and "exec" in last
+
+        # A cluster that is down answers "No nodes available", not a backoff hint
+        mgr.crash_node(1)
+        assert mgr.retry_after() == 0.0
+        ticket = mgr.submit_async("print(4)", "")
+        assert mgr.wait_results([ticket], timeout=5.0)[ticket]["output"] == "No nodes available"
+    finally:
+        mgr.stop()
+
+
+def test_idle_node_steals_queued_work():
+    mgr = NodeManager({1: 9101, 2: 9102}, default_pool_size=1)
+    try:
+        # Route everything to node 1; node 2 stays idle and must steal
+        mgr.balancer.remove_node(2)
+        spin = "while True:\n    pass"
+        tickets = [mgr.submit_async(spin + f"\n# {i}", "", timeout_seconds=0.4) for i in range(3)]
+        start = time.time()
+        done = mgr.wait_results(tickets, timeout=5.0)
+        assert all(r["output"] == "TIMEOUT" for r in done.values())
+        assert time.time() - start < 1.1
+
+        metrics = mgr.get_runtime_metrics()
+        assert metrics["steals"] >= 1
+        stolen = [r for r in metrics["recent"] if r["stolen_from"] == 1]
+        assert stolen and all(r["node"] == 2 for r in stolen)
+        assert mgr.nodes[1].load == 0 and mgr.nodes[2].load == 0
+        assert not any(metrics["running"].values())
+    finally:
+        mgr.stop()
+
+
+def test_remote_nodes_serve_over_framed_sockets():
+    node = NodeWorker(1, 0, workers=1)
+    node.start()
+    mgr = NodeManager({1: node.port}, default_pool_size=1, remote=True)
+    try:
+        assert mgr.execute_submission("print('hi')", "") == "hi\n"
+        mgr.set_problems({"echo": {"title": "Echo", "starter_code": "def f(x):\n    return x", "tests": "assert f(1) == 1",
+                                   "cases": [{"input": "f(2)", "expected": "2"}]}})
+        # First call ships the harness source, the second reuses the node's copy
+        assert mgr.execute_problem("echo", "def f(x):\n    return x") == "OK"
+        assert mgr.execute_problem("echo", "def f(x):\n    return x\n# again") == "OK"
+        assert len(node._harnesses) == 1
+        assert mgr.judge_problem("echo", "def f(x):\n    return x")["verdict"] == "ACCEPTED"
+        assert mgr.execute_submission("while True:\n    pass", "", timeout_seconds=0.3) == "TIMEOUT"
+        # Connections are pooled rather than opened per call
+        assert len(mgr._pools[1].client._idle) == 1
+    finally:
+        mgr.stop()
+        node.stop()
+
+
+def test_spawned_node_processes_enforce_forwarded_limits():
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    procs = spawn_node_processes({1: port}, default_pool_size=1, output_limit_bytes=64)
+    mgr = NodeManager({1: port}, default_pool_size=1, remote=True, output_limit_bytes=64)
+    try:
+        assert wait_until_listening({1: port})
+        assert mgr.execute_submission("print('x' * 1000)", "") == "OUTPUT_LIMIT_EXCEEDED"
+    finally:
+        mgr.stop()
+        procs[1].terminate()
+        procs[1].wait(timeout=5)
+
+
+def test_failed_nodes_are_detected_and_jobs_requeued():
+    det = PhiAccrualDetector(threshold=8.0, expected_interval=0.1)
+    for i in range(20):
+        det.heartbeat(1, now=i * 0.1)
+    assert det.is_available(1, now=2.0)
+    assert not det.is_available(1, now=3.0)
+    assert det.suspects(now=3.0) == [1]
+
+    # crash_node requeues both the running and the queued job on node 2
+    mgr = NodeManager({1: 9101, 2: 9102}, default_pool_size=1, work_stealing=False)
+    try:
+        mgr.balancer.remove_node(2)
+        spin = "while True:\n    pass"
+        tickets = [mgr.submit_async(spin + f"\n# {i}", "", timeout_seconds=0.3) for i in range(2)]
+        time.sleep(0.1)
+        mgr.balancer.add_node(2, 0, capacity=1)
+        mgr.crash_node(1)
+        done = mgr.wait_results(tickets, timeout=5.0)
+        assert all(r["output"] == "TIMEOUT" for r in done.values())
+        metrics = mgr.get_runtime_metrics()
+        assert metrics["requeued"] == 2 and metrics["failovers"] == 1
+        assert [(r["node"], r["retries"]) for r in metrics["recent"]] == [(2, 1), (2, 1)]
+    finally:
+        mgr.stop()
+
+    # A remote node that goes away mid-job is probed, failed over, and the job retried
+    nodes = [NodeWorker(nid, 0, workers=1) for nid in (1, 2)]
+    for node in nodes:
+        node.start()
+    mgr = NodeManager({n.node_id: n.port for n in nodes}, default_pool_size=1, remote=True, heartbeat_interval=0.05)
+    mgr.start()
+    try:
+        mgr.balancer.remove_node(2)
+        ticket = mgr.submit_async("while True:\n    pass", "", timeout_seconds=0.5)
+        time.sleep(0.1)
+        mgr.balancer.add_node(2, 0, capacity=1)
+        nodes[0].stop()
+        assert mgr.wait_results([ticket], timeout=5.0)[ticket]["output"] == "TIMEOUT"
+        assert mgr.get_status()["nodes"]["1"]["alive"] is False
+        assert mgr.get_runtime_metrics()["recent"][-1]["retries"] == 1
+    finally:
+        mgr.stop()
+        nodes[1].stop()
+
+
+def test_wedged_local_node_is_failed_over():
+    mgr = NodeManager({1: 9101, 2: 9102}, default_pool_size=1, heartbeat_interval=0.05)
+    mgr.start()
+    exe = mgr._executors[1]
+    try:
+        assert mgr._probe(1)
+        # A worker stuck holding the queue lock: the executor still "runs" but can't make progress
+        exe._cond.acquire()
+        try:
+            deadline = time.time() + 5.0
+            while mgr.nodes[1].alive and time.time() < deadline:
+                time.sleep(0.05)
+        finally:
+            exe._cond.release()
+        assert mgr.nodes[1].alive is False
+        assert mgr.nodes[2].alive is True
+        assert mgr.execute_submission("print(1)", "").strip() == "1"
+    finally:
+        mgr.stop()
+
+
+def test_framed_rpc_pipelines_over_one_connection():
+    rmi = RMIServer("127.0.0.1", 0, framed_port=0)
+    rmi.register("sleep_echo", lambda value, delay: time.sleep(delay) or value)
+    rmi.start()
+    client = PipelinedClient("127.0.0.1", rmi.framed_port)
+    try:
+        assert client.call("submit_code", "print(1)", "") == "Processor not ready"
+        # A slow call does not hold up the ones pipelined behind it
+        slow = client.call_async("sleep_echo", "slow", 0.5)
+        fast = [client.call_async("sleep_echo", i, 0) for i in range(5)]
+        assert [f.result(timeout=2) for f in fast] == list(range(5))
+        assert not slow.done()
+        assert slow.result(timeout=2) == "slow"
+        rmi.register("late", lambda: {"ok": True})
+        assert client.call("late") == {"ok": True}
+        try:
+            client.call("missing")
+            assert False, "expected RemoteError"
+        except RemoteError as ex:
+            assert ex.kind == "NoSuchMethod"
+
+        # Malformed requests and unencodable results are answered, not dropped
+        rmi.register("opaque", lambda: object())
+        with pytest.raises(RemoteError, match="TypeError"):
+            client.call("opaque", timeout=2)
+        aio = RMIServer("127.0.0.1", 0, framed_port=0, mode="asyncio")
+        aio.register("opaque", lambda: object())
+        aio.start()
+        try:
+            for server in (rmi, aio):
+                with socket.create_connection(("127.0.0.1", server.framed_port), timeout=2) as raw:
+                    send_frame(raw, ["not", "a", "request"])
+                    assert recv_frame(raw) == error_reply(
+                        None, "BadRequest", "request must be an object with id, method and params"
+                    )
+                    send_frame(raw, {"id": 7, "method": "sleep_echo", "params": "xy"})
+                    assert recv_frame(raw) == error_reply(7, "BadRequest", "params must be a list")
+                    send_frame(raw, {"id": 8, "method": "opaque", "params": []})
+                    assert recv_frame(raw)["error"]["type"] == "TypeError"
+        finally:
+            aio.stop()
+        # A timed-out call does not stay pending
+        with pytest.raises(FutureTimeout):
+            client.call("sleep_echo", "late", 0.3, timeout=0.05)
+        assert client._pending == {}
+    finally:
+        client.close()
+        rmi.stop()
+
+
+def test_asyncio_rmi_mode_parks_no_threads_on_long_polls():
+    mgr = NodeManager({1: 9101}, default_pool_size=1)
+    rmi = RMIServer("127.0.0.1", 0, framed_port=0, mode="asyncio")
+    rmi.bind_async_processor(mgr.submit_async)
+    rmi.bind_awaitable_processor(mgr.aexecute_submission)
+    rmi.register("wait_results", mgr.wait_results)
+    rmi.register_async("wait_results", mgr.await_results)
+    rmi.start()
+    idle = [socket.create_connection(("127.0.0.1", rmi.framed_port)) for _ in range(200)]
+    client = PipelinedClient("127.0.0.1", rmi.framed_port)
+    try:
+        proxy = xmlrpc.client.ServerProxy(f"http://127.0.0.1:{rmi.port}")
+        assert proxy.submit_code("print(1)", "") == "1\n"
+        try:
+            proxy.no_such_method()
+            assert False, "expected Fault"
+        except xmlrpc.client.Fault:
+            pass
+
+        tickets = [mgr.results.create() for _ in range(100)]
+        threads_before = threading.active_count()
+        polls = [client.call_async("wait_results", [t], 10.0) for t in tickets]
+        time.sleep(0.3)
+        assert not any(p.done() for p in polls)
+        assert threading.active_count() - threads_before < 5
+        for t in tickets:
+            mgr.results.complete(t, "OK")
+        for t, p in zip(tickets, polls):
+            assert p.result(timeout=2)[t]["output"] == "OK"
+        assert not mgr.results._listeners
+    finally:
+        client.close()
+        for sock in idle:
+            sock.close()
+        rmi.stop()
+        mgr.stop()
+
+
+def test_multicall_batches_calls_on_every_transport():
+    counter = {"n": 0}
+
+    def bump() -> int:
+        counter["n"] += 1
+        return counter["n"]
+
+    for mode in ("threads", "asyncio"):
+        rmi = RMIServer("127.0.0.1", 0, framed_port=0, mode=mode)
+        rmi.register("bump", bump)
+        rmi.register("read", lambda: counter["n"])
+        rmi.start()
+        client = PipelinedClient("127.0.0.1", rmi.framed_port)
+        try:
+            calls = [{"methodName": "bump", "params": []}, {"methodName": "read", "params": []},
+                     {"methodName": "missing", "params": []}]
+            proxy = xmlrpc.client.ServerProxy(f"http://127.0.0.1:{rmi.port}")
+            replies = proxy.system.multicall(calls)
+            assert replies[0] == [counter["n"]] and replies[1] == replies[0]
+            assert "faultString" in replies[2]
+            # Calls run in order, so the read sees the bump before it
+            framed = client.call("system.multicall", calls)
+            assert framed[0] == framed[1] == [counter["n"]]
+        finally:
+            client.close()
+            rmi.stop()
+
+
+def test_problem_catalog_is_versioned_and_paged():
+    problems = {f"p{i:02d}": {"title": f"P{i}", "prompt": "x" * 100, "tests": "pass"} for i in range(25)}
+    mgr = NodeManager({1: 9101}, default_pool_size=1)
+    try:
+        mgr.set_problems(problems)
+        assert mgr.list_problems() == problems  # legacy call unchanged
+
+        first = mgr.list_problems("", "", 10)
+        version = first["version"]
+        assert first["total"] == 25 and len(first["items"]) == 10
+        assert first["items"][0] == {"key": "p00", "title": "P0", "cases": 0}
+        keys = [item["key"] for item in first["items"]]
+        cursor = first["next_cursor"]
+        while cursor:
+            page = mgr.list_problems("", cursor, 10)
+            keys += [item["key"] for item in page["items"]]
+            cursor = page["next_cursor"]
+        assert keys == sorted(problems)
+
+        assert mgr.list_problems(version) == {"version": version, "not_modified": True}
+        assert mgr.get_problem("p03")["prompt"] == "x" * 100
+        assert mgr.get_problem("missing") == {}
+
+        # Same content -> same ETag; any change -> new one
+        assert ProblemCatalog(dict(problems)).version == version
+        mgr.set_problems({**problems, "p00": {"title": "Changed"}})
+        assert mgr.list_problems(version)["not_modified"] is False
+    finally:
+        mgr.stop()
+
+
+def test_anti_entropy_exchanges_only_differing_keys():
+    a = ReplicatedStore(1)
+    b = ReplicatedStore(2)
+    for i in range(500):
+        a.update_and_replicate(f"k{i}", i, [b])
+    assert a.root_hash() == b.root_hash()
+    assert b.sync_from(a) == 0
+
+    a.update_and_replicate("k7", "new", [])
+    a.apply_update("fresh", "x", 1)
+    b.apply_update("k9", "from-b", 5)
+    assert len(b.diff_buckets(a)) <= 3
+    # Only the keys of the differing buckets are read
+    bucket = _bucket_of("k7")
+    assert set(a.bucket_versions([bucket])) == {k for k in a.dump() if _bucket_of(k) == bucket}
+    assert b.sync_from(a) == 2
+    assert a.sync_from(b) == 1
+    assert a.root_hash() == b.root_hash()
+    assert b.get_local("k7") == "new" and a.get_local("k9") == "from-b"
+
+    # Equal versions with different values converge in both directions
+    a.apply_update("tie", "left", 1)
+    b.apply_update("tie", "right", 1)
+    a.sync_from(b)
+    b.sync_from(a)
+    assert a.get_local("tie") == b.get_local("tie")
+
+    mgr = NodeManager({1: 9101, 2: 9102, 3: 9103}, default_pool_size=1)
+    try:
+        leader = mgr.ensure_leader()
+        down = next(n for n in mgr.nodes if n != leader)
+        mgr.crash_node(down)
+        mgr.replicate_problem("p", "while down")
+        assert mgr.stores[down].get_local("p") is None
+        mgr.recover_node(down)
+        assert mgr.stores[down].get_local("p") == "while down"
+        assert mgr.get_runtime_metrics()["anti_entropy_repairs"] == 1
+    finally:
+        mgr.stop()
+
+
+def test_replication_log_batches_with_quorums_and_catches_up():
+    leader, b, c = ReplicatedStore(1), ReplicatedStore(2), ReplicatedStore(3)
+    try:
+        items = {f"k{i}": i for i in range(1000)}
+        assert leader.update_many(items, [b, c], quorum="all") == 3
+        assert b.dump() == c.dump() == leader.dump()
+        assert leader._replicator.lag() == {2: 0, 3: 0}
+        assert leader.update_and_replicate("k1", "one", [b, c], quorum="one") >= 1
+        assert leader.update_and_replicate("k2", "maj", [b, c], quorum="majority") >= 2
+        with pytest.raises(ValueError):
+            leader.update_many({"x": 1}, [b], quorum="some")
+
+        # c misses writes while left out, then catches up from the log
+        leader.update_many({"k3": "while c is down", "new": 1}, [b])
+        assert c.get_local("new") is None
+        leader.update_many({"k4": "back"}, [b, c])
+        assert c.dump() == leader.dump()
+
+        # Trimmed log: a far-behind peer is repaired by Merkle anti-entropy
+        leader._replicator.log_capacity = 10
+        leader.update_many({f"bulk{i}": i for i in range(50)}, [b])
+        leader.update_many({"last": 1}, [b, c])
+        assert c.root_hash() == leader.root_hash()
+    finally:
+        leader.close()
+
+    class _Gated(ReplicatedStore):
+        # Holds its first batch until the gate opens
+        def __init__(self, node_id: int) -> None:
+            super().__init__(node_id)
+            self.gate = threading.Event()
+
+        def apply_batch(self, entries):
+            self.gate.wait(5.0)
+            super().apply_batch(entries)
+
+    # A newer write naming fewer peers must not stop shipping an older one
+    leader, b, slow = ReplicatedStore(1), ReplicatedStore(2), _Gated(3)
+    try:
+        leader.update_many({f"k{i}": i for i in range(300)}, [b, slow], quorum="one")
+        assert leader.update_many({"late": 1}, [b], quorum="all") == 2
+        slow.gate.set()
+        deadline = time.time() + 5.0
+        while slow.get_local("k299") is None and time.time() < deadline:
+            time.sleep(0.01)
+        assert slow.get_local("k299") == 299 and slow.get_local("late") is None
+    finally:
+        leader.close()
+
+
+def test_submission_history_is_group_committed_and_paged(tmp_path):
+    store = SubmissionStore(str(tmp_path / "history.db"), batch_size=100)
+    try:
+        for i in range(1000):
+            store.record("ACCEPTED" if i % 2 else "RUNTIME_ERROR", "out", f"u{i % 4}", f"p{i % 5}")
+        store.flush()
+        assert store.stats()["written"] == 1000
+        assert store.stats()["batches"] <= 1000 // 2
+
+        seen, cursor = [], ""
+        while True:
+            page = store.list_submissions(user="u1", cursor=cursor, limit=60)
+            seen += [row["id"] for row in page["items"]]
+            cursor = page["next_cursor"]
+            if not cursor:
+                break
+        assert len(seen) == 250 and seen == sorted(seen, reverse=True)
+        both = store.list_submissions(user="u1", problem="p1", limit=200)["items"]
+        assert both and all(r["user"] == "u1" and r["problem"] == "p1" for r in both)
+    finally:
+        store.close()
+    reopened = SubmissionStore(str(tmp_path / "history.db"))
+    assert len(reopened.list_submissions(limit=10)["items"]) == 10
+    reopened.close()
+
+    mgr = NodeManager({1: 9101}, default_pool_size=1)
+    try:
+        mgr.set_problems({"sq": {"title": "Square", "tests": "assert sq(3) == 9"}})
+        ticket = mgr.submit_problem_async("sq", "def sq(x):\n    return x * x", 2.0, "alice")
+        mgr.wait_results([ticket], 5.0)
+        mgr.history.flush()
+        (row,) = mgr.list_submissions(user="alice")["items"]
+        assert (row["ticket"], row["problem"], row["verdict"]) == (ticket, "sq", "ACCEPTED")
+        # result() can return just before the history callback has queued the row
+        mgr.execute_submission("print(1)", "")
+        deadline = time.time() + 2.0
+        while len(mgr.list_submissions()["items"]) < 2 and time.time() < deadline:
+            time.sleep(0.01)
+        assert len(mgr.list_submissions()["items"]) == 2
+    finally:
+        mgr.stop()
+
+
+def test_metrics_histograms_summary_and_scrape_endpoint():
+    hist = Histogram()
+    for ms in range(1, 1001):
+        hist.observe(ms / 1000)
+    p = hist.percentiles()
+    assert abs(p[0.5] - 0.5) / 0.5 < 0.02
+    assert abs(p[0.99] - 0.99) / 0.99 < 0.02
+    assert hist.count == 1000 and hist.max == 1.0
+
+    mgr = NodeManager({1: 9101, 2: 9102}, default_pool_size=1)
+    try:
+        mgr.submit_many([{"code": f"print({i})", "tests": ""} for i in range(6)])
+        mgr.execute_submission("raise ValueError()", "")
+        summary = mgr.get_metrics_summary()
+        nodes = summary["nodes"]
+        assert sum(n["jobs"] for n in nodes.values()) == 7
+        assert sum(n["errors"] for n in nodes.values()) == 1
+        busiest = max(nodes.values(), key=lambda n: n["jobs"])
+        assert busiest["exec"]["count"] == busiest["jobs"] and busiest["exec"]["p99"] > 0
+
+        for mode in ("threads", "asyncio"):
+            rmi = RMIServer("127.0.0.1", 0, mode=mode)
+            rmi.bind_metrics(mgr.metrics)
+            rmi.register("get_metrics_summary", mgr.get_metrics_summary)
+            rmi.start()
+            try:
+                proxy = xmlrpc.client.ServerProxy(f"http://127.0.0.1:{rmi.port}", allow_none=True)
+                assert set(proxy.get_metrics_summary()["nodes"]) == {"1", "2"}
+                with socket.create_connection(("127.0.0.1", rmi.port), timeout=5) as sock:
+                    sock.sendall(b"GET /metrics HTTP/1.0\r\n\r\n")
+                    text = b""
+                    while chunk := sock.recv(65536):
+                        text += chunk
+                head, _, body = text.decode().partition("\r\n\r\n")
+                assert " 200 " in head.splitlines()[0]
+                assert "# TYPE judge_node_exec_seconds summary" in body
+                assert 'judge_rpc_seconds_count{method="get_metrics_summary"}' in body
+                assert 'judge_node_alive{node="1"} 1' in body
+            finally:
+                rmi.stop()
+    finally:
+        mgr.stop()
+
+
+def test_runtime_event_ring_serves_only_new_events():
+    ring = EventRing(capacity=8)
+    for i in range(5):
+        ring.append({"i": i})
+    page = ring.since(0, 3)
+    assert [e["seq"] for e in page["events"]] == [1, 2, 3] and page["next_seq"] == 3
+    assert [e["i"] for e in ring.since(page["next_seq"])["events"]] == [3, 4]
+    assert ring.since(5)["events"] == []
+    for i in range(10):
+        ring.append({"i": 5 + i})
+    lapped = ring.since(5)
+    assert lapped["missed"] == 2 and lapped["events"][0]["seq"] == 8
+    assert ring.since(99)["events"][0]["seq"] == 8  # stale cursor starts over
+
+    started = time.time()
+    assert ring.wait(15, timeout=0.2)["events"] == []
+    assert time.time() - started >= 0.15
+    threading.Timer(0.1, ring.append, args=({"i": "late"},)).start()
+    assert ring.wait(15, timeout=5.0)["events"][0]["i"] == "late"
+
+    mgr = NodeManager({1: 9101}, default_pool_size=1)
+    try:
+        mgr.execute_submission("print(1)", "")
+        first = mgr.get_runtime_events(0)
+        assert [e["status"] for e in first["events"]] == ["1\n"]
+
+        async def _long_poll() -> Dict[str, Any]:
+            threading.Timer(0.1, mgr.execute_submission, args=("print(2)", "")).start()
+            return await mgr.await_runtime_events(first["next_seq"], 10, 5.0)
+
+        later = asyncio.run(_long_poll())
+        assert [e["status"] for e in later["events"]] == ["2\n"]
+        assert mgr.get_runtime_metrics(False)["recent"] == []
+    finally:
+        mgr.stop()
+
+
+def test_lamport_clocks_are_atomic_and_traces_export_causally():
+    clk = LamportClock(1, members=[0, 1, 2])
+    threads = [threading.Thread(target=lambda: [clk.tick() for _ in range(2000)]) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert clk.now() == 8000 and clk.vector() == {0: 0, 1: 8000, 2: 0}
+    counter, vector = clk.event("recv", (9000, {0: 3, 1: 1, 2: 7}))
+    assert counter == 9001 and vector == {0: 3, 1: 8001, 2: 7}
+
+    mgr = NodeManager({1: 9101, 2: 9102}, default_pool_size=1, work_stealing=False, vector_clocks=True)
+    try:
+        mgr.start()
+        time.sleep(0.6)
+        # No background ticking: clocks only move on submissions
+        assert mgr.clock.now() == 0 and all(c.now() == 0 for c in mgr.clocks.values())
+        assert mgr.execute_submission("print('traced')", "") == "traced\n"
+        event = mgr.get_runtime_events(0)["events"][0]
+        records = mgr.trace.records(event["trace"])
+        assert [r[2] for r in sorted(records, key=lambda r: r[6])] == ["dispatch", "queued", "run", "verdict"]
+        dispatch, verdict = records[0], records[-1]
+        assert verdict[6] > dispatch[6] and verdict[7][event["node"]] == 2  # node received, then replied
+
+        exported = mgr.export_trace(event["trace"])
+        json.dumps(exported)
+        xmlrpc.client.dumps((exported,), allow_none=False)
+        phases = [e["ph"] for e in exported["traceEvents"]]
+        assert phases.count("X") == 4 and phases.count("s") == 1 and phases.count("f") == 1
+        run = next(e for e in exported["traceEvents"] if e.get("name") == "run")
+        assert run["pid"] == event["node"] and run["dur"] > 0 and "vector" in run["args"]
+    finally:
+        mgr.stop()
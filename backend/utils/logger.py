@@ -1,5 +1,18 @@
-import time
+import atexit
+import json
+import queue
+import sys
 import threading
+import time
+from typing import Any, Dict, List, Optional, TextIO, Tuple
+
+LEVELS: Dict[str, int] = {"DEBUG": 10, "INFO": 20, "WARNING": 30, "ERROR": 40}
+
+# Chatty components are sampled unless configured otherwise (events per second)
+DEFAULT_RATE_LIMITS: Dict[str, float] = {"Clock": 20.0, "LoadBalancer": 20.0}
+
+# (created, thread name, component, level, message)
+Record = Tuple[float, str, str, str, str]
 
 
 def timestamp() -> str:
@@ -7,16 +20,178 @@ def timestamp() -> str:
     return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime())
 
 
-def log(component: str, message: str) -> None:
-    """
-    Central logging utility for the Distributed Judge backend.
+class _RateLimiter:
+    """Token bucket: `rate` events per second with a burst of the same size."""
 
-    - component: logical subsystem emitting the log (e.g., RMI, Election)
-    - message: human readable detail
+    def __init__(self, rate: float) -> None:
+        self.rate = rate
+        self.tokens = rate
+        self.updated = time.monotonic()
+        self.suppressed = 0
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1.0:
+                self.tokens -= 1.0
+                return True
+            self.suppressed += 1
+            return False
+
+
+class AsyncLogger:
+    """
+    Queue-backed logger. Callers only filter and enqueue; a background thread
+    formats records and writes them in batches to the text stream and, when
+    configured, to a JSON-lines file. When the queue is full records are
+    dropped and counted rather than blocking the caller.
     """
-    thread_name = threading.current_thread().name
-    print(f"[{timestamp()}] [{thread_name}] [{component}] {message}")
 
+    def __init__(self, level: str = "INFO", queue_size: int = 10000, stream: Optional[TextIO] = None) -> None:
+        self.level = LEVELS[level]
+        self.component_levels: Dict[str, int] = {}
+        self._limits: Dict[str, _RateLimiter] = {c: _RateLimiter(r) for c, r in DEFAULT_RATE_LIMITS.items()}
+        self._queue: "queue.Queue[Record]" = queue.Queue(maxsize=queue_size)
+        self._stream = stream
+        self._json_sink: Optional[TextIO] = None
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._last_second = -1
+        self._last_stamp = ""
+        self.dropped = 0
+
+    def configure(
+        self,
+        level: Optional[str] = None,
+        components: Optional[Dict[str, str]] = None,
+        rate_limits: Optional[Dict[str, float]] = None,
+        json_path: Optional[str] = None,
+        stream: Optional[TextIO] = None,
+    ) -> None:
+        """
+        - level: global minimum level (DEBUG/INFO/WARNING/ERROR)
+        - components: per-component minimum level, e.g. {"Clock": "WARNING"}
+        - rate_limits: per-component events/second; 0 disables the limit
+        - json_path: append every record as one JSON object per line
+        """
+        if level is not None:
+            self.level = LEVELS[level.upper()]
+        for component, comp_level in (components or {}).items():
+            self.component_levels[component] = LEVELS[comp_level.upper()]
+        for component, rate in (rate_limits or {}).items():
+            if rate and rate > 0:
+                self._limits[component] = _RateLimiter(rate)
+            else:
+                self._limits.pop(component, None)
+        if json_path is not None:
+            self.flush()
+            if self._json_sink is not None:
+                self._json_sink.close()
+            self._json_sink = open(json_path, "a", encoding="utf-8") if json_path else None
+        if stream is not None:
+            self._stream = stream
+
+    def enabled(self, component: str, level: str = "INFO") -> bool:
+        return LEVELS.get(level, 20) >= self.component_levels.get(component, self.level)
+
+    def log(self, component: str, message: str, level: str = "INFO") -> None:
+        if not self.enabled(component, level):
+            return
+        limiter = self._limits.get(component)
+        if limiter is not None and not limiter.allow():
+            return
+        record: Record = (time.time(), threading.current_thread().name, component, level, message)
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+        if self._thread is None:
+            self._start()
+
+    def _start(self) -> None:
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._drain, name="Logger", daemon=True)
+                self._thread.start()
 
+    def _stamp(self, created: float) -> str:
+        # strftime once per second instead of once per record
+        second = int(created)
+        if second != self._last_second:
+            self._last_second = second
+            self._last_stamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(created))
+        return self._last_stamp
 
+    def _write(self, batch: List[Record]) -> None:
+        stream = self._stream or sys.stdout
+        lines = []
+        for created, thread_name, component, level, message in batch:
+            prefix = "" if level == "INFO" else f"[{level}] "
+            lines.append(f"[{self._stamp(created)}] [{thread_name}] {prefix}[{component}] {message}\n")
+        try:
+            stream.write("".join(lines))
+            stream.flush()
+        except (OSError, ValueError):
+            pass
+        if self._json_sink is not None:
+            self._json_sink.write("".join(
+                json.dumps({"ts": created, "thread": thread_name, "component": component, "level": level, "msg": message}) + "\n"
+                for created, thread_name, component, level, message in batch
+            ))
+            self._json_sink.flush()
 
+    def _drain(self) -> None:
+        while True:
+            batch: List[Record] = [self._queue.get()]
+            while len(batch) < 512:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._write(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def flush(self) -> None:
+        """Block until every queued record has been written."""
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.join()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queued": self._queue.qsize(),
+            "dropped": self.dropped,
+            "suppressed": {c: lim.suppressed for c, lim in self._limits.items()},
+        }
+
+
+_logger = AsyncLogger()
+atexit.register(_logger.flush)
+
+
+def configure(**kwargs: Any) -> None:
+    """Configure the process-wide logger; see AsyncLogger.configure."""
+    _logger.configure(**kwargs)
+
+
+def flush() -> None:
+    _logger.flush()
+
+
+def log(component: str, message: str, level: str = "INFO") -> None:
+    """
+    Central logging utility for the Distributed Judge backend.
+
+    - component: logical subsystem emitting the log (e.g., RMI, Election)
+    - message: human readable detail
+    - level: DEBUG, INFO, WARNING or ERROR
+
+    Records are filtered and rate limited on the calling thread and written
+    asynchronously by a background thread.
+    """
+    _logger.log(component, message, level)
@@ -0,0 +1,117 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Dict, Optional, Tuple
+
+from utils.logger import log
+
+
+def normalize_code(code: str) -> str:
+    # Only edits Python itself ignores: CRLF line endings and trailing blank
+    # lines. Trailing spaces can matter (triple-quoted strings, backslashes).
+    lines = code.replace("\r\n", "\n").split("\n")
+    while lines and not lines[-1]:
+        lines.pop()
+    return "\n".join(lines)
+
+
+class VerdictCache:
+    """
+    Content-addressed cache of submission verdicts with LRU eviction bounded
+    by entry count and total size. Identical submissions that arrive while
+    one is still executing share that execution's future.
+    """
+
+    def __init__(self, max_entries: int = 4096, max_bytes: int = 16 * 1024 * 1024) -> None:
+        self.max_entries = max(1, int(max_entries))
+        self.max_bytes = max(1, int(max_bytes))
+        self._entries: "OrderedDict[str, Tuple[str, Optional[str]]]" = OrderedDict()
+        self._inflight: Dict[str, "Future[str]"] = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(code: str, tests: str, problem_version: str, limits: str = "") -> str:
+        # `limits` (time limit, output cap) keeps runs under different limits apart
+        digest = hashlib.sha256()
+        for part in (normalize_code(code), tests, problem_version, limits):
+            digest.update(part.encode("utf-8", "replace"))
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def claim(self, key: str) -> Tuple["Future[str]", bool]:
+        """
+        Return (future, owner). A cached or in-flight verdict yields a shared
+        future with owner=False; otherwise the caller owns a new future and
+        must execute the submission and call `resolve`.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                done: "Future[str]" = Future()
+                done.set_result(entry[0])
+                return done, False
+            inflight = self._inflight.get(key)
+            if inflight is not None:
+                self.coalesced += 1
+                return inflight, False
+            self.misses += 1
+            future: "Future[str]" = Future()
+            self._inflight[key] = future
+            return future, True
+
+    def resolve(self, key: str, verdict: str, tag: Optional[str] = None, cacheable: bool = True) -> None:
+        with self._lock:
+            future = self._inflight.pop(key, None)
+            if cacheable:
+                self._store(key, verdict, tag)
+        if future is not None:
+            future.set_result(verdict)
+
+    def _store(self, key: str, verdict: str, tag: Optional[str]) -> None:
+        size = len(key) + len(verdict)
+        if size > self.max_bytes:
+            return
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= len(key) + len(old[0])
+        self._entries[key] = (verdict, tag)
+        self._bytes += size
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            old_key, (old_verdict, _) = self._entries.popitem(last=False)
+            self._bytes -= len(old_key) + len(old_verdict)
+            self.evictions += 1
+
+    def invalidate(self, tag: Optional[str] = None) -> int:
+        """Drop entries for one problem, or everything when tag is None."""
+        with self._lock:
+            if tag is None:
+                dropped = len(self._entries)
+                self._entries.clear()
+                self._bytes = 0
+            else:
+                keys = [k for k, (_, t) in self._entries.items() if t == tag]
+                for k in keys:
+                    verdict, _ = self._entries.pop(k)
+                    self._bytes -= len(k) + len(verdict)
+                dropped = len(keys)
+        log("Cache", f"invalidated {dropped} verdicts tag={tag or '*'}")
+        return dropped
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "evictions": self.evictions,
+            }
@@ -0,0 +1,342 @@
+import json
+import socket
+import socketserver
+import struct
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from utils.logger import log
+
+# Every frame is a 4-byte big-endian length followed by a UTF-8 JSON body
+_HEADER = struct.Struct("!I")
+MAX_FRAME_BYTES = 64 * 1024 * 1024
+
+
+class RemoteError(Exception):
+    """An exception raised by the remote function, re-raised on the caller."""
+
+    def __init__(self, kind: str, message: str) -> None:
+        super().__init__(f"{kind}: {message}")
+        self.kind = kind
+        self.message = message
+
+
+def encode_frame(obj: Any) -> bytes:
+    body = json.dumps(obj, separators=(",", ":")).encode("utf-8")
+    return _HEADER.pack(len(body)) + body
+
+
+def send_frame(sock: socket.socket, obj: Any) -> None:
+    sock.sendall(encode_frame(obj))
+
+
+def _recv_exact(sock: socket.socket, size: int) -> bytes:
+    buf = bytearray()
+    while len(buf) < size:
+        chunk = sock.recv(size - len(buf))
+        if not chunk:
+            raise ConnectionError("connection closed by peer")
+        buf += chunk
+    return bytes(buf)
+
+
+def recv_frame(sock: socket.socket) -> Any:
+    (size,) = _HEADER.unpack(_recv_exact(sock, _HEADER.size))
+    if size > MAX_FRAME_BYTES:
+        raise ConnectionError(f"frame of {size} bytes exceeds limit")
+    return json.loads(_recv_exact(sock, size).decode("utf-8"))
+
+
+def error_reply(req_id: Any, kind: str, message: str) -> Dict[str, Any]:
+    return {"id": req_id, "error": {"type": kind, "message": message}}
+
+
+def dispatch_request(functions: Dict[str, Callable[..., Any]], request: Dict[str, Any]) -> Dict[str, Any]:
+    if not isinstance(request, dict):
+        return error_reply(None, "BadRequest", "request must be an object with id, method and params")
+    req_id = request.get("id")
+    params = request.get("params", [])
+    if not isinstance(params, list):
+        return error_reply(req_id, "BadRequest", "params must be a list")
+    fn = functions.get(str(request.get("method")))
+    if fn is None:
+        return error_reply(req_id, "NoSuchMethod", str(request.get("method")))
+    try:
+        return {"id": req_id, "result": fn(*params)}
+    except Exception as ex:  # noqa: BLE001
+        return error_reply(req_id, type(ex).__name__, str(ex))
+
+
+class _FrameHandler(socketserver.BaseRequestHandler):
+    server: "_ThreadingFrameServer"
+
+    def handle(self) -> None:
+        # Connections are persistent: serve frames until the client hangs up
+        sock: socket.socket = self.request
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        send_lock = threading.Lock()
+        pool = self.server.executor
+
+        def _reply(request: Dict[str, Any]) -> None:
+            # Every request gets an answer, or a pipelined caller waits forever
+            try:
+                frame = encode_frame(dispatch_request(self.server.functions, request))
+            except Exception as ex:  # noqa: BLE001  (e.g. a result that is not JSON)
+                req_id = request.get("id") if isinstance(request, dict) else None
+                frame = encode_frame(error_reply(req_id, type(ex).__name__, str(ex)))
+            try:
+                with send_lock:
+                    sock.sendall(frame)
+            except OSError:
+                pass
+
+        with self.server.conn_lock:
+            if self.server.closed:
+                # Accepted just before stop(): don't outlive the server
+                return
+            self.server.connections.add(sock)
+        try:
+            while True:
+                try:
+                    request = recv_frame(sock)
+                except (OSError, ValueError):
+                    return
+                if self.server.closed:
+                    # Read from the buffer after stop(): the server is gone
+                    return
+                if pool is None:
+                    _reply(request)
+                else:
+                    # Pipelined: keep reading while earlier requests run;
+                    # replies go out as they finish, matched by id
+                    pool.submit(_reply, request)
+        finally:
+            with self.server.conn_lock:
+                self.server.connections.discard(sock)
+
+
+class _ThreadingFrameServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+    functions: Dict[str, Callable[..., Any]]
+    connections: Set[socket.socket]
+    conn_lock: threading.Lock
+    closed: bool
+    executor: Optional[ThreadPoolExecutor]
+
+
+class FrameServer:
+    """
+    Threaded TCP server for length-prefixed JSON requests of the form
+    {"id", "method", "params"}; replies carry the same id with either a
+    "result" or an "error" {"type", "message"}.
+
+    With `pipeline_workers` > 0 the requests of one connection run
+    concurrently on a shared thread pool and may be answered out of order;
+    otherwise each connection is served strictly one request at a time.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        functions: Optional[Dict[str, Callable[..., Any]]] = None,
+        pipeline_workers: int = 0,
+    ) -> None:
+        self.functions: Dict[str, Callable[..., Any]] = dict(functions or {})
+        self._server = _ThreadingFrameServer((host, port), _FrameHandler)
+        self._server.functions = self.functions
+        self._server.connections = set()
+        self._server.conn_lock = threading.Lock()
+        self._server.closed = False
+        self._server.executor = (
+            ThreadPoolExecutor(max_workers=pipeline_workers, thread_name_prefix=f"Wire:{port}")
+            if pipeline_workers > 0 else None
+        )
+        self.host, self.port = self._server.server_address[:2]
+        self._thread: Optional[threading.Thread] = None
+        self._serving = False
+
+    def register(self, name: str, fn: Callable[..., Any]) -> None:
+        self.functions[name] = fn
+
+    def serve_forever(self) -> None:
+        log("Wire", f"listening on {self.host}:{self.port}", "DEBUG")
+        self._serving = True
+        self._server.serve_forever()
+
+    def start(self) -> None:
+        self._serving = True
+        self._thread = threading.Thread(target=self.serve_forever, name=f"Wire:{self.port}", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        # Drop persistent connections first, so clients see the server go away
+        # now rather than after the accept loop's next poll
+        with self._server.conn_lock:
+            self._server.closed = True
+            connections = list(self._server.connections)
+        for sock in connections:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        if self._serving:
+            self._server.shutdown()
+        self._server.server_close()
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout=1.0)
+        if self._server.executor is not None:
+            self._server.executor.shutdown(wait=False)
+
+
+class FrameClient:
+    """
+    Client for a FrameServer that reuses connections: each call borrows an
+    idle socket (or opens one), and returns it to the pool afterwards. A
+    socket that errors is discarded.
+    """
+
+    def __init__(self, host: str, port: int, max_idle: int = 4, connect_timeout: float = 2.0) -> None:
+        self.host = host
+        self.port = port
+        self.max_idle = max_idle
+        self.connect_timeout = connect_timeout
+        self._idle: List[socket.socket] = []
+        self._lock = threading.Lock()
+        self._seq = 0
+        self._closed = False
+
+    def _connect(self) -> socket.socket:
+        sock = socket.create_connection((self.host, self.port), timeout=self.connect_timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return sock
+
+    def _borrow(self) -> socket.socket:
+        with self._lock:
+            if self._closed:
+                raise ConnectionError("client closed")
+            if self._idle:
+                return self._idle.pop()
+        return self._connect()
+
+    def _give_back(self, sock: socket.socket) -> None:
+        with self._lock:
+            if not self._closed and len(self._idle) < self.max_idle:
+                self._idle.append(sock)
+                return
+        sock.close()
+
+    def call(self, method: str, *params: Any, timeout: Optional[float] = None) -> Any:
+        with self._lock:
+            self._seq += 1
+            req_id = self._seq
+        sock = self._borrow()
+        try:
+            sock.settimeout(timeout)
+            send_frame(sock, {"id": req_id, "method": method, "params": list(params)})
+            reply = recv_frame(sock)
+        except BaseException:
+            sock.close()
+            raise
+        self._give_back(sock)
+        error = reply.get("error")
+        if error:
+            raise RemoteError(str(error.get("type")), str(error.get("message")))
+        return reply.get("result")
+
+    def close(self) -> None:
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for sock in idle:
+            sock.close()
+
+
+class PipelinedClient:
+    """
+    Client sharing one persistent connection between all callers. Each
+    request carries an id and a reader thread completes the matching future,
+    so many calls can be in flight at once (pipelining). A broken connection
+    fails the outstanding calls and is reopened on the next call.
+    """
+
+    def __init__(self, host: str, port: int, connect_timeout: float = 2.0) -> None:
+        self.host = host
+        self.port = port
+        self.connect_timeout = connect_timeout
+        self._sock: Optional[socket.socket] = None
+        self._pending: Dict[int, "Future[Any]"] = {}
+        self._lock = threading.Lock()
+        self._send_lock = threading.Lock()
+        self._seq = 0
+
+    def _connection(self) -> socket.socket:
+        # Caller holds self._lock
+        if self._sock is None:
+            sock = socket.create_connection((self.host, self.port), timeout=self.connect_timeout)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            sock.settimeout(None)
+            self._sock = sock
+            threading.Thread(target=self._reader, args=(sock,), name=f"Wire:client:{self.port}", daemon=True).start()
+        return self._sock
+
+    def _reader(self, sock: socket.socket) -> None:
+        try:
+            while True:
+                reply = recv_frame(sock)
+                with self._lock:
+                    future = self._pending.pop(reply.get("id"), None)
+                if future is None:
+                    continue
+                error = reply.get("error")
+                if error:
+                    future.set_exception(RemoteError(str(error.get("type")), str(error.get("message"))))
+                else:
+                    future.set_result(reply.get("result"))
+        except (OSError, ValueError) as ex:
+            self._drop(sock, ex)
+
+    def _drop(self, sock: socket.socket, ex: BaseException) -> None:
+        with self._lock:
+            if self._sock is sock:
+                self._sock = None
+            pending, self._pending = self._pending, {}
+        sock.close()
+        for future in pending.values():
+            future.set_exception(ConnectionError(f"connection lost: {ex}"))
+
+    def _send(self, method: str, params: Tuple[Any, ...]) -> Tuple[int, "Future[Any]"]:
+        future: "Future[Any]" = Future()
+        with self._lock:
+            sock = self._connection()
+            self._seq += 1
+            req_id = self._seq
+            self._pending[req_id] = future
+        try:
+            with self._send_lock:
+                send_frame(sock, {"id": req_id, "method": method, "params": list(params)})
+        except OSError as ex:
+            self._drop(sock, ex)
+        return req_id, future
+
+    def call_async(self, method: str, *params: Any) -> "Future[Any]":
+        return self._send(method, params)[1]
+
+    def call(self, method: str, *params: Any, timeout: Optional[float] = None) -> Any:
+        req_id, future = self._send(method, params)
+        try:
+            return future.result(timeout)
+        except FutureTimeout:
+            # A late reply is dropped by the reader instead of the future lingering
+            with self._lock:
+                self._pending.pop(req_id, None)
+            raise
+
+    def close(self) -> None:
+        with self._lock:
+            sock, self._sock = self._sock, None
+        if sock is not None:
+            sock.close()
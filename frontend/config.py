@@ -1,5 +1,24 @@
+import os
+
 BACKEND_HOST = "127.0.0.1"
 BACKEND_PORT = 9000
+# Binary framed transport (persistent, pipelined); XML-RPC stays on BACKEND_PORT
+BACKEND_FRAMED_PORT = 9001
+# "xmlrpc" or "framed"
+BACKEND_TRANSPORT = os.environ.get("JUDGE_TRANSPORT", "xmlrpc")
+
+# Problems per list_problems page; details are fetched per problem on demand
+CATALOG_PAGE_SIZE = 100
+
+# Rows per page of the submission history on the Results page
+HISTORY_PAGE_SIZE = 20
+
+# Completed tasks kept per admin session; the live feed long-polls this many seconds per request
+EVENT_FEED_SIZE = 200
+EVENT_POLL_SECONDS = 5.0
+
+# Upper bound for the admin batch demo; the backend enforces its own batch_limit
+BATCH_MAX = 500
 
 # Example problems. Optionally align with backend replicated keys.
 PROBLEMS = {
@@ -1,13 +1,76 @@
+import json
 import time
+from collections import deque
 
 import streamlit as st
 
-from utils.api_client import APIClient
+import config
+from utils.api_client import get_client
 
 
 def _init() -> None:
     if "last_admin_msg" not in st.session_state:
         st.session_state.last_admin_msg = ""
+    if "event_seq" not in st.session_state:
+        # Last event sequence number seen; each refresh only fetches what came after it
+        st.session_state.event_seq = 0
+        st.session_state.events = deque(maxlen=config.EVENT_FEED_SIZE)
+        st.session_state.events_missed = 0
+
+
+def _absorb(page: dict | None) -> None:
+    if not page:
+        return
+    st.session_state.events.extend(page.get("events", []))
+    st.session_state.events_missed += page.get("missed", 0)
+    st.session_state.event_seq = page.get("next_seq", st.session_state.event_seq)
+
+
+def _render_events() -> None:
+    events = list(st.session_state.events)
+    if not events:
+        st.caption("No recent results.")
+        return
+    if st.session_state.events_missed:
+        st.caption(f"{st.session_state.events_missed} events were missed between refreshes")
+    st.table([
+        {
+            "seq": e.get("seq"),
+            "node": e.get("node"),
+            "task": e.get("task"),
+            "trace": e.get("trace"),
+            "queue wait(s)": e.get("queue_wait"),
+            "exec(s)": e.get("exec"),
+            "stolen from": e.get("stolen_from"),
+            "retries": e.get("retries", 0),
+            "duration(s)": e.get("duration"),
+            "thread": e.get("thread"),
+            "status": e.get("status"),
+        }
+        for e in reversed(events)
+    ])
+
+
+def _render_trace_export(client) -> None:
+    with st.expander("Causal trace", expanded=False):
+        events = list(st.session_state.events)
+        # Default to the slowest submission in the feed
+        slowest = max(events, key=lambda e: e.get("duration") or 0, default={})
+        trace_id = st.number_input(
+            "Trace id (0 = whole buffer)", min_value=0, value=int(slowest.get("trace") or 0), step=1
+        )
+        if st.button("Fetch trace"):
+            trace, msg = client.export_trace(int(trace_id))
+            if trace is None:
+                st.error(f"Failed to fetch trace: {msg}")
+            else:
+                st.caption(f"{len(trace.get('traceEvents', []))} trace events; open in chrome://tracing or ui.perfetto.dev")
+                st.download_button(
+                    "Download Chrome trace",
+                    json.dumps(trace),
+                    file_name=f"judge-trace-{int(trace_id)}.json",
+                    mime="application/json",
+                )
 
 
 def _render_status(status: dict | None, msg: str) -> None:
@@ -18,7 +81,44 @@ def _render_status(status: dict | None, msg: str) -> None:
     st.write(f"Leader: {status.get('leader', '-')}")
     nodes = status.get("nodes", {})
     for nid, info in sorted(nodes.items()):
-        st.write(f"Node {nid}: alive={info['alive']} load={info['load']} clock={info['clock']} port={info['port']}")
+        st.write(
+            f"Node {nid}: alive={info['alive']} load={info['load']} queued={info.get('queued', 0)} "
+            f"running={info.get('running', 0)} phi={info.get('phi', 0)} clock={info['clock']} port={info['port']}"
+        )
+
+
+def _ms(stats: dict, key: str) -> str:
+    return f"{stats.get(key, 0) * 1000:.1f}" if stats else "-"
+
+
+def _render_latency(summary: dict | None) -> None:
+    if summary is None:
+        # Backends without get_metrics_summary
+        return
+    st.subheader("Latency percentiles (ms)")
+    rows = []
+    for nid, node in sorted(summary.get("nodes", {}).items()):
+        wait, run = node.get("queue_wait", {}), node.get("exec", {})
+        rows.append({
+            "node": nid,
+            "jobs": node.get("jobs", 0),
+            "jobs/s": node.get("per_sec", 0),
+            "timeouts": node.get("timeouts", 0),
+            "errors": node.get("errors", 0),
+            "wait p50": _ms(wait, "p50"),
+            "wait p99": _ms(wait, "p99"),
+            "exec p50": _ms(run, "p50"),
+            "exec p95": _ms(run, "p95"),
+            "exec p99": _ms(run, "p99"),
+        })
+    if rows:
+        st.table(rows)
+    e2e = summary.get("submission", {})
+    if e2e:
+        st.caption(
+            f"Submission to verdict: p50={_ms(e2e, 'p50')} p95={_ms(e2e, 'p95')} p99={_ms(e2e, 'p99')} "
+            f"over {e2e.get('count', 0)} submissions; rejected busy: {summary.get('rejected', 0)}"
+        )
 
 
 def _render_metrics(data: dict | None, msg: str) -> None:
@@ -26,7 +126,18 @@ def _render_metrics(data: dict | None, msg: str) -> None:
         st.error(msg)
         return
     running = data.get("running", {})
-    recent = data.get("recent", [])
+    if "steals" in data:
+        st.caption(f"Jobs stolen by idle nodes: {data.get('steals', 0)}")
+    if "failovers" in data:
+        st.caption(f"Node failovers: {data.get('failovers', 0)}, jobs requeued: {data.get('requeued', 0)}")
+    if "anti_entropy_repairs" in data:
+        st.caption(f"Replica entries repaired by anti-entropy: {data['anti_entropy_repairs']}")
+    cache = data.get("cache", {})
+    if cache:
+        st.caption(
+            f"Verdict cache: {cache.get('entries', 0)} entries, hits={cache.get('hits', 0)} "
+            f"misses={cache.get('misses', 0)} coalesced={cache.get('coalesced', 0)}"
+        )
 
     with st.expander("Running tasks by node", expanded=False):
         any_running = False
@@ -41,90 +152,94 @@ def _render_metrics(data: dict | None, msg: str) -> None:
         if not any_running:
             st.caption("No running tasks.")
 
-    with st.expander("Recent results (last 50)", expanded=True):
-        if recent:
-            # Normalize recent into a lightweight table
-            rows = [
-                {"node": r.get("node"), "task": r.get("task"), "duration(s)": r.get("duration"), "thread": r.get("thread"), "status": r.get("status")}
-                for r in recent
-            ]
-            st.table(rows)
-        else:
-            st.caption("No recent results.")
-
 
 def main() -> None:
     _init()
     st.title("Admin")
-    client = APIClient()
-
-    with st.spinner("Fetching status..."):
-        status, msg = client.get_cluster_status()
-    _render_status(status, msg)
+    client = get_client()
+    # Filled in after the controls: the page loads with one batched request
+    status_area = st.container()
 
     st.divider()
     st.subheader("Controls")
+    # (method, params, toast on success) run ahead of the status reads
+    action: tuple[str, tuple, str] | None = None
 
     col1, col2, col3, col4 = st.columns(4)
     with col1:
         node_to_crash = st.number_input("Crash node id", min_value=1, value=1, step=1)
         if st.button("Crash Node"):
-            with st.spinner("Crashing node..."):
-                ok, m = client.crash_node(int(node_to_crash))
-            st.toast("Crashed" if ok else f"Failed: {m}")
-            time.sleep(0.2)
-            status, msg = client.get_cluster_status()
-            _render_status(status, msg)
-
+            action = ("crash_node", (int(node_to_crash),), "Crashed")
     with col2:
         node_to_recover = st.number_input("Recover node id", min_value=1, value=1, step=1, key="recover")
         if st.button("Recover Node"):
-            with st.spinner("Recovering node..."):
-                ok, m = client.recover_node(int(node_to_recover))
-            st.toast("Recovered" if ok else f"Failed: {m}")
-            time.sleep(0.2)
-            status, msg = client.get_cluster_status()
-            _render_status(status, msg)
-
+            action = ("recover_node", (int(node_to_recover),), "Recovered")
     with col3:
         if st.button("Force Election"):
-            with st.spinner("Forcing election..."):
-                leader, m = client.force_election()
-            if leader is not None:
-                st.success(f"New leader: {leader}")
-            else:
-                st.error(f"Failed: {m}")
-            status, msg = client.get_cluster_status()
-            _render_status(status, msg)
-
+            action = ("force_election", (), "New leader")
     with col4:
-        if st.button("Refresh Status"):
-            with st.spinner("Refreshing..."):
-                status, msg = client.get_cluster_status()
-            _render_status(status, msg)
+        # Any rerun refreshes status; the button just triggers one
+        st.button("Refresh Status")
 
     st.divider()
     st.subheader("Multithreading Demo")
-    cols = st.columns(3)
+    cols = st.columns(2)
     with cols[0]:
-        n = st.number_input("Batch submissions", min_value=1, max_value=20, value=5, step=1)
+        n = st.number_input("Batch submissions", min_value=1, max_value=config.BATCH_MAX, value=5, step=1)
     with cols[1]:
-        run = st.button("Run Batch")
-    with cols[2]:
-        if st.button("Show Runtime Metrics"):
-            with st.spinner("Fetching metrics..."):
-                data, m = client.get_runtime_metrics()
-            _render_metrics(data, m)
-    if run:
-        with st.spinner("Submitting batch to backend..."):
-            data, m = client.submit_batch(int(n))
-        if data is None:
-            st.error(m)
+        if st.button("Run Batch"):
+            action = ("submit_batch", (int(n),), "Batch done")
+    metrics_area = st.container()
+
+    calls = [action[:2]] if action else []
+    # Runtime metrics without the recent list: completed tasks come incrementally from the event feed
+    calls += [
+        ("get_cluster_status", ()),
+        ("get_runtime_metrics", (False,)),
+        ("get_metrics_summary", ()),
+        ("get_runtime_events", (st.session_state.event_seq, config.EVENT_FEED_SIZE)),
+    ]
+    with st.spinner("Talking to backend..."):
+        started = time.time()
+        replies = client.batch(calls)
+        elapsed = time.time() - started
+    (status, msg), (metrics, metrics_msg), (summary, _), (events, _) = replies[-4:]
+    _absorb(events)
+
+    if action:
+        result, m = replies[0]
+        name, _, label = action
+        if result is None or result is False:
+            st.error(f"{name} failed: {m}")
+        elif name == "force_election":
+            st.success(f"{label}: {result}")
+        elif name == "submit_batch":
+            st.success(f"Ran {result.get('submitted')} jobs in parallel in {elapsed:.2f}s. See Runtime Metrics below.")
         else:
-            st.success(f"Submitted {data.get('submitted')} jobs. See Runtime Metrics for details.")
-            # auto fetch metrics after batch
-            data2, m2 = client.get_runtime_metrics()
-            _render_metrics(data2, m2)
+            st.toast(label)
+
+    with status_area:
+        _render_status(status, msg)
+    with metrics_area:
+        _render_latency(summary)
+        _render_metrics(metrics, metrics_msg)
+        st.subheader(f"Recent results (last {config.EVENT_FEED_SIZE})")
+        live = st.checkbox("Live feed", value=False, help="Keep this page updating as tasks complete")
+        feed = st.empty()
+        with feed.container():
+            _render_events()
+        _render_trace_export(client)
+
+    # Long-poll for new events until the user interacts (which reruns the page)
+    while live:
+        page, _ = client.wait_runtime_events(st.session_state.event_seq, config.EVENT_FEED_SIZE, config.EVENT_POLL_SECONDS)
+        if page is None:
+            time.sleep(config.EVENT_POLL_SECONDS)
+            continue
+        if page.get("events"):
+            _absorb(page)
+            with feed.container():
+                _render_events()
 
 
 if __name__ == "__main__":
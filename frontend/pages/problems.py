@@ -1,7 +1,9 @@
+import time
+
 import streamlit as st
 
 import config
-from utils.api_client import APIClient
+from utils.api_client import APIClient, get_client
 
 
 def _init() -> None:
@@ -11,6 +13,43 @@ def _init() -> None:
         st.session_state.selected_problem_key = "two-sum"
     if "last_result" not in st.session_state:
         st.session_state.last_result = {}
+    if "pending_submissions" not in st.session_state:
+        st.session_state.pending_submissions = []
+
+
+def _render_pending(client: APIClient) -> None:
+    pending = st.session_state.pending_submissions
+    if not pending:
+        return
+    st.subheader("In-flight submissions")
+    data, msg = client.wait_results([p["ticket"] for p in pending], timeout=1.0)
+    if data is None:
+        st.error(f"Failed to poll results: {msg}")
+        return
+    still_pending = []
+    for sub in pending:
+        entry = data.get(sub["ticket"], {})
+        status = entry.get("status")
+        if status == "pending":
+            still_pending.append(sub)
+            continue
+        duration = entry.get("duration")
+        st.session_state.last_result = {
+            "problem_key": sub["problem_key"],
+            "output": entry.get("output", ""),
+            "duration": f"{duration:.3f}s" if duration is not None else f"{(time.time() - sub['submitted']):.3f}s",
+            "error": "" if status == "done" else "Result expired on backend",
+            "username": sub["username"],
+        }
+        st.write(f"{sub['problem_key']} ({sub['ticket'][:8]}):")
+        if status == "done":
+            st.code(entry.get("output", ""))
+        else:
+            st.error("Result expired on backend")
+    st.session_state.pending_submissions = still_pending
+    if still_pending:
+        st.caption(f"{len(still_pending)} submission(s) still running.")
+        st.button("Refresh results")
 
 
 def main() -> None:
@@ -19,21 +58,32 @@ def main() -> None:
     if not st.session_state.username:
         st.warning("Please login first (see Login page).")
 
-    client = APIClient()
+    client = get_client()
     with st.spinner("Loading problems..."):
-        problems, source_msg = client.get_problems()
+        # Summaries only; unchanged catalogs are answered with "not modified"
+        summaries, source_msg = client.get_problem_list()
     if source_msg:
         st.caption(source_msg)
+    from_backend = source_msg == "Fetched from backend"
 
-    keys = list(problems.keys())
+    keys = [item["key"] for item in summaries]
     if not keys:
         st.error("No problems available.")
         return
+    titles = {item["key"]: item.get("title", item["key"]) for item in summaries}
     if st.session_state.selected_problem_key not in keys:
         st.session_state.selected_problem_key = keys[0]
-    key = st.selectbox("Select a problem", keys, index=keys.index(st.session_state.selected_problem_key))
+    key = st.selectbox(
+        "Select a problem",
+        keys,
+        index=keys.index(st.session_state.selected_problem_key),
+        format_func=lambda k: f"{titles[k]} ({k})",
+    )
     st.session_state.selected_problem_key = key
-    meta = problems[key]
+    meta = client.get_problem(key)
+    if meta is None:
+        st.error(f"Could not load problem '{key}'.")
+        return
 
     st.subheader(meta["title"]) 
     st.write(meta["prompt"]) 
@@ -43,20 +93,39 @@ def main() -> None:
     tests = st.text_area("Tests (executed after your code)", value=meta.get("tests", ""), height=160, key=f"tests-{key}") if show_tests else meta.get("tests", "")
 
     if st.button("Submit"):
-        with st.spinner("Submitting to backend..."):
-            result = client.submit(code, tests)
-        st.session_state.last_result = {
-            "problem_key": key,
-            "output": result.get("output", ""),
-            "duration": result.get("duration", ""),
-            "error": result.get("error", ""),
-            "username": st.session_state.username,
-        }
-        if result.get("error"):
-            st.error(f"Error: {result['error']}")
+        if from_backend and tests == meta.get("tests", ""):
+            # Unmodified tests: let the backend use its precompiled harness
+            ticket, msg = client.submit_problem_async(key, code, st.session_state.username)
         else:
-            st.success("Submission sent. See Results page.")
-            st.code(result.get("output", ""))
+            ticket, msg = client.submit_async(code, tests, st.session_state.username)
+        if ticket is None:
+            st.error(f"Error: {msg}")
+        else:
+            st.session_state.pending_submissions.append({
+                "ticket": ticket,
+                "problem_key": key,
+                "username": st.session_state.username,
+                "submitted": time.time(),
+            })
+            st.success("Submission queued. See below or the Results page.")
+
+    if from_backend and meta.get("cases"):
+        stop_early = st.checkbox("Stop at first failing case", value=True)
+        if st.button("Judge all test cases"):
+            with st.spinner("Judging test cases..."):
+                report, msg = client.judge_problem(key, code, stop_early, st.session_state.username)
+            if report is None:
+                st.error(f"Error: {msg}")
+            else:
+                verdict = report.get("verdict", "-")
+                summary = f"{verdict}: {report.get('passed', 0)}/{report.get('total', 0)} cases in {report.get('time', 0)}s"
+                (st.success if verdict == "ACCEPTED" else st.error)(summary)
+                st.table([
+                    {"case": r.get("index"), "verdict": r.get("verdict"), "time(s)": r.get("time"), "detail": r.get("detail")}
+                    for r in report.get("cases", [])
+                ])
+
+    _render_pending(client)
 
 
 if __name__ == "__main__":
@@ -1,20 +1,22 @@
+import time
+
 import streamlit as st
 
+import config
+from utils.api_client import get_client
+
 
 def _init() -> None:
     if "last_result" not in st.session_state:
         st.session_state.last_result = {}
+    if "username" not in st.session_state:
+        st.session_state.username = ""
+    if "history_cursors" not in st.session_state:
+        # Cursors of the pages visited so far; the last one is the page shown
+        st.session_state.history_cursors = [""]
 
 
-def main() -> None:
-    _init()
-    st.title("Results")
-
-    res = st.session_state.last_result or {}
-    if not res:
-        st.info("No submissions yet. Go to Problems page to submit.")
-        return
-
+def _render_last(res: dict) -> None:
     st.write(f"User: {res.get('username','-')}")
     st.write(f"Problem: {res.get('problem_key','-')}")
     st.write(f"Duration: {res.get('duration','-')}")
@@ -22,13 +24,66 @@ def main() -> None:
         st.error(f"Error: {res['error']}")
     else:
         output = res.get("output", "")
-        status = "PASS" if output and not output.startswith("ERROR") and output != "TIMEOUT" else "FAIL"
+        if output.startswith("BUSY") or output == "No nodes available":
+            # Never judged: the cluster was saturated or down
+            st.warning(f"Not judged: {output}")
+            return
+        failed = output.startswith("ERROR") or output in ("TIMEOUT", "OUTPUT_LIMIT_EXCEEDED")
+        status = "PASS" if output and not failed else "FAIL"
         st.write(f"Status: {status}")
         st.success("Output:")
         st.code(output)
 
 
-if __name__ == "__main__":
-    main()
+def _render_history() -> None:
+    st.subheader("Submission history")
+    col1, col2 = st.columns(2)
+    mine = col1.checkbox("Only my submissions", value=bool(st.session_state.username))
+    problem = col2.text_input("Problem key", value="")
+    user = st.session_state.username if mine else ""
+    # Changing a filter starts again from the newest page
+    filters = (user, problem.strip())
+    if st.session_state.get("history_filters") != filters:
+        st.session_state.history_filters = filters
+        st.session_state.history_cursors = [""]
+
+    cursors = st.session_state.history_cursors
+    page, msg = get_client().list_submissions(user, problem.strip(), cursors[-1], config.HISTORY_PAGE_SIZE)
+    if page is None:
+        st.caption(f"History not available: {msg}")
+        return
+    if not page["items"]:
+        st.info("No submissions recorded yet.")
+    else:
+        st.table([
+            {
+                "when": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(row["created"])),
+                "user": row["user"] or "-",
+                "problem": row["problem"] or "-",
+                "verdict": row["verdict"],
+                "duration(s)": row["duration"],
+            }
+            for row in page["items"]
+        ])
+
+    # Callbacks run before the next script run, so that run already shows the new page
+    newer, older = st.columns(2)
+    newer.button("Newer", disabled=len(cursors) == 1, on_click=cursors.pop)
+    older.button("Older", disabled=not page.get("next_cursor"), on_click=cursors.append, args=(page.get("next_cursor"),))
+
+
+def main() -> None:
+    _init()
+    st.title("Results")
 
+    res = st.session_state.last_result or {}
+    if res:
+        _render_last(res)
+    else:
+        st.info("No submissions yet. Go to Problems page to submit.")
+
+    _render_history()
 
+
+if __name__ == "__main__":
+    main()
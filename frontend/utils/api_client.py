@@ -1,26 +1,130 @@
+import functools
+import threading
 import time
-import xmlrpc.client
-from typing import Any, Dict, Tuple
+from typing import Any, Dict, List, Sequence, Tuple
 
 import config
+from utils.rpc_client import FramedProxy, PooledServerProxy
+
+try:
+    import streamlit as st
+
+    _cache_resource = st.cache_resource
+except ImportError:  # used outside the Streamlit app (scripts, tests)
+    _cache_resource = functools.lru_cache(maxsize=None)
 
 
 class APIClient:
-    def __init__(self, host: str | None = None, port: int | None = None) -> None:
+    def __init__(self, host: str | None = None, port: int | None = None, transport: str | None = None) -> None:
         self.host = host or config.BACKEND_HOST
-        self.port = port or config.BACKEND_PORT
-        self._client = xmlrpc.client.ServerProxy(f"http://{self.host}:{self.port}")
+        self.transport = transport or config.BACKEND_TRANSPORT
+        self._client: Any
+        # Problem catalog cache: summaries for one version, details filled lazily
+        self._catalog: Dict[str, Any] = {"version": "", "items": [], "details": {}}
+        self._catalog_lock = threading.Lock()
+        if self.transport == "framed":
+            self.port = port or config.BACKEND_FRAMED_PORT
+            self._client = FramedProxy(self.host, self.port)
+        else:
+            self.port = port or config.BACKEND_PORT
+            self._client = PooledServerProxy(f"http://{self.host}:{self.port}")
+
+    def batch(self, calls: Sequence[Tuple[str, Sequence[Any]]]) -> List[Tuple[Any, str]]:
+        """
+        Run several calls in one round-trip via `system.multicall`, in order.
+        Returns one (result, "OK") or (None, error) pair per call.
+        """
+        requests = [{"methodName": name, "params": list(params)} for name, params in calls]
+        try:
+            replies = self._client.call("system.multicall", requests)
+        except Exception as ex:  # noqa: BLE001
+            return [(None, str(ex))] * len(requests)
+        out: List[Tuple[Any, str]] = []
+        for reply in replies:
+            if isinstance(reply, dict):
+                out.append((None, str(reply.get("faultString", "call failed"))))
+            else:
+                out.append((reply[0], "OK"))
+        return out
 
-    def submit(self, code: str, tests: str) -> Dict[str, str]:
+    def submit(self, code: str, tests: str, timeout: float = 30.0) -> Dict[str, str]:
+        """
+        Submit through the ticket API and long-poll for the verdict. Falls back
+        to the blocking `submit_code` call on backends without tickets.
+        """
         start = time.time()
         try:
-            result = self._client.submit_code(code, tests)
+            ticket = self._client.submit_code_async(code, tests)
+            if str(ticket).startswith("BUSY"):
+                raise RuntimeError(f"Backend busy ({ticket})")
+            if not ticket:
+                result = self._client.submit_code(code, tests)
+            else:
+                entry: Dict[str, Any] = {"status": "pending"}
+                while entry.get("status") == "pending" and time.time() - start < timeout:
+                    entry = self._client.wait_results([ticket], 5.0).get(ticket, {})
+                if entry.get("status") != "done":
+                    raise RuntimeError(f"submission {ticket} not finished ({entry.get('status', 'unknown')})")
+                result = entry.get("output", "")
             duration = f"{(time.time() - start):.3f}s"
             return {"output": str(result), "duration": duration, "error": ""}
         except Exception as ex:  # noqa: BLE001
             duration = f"{(time.time() - start):.3f}s"
             return {"output": "", "duration": duration, "error": str(ex)}
 
+    @staticmethod
+    def _ticket_or_error(ticket: str) -> Tuple[str | None, str]:
+        if not ticket:
+            return None, "Async submissions not available"
+        if ticket.startswith("BUSY"):
+            # Every node queue is full; the message carries the retry-after hint
+            return None, f"Backend busy ({ticket})"
+        return ticket, "OK"
+
+    def submit_async(self, code: str, tests: str, user: str = "") -> Tuple[str | None, str]:
+        try:
+            # The user (for the submission history) is only sent when known
+            params = (code, tests, user) if user else (code, tests)
+            ticket = str(self._client.submit_code_async(*params))
+            return self._ticket_or_error(ticket)
+        except Exception as ex:  # noqa: BLE001
+            return None, str(ex)
+
+    def submit_problem_async(self, problem_key: str, code: str, user: str = "") -> Tuple[str | None, str]:
+        """Submit against the backend's precompiled tests for `problem_key`."""
+        try:
+            params = (problem_key, code, 2.0, user) if user else (problem_key, code)
+            ticket = str(self._client.submit_problem_async(*params))
+            return self._ticket_or_error(ticket)
+        except Exception as ex:  # noqa: BLE001
+            return None, str(ex)
+
+    def judge_problem(
+        self, problem_key: str, code: str, stop_on_first_failure: bool = True, user: str = ""
+    ) -> Tuple[Dict[str, Any] | None, str]:
+        try:
+            params = (problem_key, code, bool(stop_on_first_failure)) + ((user,) if user else ())
+            report = self._client.judge_problem(*params)
+            return report, "OK"
+        except Exception as ex:  # noqa: BLE001
+            return None, str(ex)
+
+    def wait_results(self, tickets: List[str], timeout: float = 0.0) -> Tuple[Dict[str, Dict[str, Any]] | None, str]:
+        try:
+            data = self._client.wait_results(list(tickets), float(timeout))
+            return data, "OK"
+        except Exception as ex:  # noqa: BLE001
+            return None, str(ex)
+
+    def list_submissions(
+        self, user: str = "", problem: str = "", cursor: str = "", limit: int = 20
+    ) -> Tuple[Dict[str, Any] | None, str]:
+        """One newest-first page of the submission history: {items, next_cursor}."""
+        try:
+            return self._client.list_submissions(user, problem, cursor, int(limit)), "OK"
+        except Exception as ex:  # noqa: BLE001
+            return None, str(ex)
+
     def get_problems(self) -> Tuple[Dict[str, Dict], str]:
         """
         Try to fetch problems from backend via optional XML-RPC method `list_problems`.
@@ -34,6 +138,59 @@ class APIClient:
         except Exception:
             return config.PROBLEMS, "Using local problem set"
 
+    def _fetch_catalog(self, cached_version: str) -> Dict[str, Any] | None:
+        """All summary pages of the current catalog, or None if `cached_version` is still current."""
+        for _ in range(3):
+            page = self._client.list_problems(cached_version, "", config.CATALOG_PAGE_SIZE)
+            if page.get("not_modified"):
+                return None
+            version, items = page["version"], list(page["items"])
+            while page.get("next_cursor"):
+                page = self._client.list_problems("", page["next_cursor"], config.CATALOG_PAGE_SIZE)
+                if page["version"] != version:
+                    break  # catalog changed while paging; start over
+                items += page["items"]
+            else:
+                return {"version": version, "items": items, "details": {}}
+        raise RuntimeError("problem catalog kept changing while paging")
+
+    def get_problem_list(self) -> Tuple[List[Dict[str, Any]], str]:
+        """
+        Problem summaries ({key, title, cases}), revalidated on every call: an
+        unchanged catalog costs one small "not modified" reply. Backends
+        without a versioned catalog fall back to get_problems.
+        """
+        with self._catalog_lock:
+            cached_version = self._catalog["version"]
+        try:
+            fresh = self._fetch_catalog(cached_version)
+            msg = "Fetched from backend"
+        except Exception:  # noqa: BLE001
+            problems, msg = self.get_problems()
+            items = [{"key": k, "title": meta.get("title", k), "cases": len(meta.get("cases") or [])} for k, meta in problems.items()]
+            fresh = {"version": "", "items": items, "details": dict(problems)}
+        with self._catalog_lock:
+            if fresh is not None:
+                self._catalog = fresh
+            return list(self._catalog["items"]), msg
+
+    def get_problem(self, key: str) -> Dict[str, Any] | None:
+        """Full problem details, fetched once per catalog version."""
+        with self._catalog_lock:
+            version = self._catalog["version"]
+            meta = self._catalog["details"].get(key)
+        if meta is not None or not version:
+            return meta
+        try:
+            meta = self._client.get_problem(key) or None
+        except Exception:  # noqa: BLE001
+            return None
+        if meta is not None:
+            with self._catalog_lock:
+                if self._catalog["version"] == meta.get("version"):
+                    self._catalog["details"][key] = meta
+        return meta
+
     # Admin helpers
     def get_cluster_status(self) -> Tuple[Dict[str, Any] | None, str]:
         try:
@@ -70,6 +227,22 @@ class APIClient:
         except Exception as ex:  # noqa: BLE001
             return None, str(ex)
 
+    def wait_runtime_events(
+        self, since_seq: int, max_events: int = 200, timeout: float = 5.0
+    ) -> Tuple[Dict[str, Any] | None, str]:
+        """Long-poll for completed tasks after `since_seq`; returns early when one arrives."""
+        try:
+            return self._client.wait_runtime_events(int(since_seq), int(max_events), float(timeout)), "OK"
+        except Exception as ex:  # noqa: BLE001
+            return None, str(ex)
+
+    def export_trace(self, trace_id: int = 0) -> Tuple[Dict[str, Any] | None, str]:
+        """Chrome trace-event JSON for one submission's trace id (0: everything buffered)."""
+        try:
+            return self._client.export_trace(int(trace_id)), "OK"
+        except Exception as ex:  # noqa: BLE001
+            return None, str(ex)
+
     def submit_batch(self, count: int) -> Tuple[Dict[str, Any] | None, str]:
         try:
             data = self._client.submit_batch(int(count))
@@ -77,4 +250,15 @@ class APIClient:
         except Exception as ex:  # noqa: BLE001
             return None, str(ex)
 
+    def submit_many(self, items: List[Dict[str, str]]) -> Tuple[Dict[str, Any] | None, str]:
+        try:
+            data = self._client.submit_many(list(items))
+            return data, "OK"
+        except Exception as ex:  # noqa: BLE001
+            return None, str(ex)
+
 
+@_cache_resource
+def get_client() -> APIClient:
+    """Process-wide client shared by every page and session (connections are pooled)."""
+    return APIClient()
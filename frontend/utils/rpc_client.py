@@ -0,0 +1,167 @@
+import json
+import socket
+import struct
+import threading
+import xmlrpc.client
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeout
+from typing import Any, Dict, List, Optional, Tuple
+
+# Same framing as the backend's wire.py: 4-byte big-endian length + UTF-8 JSON
+_HEADER = struct.Struct("!I")
+
+
+class RemoteError(Exception):
+    """Raised when the backend function itself failed."""
+
+
+def _send_frame(sock: socket.socket, obj: Any) -> None:
+    body = json.dumps(obj, separators=(",", ":")).encode("utf-8")
+    sock.sendall(_HEADER.pack(len(body)) + body)
+
+
+def _recv_exact(sock: socket.socket, size: int) -> bytes:
+    buf = bytearray()
+    while len(buf) < size:
+        chunk = sock.recv(size - len(buf))
+        if not chunk:
+            raise ConnectionError("connection closed by backend")
+        buf += chunk
+    return bytes(buf)
+
+
+def _recv_frame(sock: socket.socket) -> Any:
+    (size,) = _HEADER.unpack(_recv_exact(sock, _HEADER.size))
+    return json.loads(_recv_exact(sock, size).decode("utf-8"))
+
+
+class FramedProxy:
+    """
+    Drop-in for xmlrpc.client.ServerProxy over the backend's framed
+    transport: `proxy.get_cluster_status()` etc. All calls share one
+    persistent connection and may be pipelined from several threads.
+    """
+
+    def __init__(self, host: str, port: int, timeout: float = 60.0) -> None:
+        self._host = host
+        self._port = port
+        self._timeout = timeout
+        self._sock: Optional[socket.socket] = None
+        self._pending: Dict[int, "Future[Any]"] = {}
+        self._lock = threading.Lock()
+        self._send_lock = threading.Lock()
+        self._seq = 0
+
+    def _connection(self) -> socket.socket:
+        if self._sock is None:
+            sock = socket.create_connection((self._host, self._port), timeout=5.0)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            sock.settimeout(None)
+            self._sock = sock
+            threading.Thread(target=self._reader, args=(sock,), daemon=True).start()
+        return self._sock
+
+    def _reader(self, sock: socket.socket) -> None:
+        try:
+            while True:
+                reply = _recv_frame(sock)
+                with self._lock:
+                    future = self._pending.pop(reply.get("id"), None)
+                if future is None:
+                    continue
+                error = reply.get("error")
+                if error:
+                    future.set_exception(RemoteError(f"{error.get('type')}: {error.get('message')}"))
+                else:
+                    future.set_result(reply.get("result"))
+        except (OSError, ValueError) as ex:
+            self._drop(sock, ex)
+
+    def _drop(self, sock: socket.socket, ex: BaseException) -> None:
+        with self._lock:
+            if self._sock is sock:
+                self._sock = None
+            pending, self._pending = self._pending, {}
+        sock.close()
+        for future in pending.values():
+            future.set_exception(ConnectionError(f"connection lost: {ex}"))
+
+    def _send(self, method: str, params: Tuple[Any, ...]) -> Tuple[int, "Future[Any]"]:
+        future: "Future[Any]" = Future()
+        with self._lock:
+            sock = self._connection()
+            self._seq += 1
+            req_id = self._seq
+            self._pending[req_id] = future
+        try:
+            with self._send_lock:
+                _send_frame(sock, {"id": req_id, "method": method, "params": list(params)})
+        except OSError as ex:
+            self._drop(sock, ex)
+        return req_id, future
+
+    def call_async(self, method: str, *params: Any) -> "Future[Any]":
+        return self._send(method, params)[1]
+
+    def call(self, name: str, *params: Any) -> Any:
+        req_id, future = self._send(name, params)
+        try:
+            return future.result(self._timeout)
+        except FutureTimeout:
+            # Forget the call so a reply that never comes does not pin it forever
+            with self._lock:
+                self._pending.pop(req_id, None)
+            raise
+
+    def __getattr__(self, name: str) -> Any:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return lambda *params: self.call(name, *params)
+
+    def close(self) -> None:
+        with self._lock:
+            sock, self._sock = self._sock, None
+        if sock is not None:
+            sock.close()
+
+
+class PooledServerProxy:
+    """
+    Thread-safe XML-RPC proxy: each call borrows a ServerProxy (and with it a
+    keep-alive HTTP connection) from a small pool and returns it afterwards.
+    A proxy whose call failed at the transport level is discarded.
+    """
+
+    def __init__(self, url: str, max_idle: int = 8) -> None:
+        self._url = url
+        self._max_idle = max_idle
+        self._idle: List[xmlrpc.client.ServerProxy] = []
+        self._lock = threading.Lock()
+
+    def call(self, name: str, *params: Any) -> Any:
+        with self._lock:
+            proxy = self._idle.pop() if self._idle else None
+        if proxy is None:
+            proxy = xmlrpc.client.ServerProxy(self._url, allow_none=True)
+        try:
+            result = getattr(proxy, name)(*params)
+        except xmlrpc.client.Fault:
+            self._give_back(proxy)
+            raise
+        except Exception:
+            proxy("close")()
+            raise
+        self._give_back(proxy)
+        return result
+
+    def _give_back(self, proxy: xmlrpc.client.ServerProxy) -> None:
+        with self._lock:
+            if len(self._idle) < self._max_idle:
+                self._idle.append(proxy)
+                return
+        proxy("close")()
+
+    def __getattr__(self, name: str) -> Any:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return lambda *params: self.call(name, *params)